@@ -74,13 +74,24 @@ WSGI_APPLICATION = 'bizeasy.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# For several billing terminals writing at once, switch ENGINE to
+# 'user.backends.sqlite3': WAL journal and the SQLITE_CONCURRENCY pragmas
+# below, and BEGIN IMMEDIATE for checkout and stock writes (see user.writes).
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Read-only copy of 'default' for the report pages, refreshed by the
+    # snapshot_reports command (see REPORT_SNAPSHOT below). Never migrated.
+    'snapshot': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': (BASE_DIR / 'report_snapshot.sqlite3').as_uri() + '?mode=ro',
+    },
 }
 
+DATABASE_ROUTERS = ['user.snapshots.SnapshotRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -121,3 +132,97 @@ AUTH_USER_MODEL = 'user.CustomUser'  # Make sure 'user' is your app name
 LOGIN_URL = '/'  # Points to the root URL where login_view is configured
 LOGIN_REDIRECT_URL = '/owner/dashboard/'  # Optional: where to redirect after successful login
 LOGOUT_REDIRECT_URL = '/'  # Optional: where to redirect after logout
+
+# Optional packages; each feature falls back when its package is missing.
+# xhtml2pdf renders invoice PDFs (user.pdf; HTML output otherwise), numpy
+# vectorises the reorder suggestions (user.reorder; plain Python otherwise)
+# and openpyxl reads and writes XLSX for the exports and the catalog import
+# (user.exports, user.importer; CSV only otherwise).
+
+# Invoice numbering (see user.sequences). Bill numbers are allocated per
+# shop and financial year; the prefix and format can also be edited per
+# shop/year on the InvoiceSequence rows in the admin.
+INVOICE_NUMBERING = {
+    'SHOP': 'MAIN',
+    'PREFIX': 'INV',
+    'FORMAT': '{prefix}-{shop}-{fy}-{number:06d}',
+    'BLOCK_SIZE': 20,
+    'FY_START_MONTH': 4,
+}
+
+# Shop report engine (see user.reports). Sections run on WORKERS threads and
+# built reports are cached per date range and data version, CACHE_SIZE at most.
+SHOP_REPORT = {
+    'WORKERS': 4,
+    'CACHE_SIZE': 32,
+}
+
+# Background report jobs (see user.jobs), run by the run_report_worker command
+REPORT_JOBS = {
+    'CONCURRENCY': 2,
+    'POLL_INTERVAL': 2,
+    'STALE_AFTER': 900,
+    'KEEP_DAYS': 7,
+}
+
+# Batch invoice rendering (see user.invoice_batch). Rendered files and zips go
+# to OUTPUT_DIR (relative to BASE_DIR); WORKERS None uses one process per CPU.
+INVOICE_PDFS = {
+    'OUTPUT_DIR': 'invoice_pdfs',
+    'WORKERS': None,
+    'CHUNK_SIZE': 200,
+}
+
+# Reorder suggestions (see user.reorder), recomputed nightly by the
+# compute_reorder_suggestions command
+REORDER = {
+    'WINDOW_DAYS': 28,
+    'LEAD_TIME_DAYS': 7,
+    'REVIEW_DAYS': 7,
+    'SERVICE_FACTOR': 1.65,
+}
+
+# Billing catalog sync (see user.catalog). Change log entries older than
+# RETENTION_DAYS are dropped by the prune_catalog_changes command; a counter
+# further behind reloads the full snapshot.
+CATALOG = {
+    'RETENTION_DAYS': 7,
+}
+
+# Category tree cache (see user.categories). Each process checks the shared
+# categories data version at most every CHECK_SECONDS for edits made by
+# other processes; edits in the same process show up at once.
+CATEGORY_TREE = {
+    'CHECK_SECONDS': 5,
+}
+
+# Price book cache (see user.pricing), checked against the shared prices data
+# version in the same way.
+PRICE_BOOK = {
+    'CHECK_SECONDS': 5,
+}
+
+# SQLite concurrency profile (see user.writes). The pragmas only apply with
+# the user.backends.sqlite3 engine; busy checkout and stock transactions are
+# retried RETRIES times with jittered backoff on either engine.
+SQLITE_CONCURRENCY = {
+    'JOURNAL_MODE': 'WAL',
+    'SYNCHRONOUS': 'NORMAL',
+    'CACHE_SIZE': -64000,
+    'MMAP_SIZE': 268435456,
+    'BUSY_TIMEOUT': 5000,
+    'RETRIES': 5,
+    'RETRY_DELAY': 0.05,
+    'MAX_RETRY_DELAY': 1.0,
+}
+
+# Report snapshot (see user.snapshots). The shop, stock and staff reports and
+# the owner dashboard read DATABASES['snapshot'] while its latest copy is at
+# most MAX_AGE seconds old, and the live database otherwise; views named in
+# LIVE_VIEWS always read live. snapshot_reports copies every INTERVAL seconds.
+REPORT_SNAPSHOT = {
+    'ALIAS': 'snapshot',
+    'INTERVAL': 300,
+    'MAX_AGE': 900,
+    'LIVE_VIEWS': [],
+}
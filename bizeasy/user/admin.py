@@ -8,7 +8,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
 # Local imports
-from .models import CustomUser as User, Category, SubCategory, Purchase, Product, SellingProduct, Discount, Invoice, InvoiceItem
+from .models import CustomUser as User, Category, SubCategory, Purchase, StockMovement, Product, SellingProduct, Discount, Invoice, InvoiceItem, InvoiceSequence, DataVersion, CatalogChange, DailyLedger, SalesCube, ExpiryAlert, ReorderSuggestion, ReportJob, ReportSnapshot
 
 
 # ==============================================================================
@@ -54,11 +54,20 @@ class PurchaseAdmin(admin.ModelAdmin):
     """Admin configuration for Purchase model."""
     
     list_display = ('product_name', 'category', 'subcategory', 'quantity', 'product_rate', 'date', 'is_deleted')
-    list_filter = ('category', 'subcategory', 'date', 'is_deleted')
+    list_filter = ('category', 'subcategory', 'date', 'is_deleted', 'kind')
     search_fields = ('product_name', 'category__name', 'subcategory__name')
     date_hierarchy = 'date'
 
 
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    """Admin configuration for StockMovement model."""
+    
+    list_display = ('purchase', 'delta', 'reason', 'user', 'created_at')
+    list_filter = ('reason', 'created_at')
+    search_fields = ('purchase__product_name',)
+
+
 # ==============================================================================
 # Product Management Admin
 # ==============================================================================
@@ -113,5 +122,83 @@ class InvoiceItemAdmin(admin.ModelAdmin):
     search_fields = ('invoice__bill_number', 'purchase__product_name')
 
 
+@admin.register(InvoiceSequence)
+class InvoiceSequenceAdmin(admin.ModelAdmin):
+    """Admin configuration for InvoiceSequence model."""
+    
+    list_display = ('shop', 'financial_year', 'prefix', 'number_format', 'next_value', 'updated_at')
+    list_filter = ('shop', 'financial_year')
+
+
+# ==============================================================================
+# Reporting Admin
+# ==============================================================================
+
+@admin.register(DailyLedger)
+class DailyLedgerAdmin(admin.ModelAdmin):
+    """Admin configuration for DailyLedger model."""
+    
+    list_display = ('date', 'income', 'expense', 'invoice_count', 'item_count', 'updated_at')
+    date_hierarchy = 'date'
+
+
+@admin.register(SalesCube)
+class SalesCubeAdmin(admin.ModelAdmin):
+    """Admin configuration for SalesCube model."""
+    
+    list_display = ('day', 'purchase', 'category', 'subcategory', 'created_by', 'qty', 'revenue', 'cost')
+    list_filter = ('category', 'created_by')
+    date_hierarchy = 'day'
+
+
+@admin.register(DataVersion)
+class DataVersionAdmin(admin.ModelAdmin):
+    """Admin configuration for DataVersion model."""
+    
+    list_display = ('scope', 'version', 'updated_at')
+
+
+@admin.register(CatalogChange)
+class CatalogChangeAdmin(admin.ModelAdmin):
+    """Admin configuration for CatalogChange model."""
+    
+    list_display = ('id', 'kind', 'object_id', 'changed_at')
+    list_filter = ('kind',)
+
+
+@admin.register(ExpiryAlert)
+class ExpiryAlertAdmin(admin.ModelAdmin):
+    """Admin configuration for ExpiryAlert model."""
+    
+    list_display = ('day', 'category', 'bucket', 'batch_count', 'quantity', 'stock_value')
+    list_filter = ('bucket', 'category')
+    date_hierarchy = 'day'
+
+
+@admin.register(ReorderSuggestion)
+class ReorderSuggestionAdmin(admin.ModelAdmin):
+    """Admin configuration for ReorderSuggestion model."""
+    
+    list_display = ('purchase', 'status', 'on_hand', 'velocity', 'days_of_cover', 'reorder_point', 'suggested_quantity', 'day')
+    list_filter = ('status',)
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    """Admin configuration for ReportJob model."""
+    
+    list_display = ('kind', 'status', 'requested_by', 'worker', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    exclude = ('result',)
+
+
+@admin.register(ReportSnapshot)
+class ReportSnapshotAdmin(admin.ModelAdmin):
+    """Admin configuration for ReportSnapshot model."""
+    
+    list_display = ('taken_at', 'seconds', 'size')
+    date_hierarchy = 'taken_at'
+
+
 # Register the User model with the custom admin
 admin.site.register(User, UserAdmin)
\ No newline at end of file
@@ -10,4 +10,8 @@ class UserConfig(AppConfig):
     """Configuration class for the user app."""
     
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'user'
\ No newline at end of file
+    name = 'user'
+
+    def ready(self):
+        # Register signal handlers that keep derived tables up to date
+        from . import signals  # noqa: F401
\ No newline at end of file
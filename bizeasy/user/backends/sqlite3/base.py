@@ -0,0 +1,35 @@
+"""
+SQLite database backend for the Bizeasy application.
+Django's SQLite backend tuned for several terminals writing at once.
+
+Opt in with ``'ENGINE': 'user.backends.sqlite3'``; the pragmas come from
+the SQLITE_CONCURRENCY setting (see user.writes).
+"""
+
+# Django imports
+from django.db.backends.sqlite3 import base
+
+# Local imports
+from ...writes import pragmas
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """Applies the concurrency pragmas (WAL journal by default) to each new
+    connection and starts user.writes.immediate() blocks with BEGIN IMMEDIATE."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Set by user.writes.immediate() while it opens a transaction
+        self.begin_immediate = False
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for statement in pragmas(conn.execute('PRAGMA journal_mode').fetchone()[0]):
+            conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.begin_immediate:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -0,0 +1,375 @@
+"""
+Benchmark module for the Bizeasy application.
+Seeds a deterministic, production-sized dataset and times the main views.
+"""
+
+# Standard library imports
+import bisect
+import math
+import random
+import sys
+import time
+from datetime import timedelta
+
+# Django imports
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+# Local imports
+from . import catalog, cube, ledger, pricing, reorder, reports, search, stock, versioning
+from .categories import category_tree
+from .models import Category, CustomUser, Discount, Invoice, InvoiceItem, Product, Purchase, SubCategory
+from .money import Money
+
+
+# Names of every seeded row start with these, so a second run can refuse
+CATEGORY_PREFIX = 'Bench '
+PRODUCT_PREFIX = 'Bench item '
+BILL_PREFIX = 'BENCH-'
+STAFF_PREFIX = 'bench_staff_'
+OWNER_USERNAME = 'bench_owner'
+PASSWORD = 'bench-pass'
+
+DEFAULTS = {
+    'categories': 20,
+    'subcategories': 5,  # per category
+    'purchases': 100_000,
+    'items': 1_000_000,
+    'years': 2,
+    'staff': 10,
+    'discounts': 5_000,
+    'seed': 42,
+    'batch_size': 5_000,
+}
+
+# Sales are drawn from this many of the most recently received batches
+RECENT_BATCHES = 2_000
+
+
+class BenchmarkError(Exception):
+    """Raised when the database already holds benchmark data or no user can run the views."""
+
+
+# ==============================================================================
+# Seeding
+# ==============================================================================
+
+def _spread(count, start, days):
+    """``count`` dates spread evenly over ``days`` days from ``start``, ascending."""
+    return [start + timedelta(days=index * days // max(count, 1)) for index in range(count)]
+
+
+def seed(progress=None, **options):
+    """Insert a benchmark dataset and return the row counts.
+
+    Every option in DEFAULTS can be overridden; the same options (and
+    ``seed``) always produce the same rows, dated back from today. Rows are written with
+    bulk_create in batches inside one transaction. Stock counters, the
+    ledger, the sales cube, the search index and the reorder suggestions
+    are rebuilt afterwards, since bulk_create sends no signals.
+    ``progress(message)`` is called after each step.
+    """
+    options = {**DEFAULTS, **{key: value for key, value in options.items() if value is not None}}
+    if Category._default_manager.filter(name__startswith=CATEGORY_PREFIX).exists():
+        raise BenchmarkError('The database already holds benchmark data; seed a fresh database')
+    if options['items'] and not options['purchases']:
+        raise BenchmarkError('Invoice items need at least one purchase')
+    progress = progress or (lambda message: None)
+    rng = random.Random(options['seed'])
+    batch_size = options['batch_size']
+    today = timezone.now().date()
+    days = max(options['years'] * 365, 1)
+    start = today - timedelta(days=days - 1)
+
+    with transaction.atomic():
+        password = make_password(PASSWORD)
+        CustomUser._default_manager.bulk_create(
+            [CustomUser(username=OWNER_USERNAME, password=password, role='owner', full_name='Benchmark Owner')]
+            + [
+                CustomUser(username=f'{STAFF_PREFIX}{number:03d}', password=password, role='staff',
+                           full_name=f'Benchmark Staff {number}')
+                for number in range(options['staff'])
+            ]
+        )
+        staff = list(
+            CustomUser._default_manager.filter(username__startswith=STAFF_PREFIX).order_by('pk').values_list('pk', flat=True)
+        )
+
+        Category._default_manager.bulk_create([
+            Category(name=f'{CATEGORY_PREFIX}{number:03d}', description=f'All items of {CATEGORY_PREFIX}{number:03d} company')
+            for number in range(options['categories'])
+        ])
+        categories = list(
+            Category._default_manager.filter(name__startswith=CATEGORY_PREFIX).order_by('pk').values_list('pk', 'name')
+        )
+        SubCategory._default_manager.bulk_create([
+            SubCategory(category_id=category_id, name=f'Line {number:02d}', description=f'{name} Line {number:02d} items')
+            for category_id, name in categories
+            for number in range(options['subcategories'])
+        ])
+        subcategories = list(
+            SubCategory._default_manager.filter(category_id__in=[pk for pk, _ in categories])
+            .order_by('pk').values_list('pk', 'category_id')
+        )
+        progress(f'{len(staff)} staff, {len(categories)} categories, {len(subcategories)} subcategories')
+
+        # Purchases, oldest first; quantity is the stock left, the counters
+        # are filled in from the invoice items at the end
+        purchase_dates = _spread(options['purchases'], start, days)
+        rates = []
+        for start_index in range(0, options['purchases'], batch_size):
+            purchases = []
+            for index in range(start_index, min(start_index + batch_size, options['purchases'])):
+                subcategory_id, category_id = rng.choice(subcategories)
+                rate = rng.randrange(1_000, 50_000)
+                mrp = rate * rng.randrange(120, 160) // 100
+                quantity = rng.randrange(0, 200)
+                date = purchase_dates[index]
+                rates.append(mrp)
+                purchases.append(Purchase(
+                    product_name=f'{PRODUCT_PREFIX}{index:06d}', category_id=category_id,
+                    subcategory_id=subcategory_id, quantity=quantity, received_quantity=quantity,
+                    product_rate=Money.from_paise(rate), total_rate=Money.from_paise(rate * quantity),
+                    mrp=Money.from_paise(mrp), sale_rate=Money.from_paise(mrp), date=date,
+                    expire_date=date + timedelta(days=rng.randrange(60, 720)) if rng.random() < 0.6 else None,
+                    notes=f'Purchase of {PRODUCT_PREFIX}{index:06d}',
+                ))
+            Purchase._default_manager.bulk_create(purchases, batch_size=batch_size)
+        purchase_ids = list(
+            Purchase._default_manager.filter(product_name__startswith=PRODUCT_PREFIX).order_by('pk').values_list('pk', flat=True)
+        )
+        progress(f'{len(purchase_ids)} purchases')
+
+        _seed_discounts(rng, purchase_ids, rates, options['discounts'], today, batch_size)
+        progress(f"{options['discounts']} discounts")
+
+        invoices, items = _seed_invoices(rng, options, purchase_ids, purchase_dates, rates, staff, start, days)
+        progress(f'{invoices} invoices, {items} invoice items')
+
+        stock.reconcile()
+        ledger.rebuild()
+        cube.rebuild()
+        search.rebuild()
+        reorder.refresh(today)
+        versioning.bump(versioning.REPORTS)
+        versioning.bump(versioning.CATEGORIES)
+        versioning.bump(versioning.PRICES)
+        catalog.reset()
+    pricing.price_book.clear()
+    category_tree.clear()
+    reports.report_cache.clear()
+    progress('stock counters, ledger, sales cube, search index and reorder suggestions rebuilt')
+    return {
+        'staff': len(staff), 'categories': len(categories), 'subcategories': len(subcategories),
+        'purchases': len(purchase_ids), 'discounts': options['discounts'], 'invoices': invoices, 'invoice_items': items,
+    }
+
+
+def _seed_discounts(rng, purchase_ids, rates, count, today, batch_size):
+    """A product and a discount, as add_discount creates them, for ``count`` random batches."""
+    chosen = sorted(rng.sample(range(len(purchase_ids)), min(count, len(purchase_ids))))
+    percents = {index: rng.choice((5, 10, 15, 20)) for index in chosen}
+    purchases = Purchase._default_manager.in_bulk([purchase_ids[index] for index in chosen])
+    products = []
+    for index in chosen:
+        purchase = purchases[purchase_ids[index]]
+        price = pricing.final_price(purchase.mrp, percents[index])
+        products.append(Product(
+            name=purchase.product_name, purchase_id=purchase.pk, category_id=purchase.category_id,
+            subcategory_id=purchase.subcategory_id, mrp=purchase.mrp, purchase_rate=purchase.product_rate,
+            selling_price=purchase.mrp, stock_quantity=purchase.quantity, final_price=price,
+        ))
+        # Never below the purchase rate, as Purchase.clean() requires
+        purchase.sale_rate = max(price, purchase.product_rate)
+        rates[index] = purchase.sale_rate.paise
+    Product._default_manager.bulk_create(products, batch_size=batch_size)
+    Purchase._default_manager.bulk_update(purchases.values(), ['sale_rate'], batch_size=batch_size)
+    product_ids = dict(
+        Product._default_manager.filter(name__startswith=PRODUCT_PREFIX).values_list('purchase_id', 'pk')
+    )
+    discounts = []
+    for index in chosen:
+        starts = today + timedelta(days=rng.randrange(-30, 10))
+        ends = starts + timedelta(days=rng.randrange(7, 60))
+        status = 'active' if starts <= today <= ends else ('pending' if today < starts else 'rejected')
+        discounts.append(Discount(
+            product_id=product_ids[purchase_ids[index]], discount_percent=percents[index],
+            start_date=starts, end_date=ends, status=status,
+        ))
+    Discount._default_manager.bulk_create(discounts, batch_size=batch_size)
+
+
+def _seed_invoices(rng, options, purchase_ids, purchase_dates, rates, staff, start, days):
+    """Invoices of one to seven lines spread over the period, each line a
+    batch received on or before the invoice day; returns the counts."""
+    batch_size = options['batch_size']
+    lines = []
+    remaining = options['items']
+    while remaining > 0:
+        count = min(rng.randint(1, 7), remaining)
+        lines.append(count)
+        remaining -= count
+    invoice_dates = _spread(len(lines), start, days)
+
+    for start_index in range(0, len(lines), batch_size):
+        end_index = min(start_index + batch_size, len(lines))
+        invoices, planned = [], []
+        for index in range(start_index, end_index):
+            date = invoice_dates[index]
+            received = bisect.bisect_right(purchase_dates, date)
+            items = []
+            for _ in range(lines[index]):
+                batch = rng.randrange(max(received - RECENT_BATCHES, 0), received)
+                items.append((purchase_ids[batch], rng.randint(1, 3), rates[batch]))
+            subtotal = Money.from_paise(sum(quantity * rate for _, quantity, rate in items))
+            invoices.append(Invoice(
+                bill_number=f'{BILL_PREFIX}{index:08d}', date=date, customer_name='Walk-in',
+                subtotal=subtotal, total=subtotal, created_by_id=rng.choice(staff) if staff else None,
+            ))
+            planned.append(items)
+        Invoice._default_manager.bulk_create(invoices, batch_size=batch_size)
+        # Bill numbers sort in insertion order, so the ids line up with planned
+        invoice_ids = list(
+            Invoice._default_manager.filter(
+                bill_number__gte=invoices[0].bill_number, bill_number__lte=invoices[-1].bill_number
+            ).order_by('bill_number').values_list('pk', flat=True)
+        )
+        InvoiceItem._default_manager.bulk_create([
+            InvoiceItem(
+                invoice_id=invoice_id, purchase_id=purchase_id, quantity=quantity,
+                rate=Money.from_paise(rate), total=Money.from_paise(rate * quantity),
+            )
+            for invoice_id, items in zip(invoice_ids, planned)
+            for purchase_id, quantity, rate in items
+        ], batch_size=batch_size)
+    return len(lines), options['items']
+
+
+# ==============================================================================
+# View benchmark
+# ==============================================================================
+
+def _views(purchase_id, invoice_id, staff_id, subcategory_id):
+    """(label, url name, url kwargs, query string) of the views to time."""
+    return [
+        ('owner_dashboard', 'owner_dashboard', {}, {}),
+        ('api_dashboard_data', 'api_dashboard_data', {}, {}),
+        ('shop_report', 'shop_report', {}, {}),
+        ('staff_wise_report', 'staff_wise_report', {'staff_id': staff_id}, {}),
+        ('stock_report', 'stock_report', {}, {}),
+        ('purchase_history', 'purchase_history', {}, {}),
+        ('reorder_suggestions', 'reorder_suggestions', {}, {}),
+        ('list_purchases', 'list_purchases', {}, {}),
+        ('list_purchases_json', 'list_purchases', {}, {'format': 'json'}),
+        ('list_products', 'list_products', {}, {}),
+        ('view_discount', 'view_discount', {}, {}),
+        ('invoice_list', 'invoice_list', {}, {}),
+        ('billing_list', 'billing_list', {}, {}),
+        ('invoice_view', 'invoice_view', {'invoice_id': invoice_id}, {}),
+        ('print_invoice', 'print_invoice', {'invoice_id': invoice_id}, {}),
+        ('add_billing', 'add_billing', {}, {}),
+        ('search_products', 'search_products', {}, {'q': 'item 00'}),
+        ('load_products', 'load_products', {}, {'subcategory_id': subcategory_id}),
+        ('get_product_details', 'get_product_details', {}, {'purchase_id': purchase_id}),
+        ('export_shop_summary', 'export_table', {'table': 'shop-summary'}, {}),
+    ]
+
+
+def _percentile(values, percent):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+def _peak_rss_mb():
+    """Peak resident memory in MiB, or None where it cannot be read."""
+    try:
+        import resource
+    except ImportError:
+        # No resource module on Windows; psutil reports the peak working set
+        try:
+            import psutil
+        except ImportError:
+            return None
+        memory = psutil.Process().memory_info()
+        return round(getattr(memory, 'peak_wset', memory.rss) / (1024 * 1024), 1)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _host():
+    """A Host header the ALLOWED_HOSTS setting accepts."""
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*':
+            return host.lstrip('.')
+    return 'localhost'
+
+
+def bench_views(repeat=10, warmup=1, cold=False, only=None, username=None):
+    """Request each view ``repeat`` times through the test client.
+
+    Returns a dict with one entry per view: p50/p95/max latency in
+    milliseconds, queries per request and the process's peak RSS so far.
+    ``cold`` clears the report cache, price book and category tree before
+    every request.
+    """
+    if username:
+        user = CustomUser._default_manager.filter(username=username).first()
+    else:
+        user = CustomUser._default_manager.filter(role='owner').order_by('pk').first()
+    if user is None:
+        raise BenchmarkError('No user to run the views as; seed the data or pass a username')
+    purchase_id = Purchase._default_manager.filter(is_deleted=False).order_by('-pk').values_list('pk', flat=True).first()
+    invoice = Invoice._default_manager.order_by('-pk').values_list('pk', 'created_by_id').first()
+    subcategory_id = SubCategory._default_manager.order_by('pk').values_list('pk', flat=True).first()
+    if purchase_id is None or invoice is None:
+        raise BenchmarkError('The database has no purchases or invoices to benchmark')
+    staff_id = invoice[1] or user.pk
+
+    client = Client(HTTP_HOST=_host())
+    client.force_login(user)
+    results = {}
+    for label, name, kwargs, params in _views(purchase_id, invoice[0], staff_id, subcategory_id):
+        if only and label not in only:
+            continue
+        url = reverse(name, kwargs=kwargs)
+        timings, queries, status = [], [], None
+        for run in range(warmup + repeat):
+            if cold:
+                reports.report_cache.clear()
+                pricing.price_book.clear()
+                category_tree.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url, params)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = time.perf_counter() - started
+            status = response.status_code
+            if run >= warmup:
+                timings.append(elapsed * 1000)
+                queries.append(len(captured))
+        results[label] = {
+            'url': url,
+            'status': status,
+            'p50_ms': round(_percentile(timings, 50), 2),
+            'p95_ms': round(_percentile(timings, 95), 2),
+            'max_ms': round(max(timings), 2),
+            'queries': max(queries),
+            'peak_rss_mb': _peak_rss_mb(),
+        }
+    return {
+        'database': connection.vendor,
+        'repeat': repeat,
+        'cold': cold,
+        'purchases': Purchase._default_manager.count(),
+        'invoice_items': InvoiceItem._default_manager.count(),
+        'views': results,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
@@ -0,0 +1,142 @@
+"""
+Catalog module for the Bizeasy application.
+Versioned snapshot of what the billing screen sells, with deltas from a
+change log so counters load it once and keep it current cheaply.
+"""
+
+# Standard library imports
+from datetime import timedelta
+
+# Django imports
+from django.conf import settings
+from django.utils import timezone
+
+# Local imports
+from . import money
+from .models import CatalogChange, Category, Purchase, SubCategory
+
+
+DEFAULTS = {
+    # Clients further behind than this get the full snapshot again
+    'RETENTION_DAYS': 7,
+}
+
+KINDS = (CatalogChange.KIND_CATEGORY, CatalogChange.KIND_SUBCATEGORY, CatalogChange.KIND_PURCHASE)
+
+# Beyond this many changed rows the full snapshot is sent instead of a delta
+MAX_DELTA_ROWS = 5000
+
+
+def config(key):
+    """Read a ``CATALOG`` setting, falling back to DEFAULTS."""
+    return getattr(settings, 'CATALOG', {}).get(key, DEFAULTS[key])
+
+
+# ==============================================================================
+# Change Log
+# ==============================================================================
+
+def record(kind, ids):
+    """Log a change to each of the given objects (one INSERT)."""
+    ids = {int(pk) for pk in ids if pk is not None}
+    if ids:
+        CatalogChange._default_manager.bulk_create([CatalogChange(kind=kind, object_id=pk) for pk in sorted(ids)])
+
+
+def reset():
+    """Log that anything may have changed, after bulk writes that do not
+    record their rows; every client reloads the snapshot."""
+    CatalogChange._default_manager.create(kind=CatalogChange.KIND_RESET)
+
+
+def current_version():
+    """The latest catalog version, 0 before the first change."""
+    return CatalogChange._default_manager.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def etag(version):
+    return f'"catalog-{version}"'
+
+
+def prune(now=None):
+    """Drop log entries older than RETENTION_DAYS (always keeping the
+    latest, which is the version); returns the number deleted."""
+    cutoff = (now or timezone.now()) - timedelta(days=config('RETENTION_DAYS'))
+    latest = current_version()
+    deleted, _ = CatalogChange._default_manager.filter(changed_at__lt=cutoff, pk__lt=latest).delete()
+    return deleted
+
+
+# ==============================================================================
+# Snapshot And Deltas
+# ==============================================================================
+
+def sellable():
+    """Purchases the billing screen can sell from (same as load_products)."""
+    return Purchase._default_manager.filter(is_deleted=False, quantity__gt=0, kind=Purchase.KIND_PURCHASE)
+
+
+def _rows(categories, subcategories, purchases):
+    return {
+        'categories': list(categories.order_by('pk').values('id', 'name')),
+        'subcategories': list(subcategories.order_by('pk').values('id', 'category_id', 'name')),
+        'purchases': [
+            dict(row, sale_rate=money.number(row['sale_rate']), product_rate=money.number(row['product_rate']))
+            for row in purchases.order_by('pk').values(
+                'id', 'product_name', 'category_id', 'subcategory_id', 'quantity', 'sale_rate', 'product_rate'
+            )
+        ],
+    }
+
+
+def snapshot(version=None):
+    """Every category, subcategory and in-stock purchase, tagged with the
+    catalog version.
+
+    The version is read before the rows, so a change made meanwhile is
+    sent again in the next delta rather than missed.
+    """
+    version = current_version() if version is None else version
+    data = {'version': version, 'full': True}
+    data.update(_rows(
+        Category._default_manager.all(), SubCategory._default_manager.all(), sellable()
+    ))
+    return data
+
+
+def changes_since(since, version=None):
+    """What changed after version ``since``.
+
+    Changed rows are sent whole; ids that are gone (deleted or sold out)
+    are listed under ``removed``. Falls back to the full snapshot when the
+    log no longer reaches back to ``since``, a reset was logged, more
+    than MAX_DELTA_ROWS rows changed, or ``since`` is not a version this
+    database has issued.
+    """
+    version = current_version() if version is None else version
+    oldest = CatalogChange._default_manager.order_by('pk').values_list('pk', flat=True).first()
+    if since > version or (oldest is not None and since < oldest - 1):
+        return snapshot(version)
+    changed = {kind: set() for kind in KINDS}
+    for kind, object_id in (
+        CatalogChange._default_manager.filter(pk__gt=since, pk__lte=version)
+        .values_list('kind', 'object_id').distinct()
+    ):
+        if kind == CatalogChange.KIND_RESET:
+            return snapshot(version)
+        changed[kind].add(object_id)
+    if sum(len(ids) for ids in changed.values()) > MAX_DELTA_ROWS:
+        return snapshot(version)
+
+    data = {'version': version, 'full': False}
+    data.update(_rows(
+        Category._default_manager.filter(pk__in=changed[CatalogChange.KIND_CATEGORY]),
+        SubCategory._default_manager.filter(pk__in=changed[CatalogChange.KIND_SUBCATEGORY]),
+        sellable().filter(pk__in=changed[CatalogChange.KIND_PURCHASE]),
+    ))
+    data['removed'] = {
+        'categories': sorted(changed[CatalogChange.KIND_CATEGORY] - {row['id'] for row in data['categories']}),
+        'subcategories': sorted(changed[CatalogChange.KIND_SUBCATEGORY] - {row['id'] for row in data['subcategories']}),
+        'purchases': sorted(changed[CatalogChange.KIND_PURCHASE] - {row['id'] for row in data['purchases']}),
+    }
+    return data
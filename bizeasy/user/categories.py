@@ -0,0 +1,177 @@
+"""
+Category tree module for the Bizeasy application.
+In-process cache of every category and subcategory, read on nearly every page.
+"""
+
+# Standard library imports
+import threading
+import time
+
+# Django imports
+from django.conf import settings
+
+# Local imports
+from . import snapshots, versioning
+
+
+DEFAULTS = {
+    # How often a process checks the database stamp for other processes' edits
+    'CHECK_SECONDS': 5,
+}
+
+
+def config(key):
+    """Read a ``CATEGORY_TREE`` setting, falling back to DEFAULTS."""
+    return getattr(settings, 'CATEGORY_TREE', {}).get(key, DEFAULTS[key])
+
+
+class CategoryNode:
+    """A cached category; ``children`` are its SubCategoryNodes."""
+
+    __slots__ = ('id', 'name', 'description', 'children')
+
+    def __init__(self, id, name, description):
+        self.id, self.name, self.description = id, name, description
+        self.children = []
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __str__(self):
+        return self.name
+
+
+class SubCategoryNode:
+    """A cached subcategory; ``category`` is its parent CategoryNode."""
+
+    __slots__ = ('id', 'name', 'description', 'category')
+
+    def __init__(self, id, name, description, category):
+        self.id, self.name, self.description, self.category = id, name, description, category
+
+    @property
+    def pk(self):
+        return self.id
+
+    @property
+    def category_id(self):
+        return self.category.id
+
+    def __str__(self):
+        return f"{self.name} ({self.category.name})"
+
+
+class CategoryTree:
+    """Process-level cache of the category tree.
+
+    Loaded with one query and shared read-only by every request. Writes in
+    this process drop it through the signal handlers in ``user.signals``;
+    writes in other processes bump the ``categories`` data version, which
+    is compared at most every CHECK_SECONDS (and on any lookup miss).
+    Nodes carry ``id``, ``pk``, ``name`` and ``description`` like the model
+    instances, so templates and forms can use them in their place.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tree = None
+        self._stamp = None
+        self._checked = 0.0
+        # Bumped by clear(), so a load that raced a write is not kept
+        self._generation = 0
+
+    def _load(self):
+        from .models import Category
+
+        categories, subcategories = {}, {}
+        for pk, name, description, sub_pk, sub_name, sub_description in (
+            Category._default_manager.order_by('pk', 'subcategories__pk').values_list(
+                'pk', 'name', 'description',
+                'subcategories__pk', 'subcategories__name', 'subcategories__description',
+            )
+        ):
+            category = categories.get(pk)
+            if category is None:
+                category = categories[pk] = CategoryNode(pk, name, description)
+            if sub_pk is not None:
+                subcategory = subcategories[sub_pk] = SubCategoryNode(sub_pk, sub_name, sub_description, category)
+                category.children.append(subcategory)
+        return categories, dict(sorted(subcategories.items()))
+
+    def _nodes(self, revalidate=False):
+        """Return ``(categories, subcategories)`` dicts keyed by id."""
+        now = time.monotonic()
+        with self._lock:
+            tree, stamp, generation = self._tree, self._stamp, self._generation
+            due = tree is None or revalidate or now - self._checked >= config('CHECK_SECONDS')
+        if not due:
+            return tree
+        # Shared with the live pages, so never loaded from the report snapshot
+        with snapshots.live():
+            current = versioning.stamp(versioning.CATEGORIES)
+            if tree is None or current != stamp:
+                tree = self._load()
+        with self._lock:
+            if self._generation == generation:
+                self._tree, self._stamp, self._checked = tree, current, now
+        return tree
+
+    def _lookup(self, index, pk):
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            return None
+        node = self._nodes()[index].get(pk)
+        if node is None:
+            # Possibly created by another process since the last check
+            node = self._nodes(revalidate=True)[index].get(pk)
+        return node
+
+    def categories(self):
+        """Every category, in id order."""
+        return list(self._nodes()[0].values())
+
+    def subcategories(self, category_id=None):
+        """Every subcategory, or those of one category, in id order."""
+        if category_id is None:
+            return list(self._nodes()[1].values())
+        category = self.category(category_id)
+        return list(category.children) if category else []
+
+    def category(self, pk):
+        """The CategoryNode with this id, or None."""
+        return self._lookup(0, pk)
+
+    def subcategory(self, pk):
+        """The SubCategoryNode with this id, or None."""
+        return self._lookup(1, pk)
+
+    def category_name(self, pk):
+        category = self.category(pk)
+        return category.name if category else None
+
+    def category_choices(self):
+        """``(id, name)`` pairs for a category select."""
+        return [(category.id, category.name) for category in self.categories()]
+
+    def subcategory_choices(self):
+        """``(id, label)`` pairs for a subcategory select."""
+        return [(subcategory.id, str(subcategory)) for subcategory in self.subcategories()]
+
+    def subcategories_json(self):
+        """Subcategories for the purchase forms' category filter script."""
+        return [
+            {'id': str(subcategory.id), 'name': subcategory.name, 'category_id': str(subcategory.category_id)}
+            for subcategory in self.subcategories()
+        ]
+
+    def clear(self):
+        """Drop the tree; the next read reloads it."""
+        with self._lock:
+            self._tree = self._stamp = None
+            self._generation += 1
+
+
+# Shared instance used by the models, forms and views
+category_tree = CategoryTree()
@@ -0,0 +1,137 @@
+"""
+Checkout module for the Bizeasy application.
+Creates an invoice and takes its stock in a single transaction.
+"""
+
+# Standard library imports
+from collections import OrderedDict, namedtuple
+
+# Django imports
+from django.db.models import F
+from django.utils import timezone
+
+# Local imports
+from . import catalog, cube, ledger, sequences, stock, writes
+from .models import CatalogChange, Invoice, InvoiceItem, Purchase
+from .money import Money
+
+
+Line = namedtuple('Line', ['purchase_id', 'quantity', 'rate'])
+
+
+class CheckoutError(Exception):
+    """Raised when an invoice cannot be filled; the transaction is rolled back."""
+
+
+def parse_lines(data, prefix='items'):
+    """Read the invoice item formset posted by the billing page into Lines.
+
+    Rows without a product, quantity or price are skipped, as before.
+    """
+    lines = []
+    total_forms = int(data.get(f'{prefix}-TOTAL_FORMS', 0))
+    for i in range(total_forms):
+        product_id = data.get(f'{prefix}-{i}-product')
+        quantity = data.get(f'{prefix}-{i}-quantity')
+        price = data.get(f'{prefix}-{i}-price')
+        if product_id and quantity and price:
+            lines.append(Line(int(product_id), int(quantity), Money(price)))
+    return lines
+
+
+def _take_stock(lines):
+    """Decrement stock for every line, failing if any purchase runs short.
+
+    Lines are loaded (and locked where the database supports it) in one
+    query. Each decrement is a conditional UPDATE (which also bumps the
+    sold_quantity counter) so two terminals selling the last units cannot
+    both succeed.
+    """
+    wanted = OrderedDict()
+    for line in lines:
+        if line.quantity <= 0:
+            raise CheckoutError('Quantity must be at least 1')
+        wanted[line.purchase_id] = wanted.get(line.purchase_id, 0) + line.quantity
+
+    purchases = Purchase._default_manager.select_for_update().filter(
+        is_deleted=False
+    ).in_bulk(list(wanted))
+    if len(purchases) != len(wanted):
+        raise CheckoutError('Selected product is not available')
+
+    for purchase_id, quantity in wanted.items():
+        taken = Purchase._default_manager.filter(
+            pk=purchase_id, is_deleted=False, quantity__gte=quantity
+        ).update(quantity=F('quantity') - quantity, sold_quantity=F('sold_quantity') + quantity)
+        if not taken:
+            purchase = purchases[purchase_id]
+            available = Purchase._default_manager.filter(
+                pk=purchase_id
+            ).values_list('quantity', flat=True).first()
+            raise CheckoutError(
+                f'Not enough stock for {purchase.product_name}. '
+                f'Available: {available}, Requested: {quantity}'
+            )
+    return purchases
+
+
+def checkout(lines, customer_name, bill_number=None, customer_phone=None, customer_address='',
+             date=None, discount_amount=None, created_by=None):
+    """Create an invoice for ``lines`` and take the stock, all or nothing.
+
+    Totals are computed from the lines rather than re-read, items are
+    inserted with one ``bulk_create`` and the invoice is added to the daily
+    ledger and sales cube with F() updates rather than recomputing its
+    day inside the write lock. Without a ``bill_number`` the
+    next number is taken from the sequence allocator before the transaction
+    starts. Raises CheckoutError (after rolling back) if the invoice is
+    empty or any line is short of stock.
+    """
+    if not lines:
+        raise CheckoutError('Add at least one product to the invoice')
+    date = date or timezone.now().date()
+    bill_number = bill_number or sequences.next_bill_number(date)
+    return _create_invoice(
+        lines, customer_name, bill_number, customer_phone, customer_address, date, discount_amount, created_by
+    )
+
+
+@writes.write_transaction
+def _create_invoice(lines, customer_name, bill_number, customer_phone, customer_address, date,
+                    discount_amount, created_by):
+    """The checkout transaction; retried with the same bill number while
+    the database is busy."""
+    purchases = _take_stock(lines)
+
+    items = []
+    subtotal = Money()
+    for line in lines:
+        item = InvoiceItem(purchase=purchases[line.purchase_id], quantity=line.quantity, rate=line.rate)
+        item.calculate_line()
+        subtotal += item.total
+        items.append(item)
+
+    discount_amount = Money(discount_amount or 0)
+    invoice = Invoice._default_manager.create(
+        bill_number=bill_number,
+        customer_name=customer_name,
+        customer_phone=customer_phone,
+        customer_address=customer_address,
+        date=date,
+        discount_amount=discount_amount,
+        subtotal=subtotal,
+        total=subtotal - discount_amount,
+        created_by=created_by,
+    )
+    for item in items:
+        item.invoice = invoice
+    InvoiceItem._default_manager.bulk_create(items)
+    stock.record_sales(items, user=created_by)
+    # The stock UPDATEs send no signals either
+    catalog.record(CatalogChange.KIND_PURCHASE, purchases)
+
+    # bulk_create skips the per-item signals; the invoice's own post_save
+    # has added its income and count
+    ledger.add_to_day(invoice.date, item_count=len(items))
+    cube.add_items(items, invoice.date, invoice.created_by_id)
+    return invoice
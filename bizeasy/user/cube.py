@@ -0,0 +1,209 @@
+"""
+Sales cube module for the Bizeasy application.
+Maintains the pre-aggregated SalesCube and rolls it up for the reports.
+"""
+
+# Django imports
+from django.db import transaction
+from django.db.models import F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+# Local imports
+from .models import InvoiceItem, SalesCube
+from .money import Money, MoneyField
+from .utils import as_date, date_filter
+
+
+# Report grains: output key (as used by the report templates) -> cube path
+GRAINS = {
+    'product': {
+        'purchase__product_name': 'purchase__product_name',
+        'purchase__category__name': 'category__name',
+        'purchase__category__id': 'category_id',
+        'purchase__subcategory__name': 'subcategory__name',
+        'purchase__subcategory__id': 'subcategory_id',
+        'purchase__product_rate': 'purchase__product_rate',
+        'purchase__sale_rate': 'purchase__sale_rate',
+    },
+    'category': {
+        'purchase__category__name': 'category__name',
+        'purchase__category__id': 'category_id',
+    },
+    'subcategory': {
+        'purchase__category__name': 'category__name',
+        'purchase__category__id': 'category_id',
+        'purchase__subcategory__name': 'subcategory__name',
+        'purchase__subcategory__id': 'subcategory_id',
+    },
+}
+
+
+def _build_rows(condition):
+    """Aggregate the invoice items matching ``condition`` into cube rows."""
+    items = (
+        InvoiceItem._default_manager.filter(condition)
+        .values(
+            'invoice__date',
+            'invoice__created_by_id',
+            'purchase_id',
+            'purchase__category_id',
+            'purchase__subcategory_id',
+        )
+        .annotate(
+            qty=Sum('quantity'),
+            revenue=Sum('total'),
+            cost=Sum(F('quantity') * F('purchase__product_rate'), output_field=MoneyField()),
+        )
+    )
+    return [
+        SalesCube(
+            day=entry['invoice__date'],
+            created_by_id=entry['invoice__created_by_id'],
+            purchase_id=entry['purchase_id'],
+            category_id=entry['purchase__category_id'],
+            subcategory_id=entry['purchase__subcategory_id'],
+            qty=entry['qty'] or 0,
+            revenue=entry['revenue'],
+            cost=entry['cost'],
+        )
+        for entry in items
+    ]
+
+
+# ==============================================================================
+# Maintenance
+# ==============================================================================
+
+@transaction.atomic
+def refresh_days(dates):
+    """Recompute the cube rows for the given invoice days."""
+    days = {as_date(value) for value in dates} - {None}
+    if not days:
+        return
+    rows = _build_rows(Q(invoice__date__in=days))
+    SalesCube._default_manager.filter(day__in=days).delete()
+    SalesCube._default_manager.bulk_create(rows)
+
+
+@transaction.atomic
+def add_items(items, day, created_by_id):
+    """Add new invoice items to the cube with F() UPDATEs.
+
+    ``items`` are the new items of one invoice, with their purchases
+    loaded. Each purchase's existing row for the day and staff member is
+    updated in place and the missing rows are inserted together, so a sale
+    never recomputes the whole day; refresh_days and rebuild remain for
+    edits, deletes and backfills.
+    """
+    day = as_date(day)
+    totals = {}
+    for item in items:
+        purchase = item.purchase
+        key = (purchase.pk, purchase.category_id, purchase.subcategory_id)
+        qty, revenue, cost = totals.get(key, (0, Money(), Money()))
+        totals[key] = (
+            qty + item.quantity,
+            revenue + item.total,
+            cost + Money(item.quantity * purchase.product_rate),
+        )
+    new_rows = []
+    for (purchase_id, category_id, subcategory_id), (qty, revenue, cost) in totals.items():
+        key = dict(
+            day=day, purchase_id=purchase_id, category_id=category_id,
+            subcategory_id=subcategory_id, created_by_id=created_by_id,
+        )
+        updated = SalesCube._default_manager.filter(**key).update(
+            qty=F('qty') + qty,
+            revenue=F('revenue') + Value(revenue, output_field=MoneyField()),
+            cost=F('cost') + Value(cost, output_field=MoneyField()),
+        )
+        if not updated:
+            new_rows.append(SalesCube(qty=qty, revenue=revenue, cost=cost, **key))
+    SalesCube._default_manager.bulk_create(new_rows)
+
+
+@transaction.atomic
+def refresh_purchases(purchase_ids):
+    """Recompute the cube rows of purchases whose category or rate changed."""
+    purchase_ids = set(purchase_ids)
+    if not purchase_ids:
+        return
+    rows = _build_rows(Q(purchase_id__in=purchase_ids))
+    SalesCube._default_manager.filter(purchase_id__in=purchase_ids).delete()
+    SalesCube._default_manager.bulk_create(rows)
+
+
+@transaction.atomic
+def rebuild(from_date=None, to_date=None):
+    """Rebuild the cube for an inclusive date range (everything by default)."""
+    rows = _build_rows(date_filter('invoice__date', from_date=from_date, to_date=to_date))
+    SalesCube._default_manager.filter(
+        date_filter('day', from_date=from_date, to_date=to_date)
+    ).delete()
+    SalesCube._default_manager.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+# ==============================================================================
+# Queries
+# ==============================================================================
+
+def rollup(grain, from_date=None, to_date=None, include_deleted=False, **filters):
+    """Roll the cube up to a report grain.
+
+    Returns a list of dicts keyed like the old ``InvoiceItem`` GROUP BY
+    queries (``purchase__category__name``, ``total_qty``, ``profit``...)
+    ordered by profit, highest first. Extra keyword arguments filter the
+    cube rows, e.g. ``created_by=staff``.
+    """
+    fields = GRAINS[grain]
+    queryset = SalesCube._default_manager.filter(
+        date_filter('day', from_date=from_date, to_date=to_date), **filters
+    )
+    if not include_deleted:
+        queryset = queryset.filter(purchase__is_deleted=False)
+
+    rows = (
+        queryset.values(*fields.values())
+        .annotate(total_qty=Sum('qty'), total_amount=Sum('revenue'), total_cost=Sum('cost'))
+        .annotate(profit=F('total_amount') - F('total_cost'))
+        .order_by('-profit')
+    )
+    result = []
+    for row in rows:
+        entry = {key: row[path] for key, path in fields.items()}
+        entry.update(
+            total_qty=row['total_qty'],
+            total_amount=row['total_amount'],
+            total_cost=row['total_cost'],
+            profit=row['profit'],
+        )
+        result.append(entry)
+    return result
+
+
+def category_totals(from_date=None, to_date=None):
+    """Return ``{category_id: revenue}`` including soft-deleted purchases."""
+    return {
+        row['purchase__category__id']: row['total_amount']
+        for row in rollup('category', from_date, to_date, include_deleted=True)
+    }
+
+
+def sold_quantity(from_date=None, to_date=None):
+    """Expression for a purchase's units sold within an inclusive date range.
+
+    Without dates this is simply the ``Purchase.sold_quantity`` counter;
+    otherwise the cube's per-day quantities are summed in a subquery.
+    """
+    if not from_date and not to_date:
+        return F('sold_quantity')
+    sold = (
+        SalesCube._default_manager.filter(
+            date_filter('day', from_date=from_date, to_date=to_date), purchase=OuterRef('pk')
+        )
+        .values('purchase')
+        .annotate(total=Sum('qty'))
+        .values('total')
+    )
+    return Coalesce(Subquery(sold, output_field=IntegerField()), Value(0))
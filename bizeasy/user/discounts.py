@@ -0,0 +1,224 @@
+"""
+Discount resolution module for the Bizeasy application.
+Resolves discounts, derived status and final prices for purchases in SQL,
+and applies date-driven discount state transitions.
+"""
+
+# Standard library imports
+from datetime import timedelta
+
+# Django imports
+from django.db import transaction
+from django.db.models import (
+    Case, CharField, ExpressionWrapper, F, Min, OuterRef, Q, Subquery,
+    Value, When,
+)
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+
+# Local imports
+from . import catalog, versioning
+from .models import CatalogChange, Discount, Purchase, SellingProduct
+from .money import MoneyField
+
+
+# Derived discount states. Expired discounts are stored as 'rejected'.
+STATUS_PENDING = 'pending'
+STATUS_ACTIVE = 'active'
+STATUS_FINISHED = 'rejected'
+
+MONEY = MoneyField()
+
+
+def _discount_field(field):
+    """Subquery returning ``field`` of the purchase's most recent discount."""
+    latest = Discount._default_manager.filter(
+        product__purchase=OuterRef('pk')
+    ).order_by('-start_date', '-id')
+    return Subquery(latest.values(field)[:1])
+
+
+def status_expression(today):
+    """SQL expression deriving a discount's state from its date window."""
+    return Case(
+        When(start_date__gt=today, then=Value(STATUS_PENDING)),
+        When(end_date__lt=today, then=Value(STATUS_FINISHED)),
+        default=Value(STATUS_ACTIVE),
+        output_field=CharField(),
+    )
+
+
+def with_discounts(queryset=None, today=None):
+    """Annotate purchases with their effective discount.
+
+    Every row gets ``discount_id``, ``discount_percent`` (also exposed as
+    ``discount_percentage`` for the templates), ``start_date``, ``end_date``,
+    the derived ``status``, ``is_active`` and the ``final_price`` after the
+    discount. Everything is computed with correlated subqueries so the whole
+    page is one query.
+    """
+    today = today or timezone.now().date()
+    if queryset is None:
+        queryset = Purchase._default_manager.all()
+
+    latest_selling_price = SellingProduct._default_manager.filter(
+        product__purchase=OuterRef('pk')
+    ).order_by('-date_added').values('selling_price')[:1]
+
+    queryset = queryset.annotate(
+        discount_id=_discount_field('id'),
+        discount_percent=_discount_field('discount_percent'),
+        start_date=_discount_field('start_date'),
+        end_date=_discount_field('end_date'),
+        selling_price=Coalesce(
+            Subquery(latest_selling_price, output_field=MONEY),
+            F('product__selling_price'),
+            F('sale_rate'),
+            F('mrp'),
+            output_field=MONEY,
+        ),
+    ).annotate(
+        discount_percentage=F('discount_percent'),
+        status=status_expression(today),
+    ).annotate(
+        is_active=Case(
+            When(status=STATUS_ACTIVE, then=Value(True)),
+            default=Value(False),
+        ),
+        final_price=Case(
+            When(
+                status=STATUS_ACTIVE,
+                then=ExpressionWrapper(
+                    # Divide by 100.0 so paise are not truncated by integer division
+                    F('selling_price') * (Value(100) - F('discount_percent')) / Value(100.0),
+                    output_field=MONEY,
+                ),
+            ),
+            default=F('selling_price'),
+            output_field=MONEY,
+        ),
+    )
+    return queryset
+
+
+def discounted_purchases(status='', from_date=None, to_date=None, today=None):
+    """Purchases that carry a discount, filtered by derived status and dates.
+
+    ``status`` is one of 'pending', 'active' or 'finished'; when empty only
+    pending and active discounts are returned. With both dates a discount
+    matches if it starts or ends inside the range; with one date it matches
+    unless its whole window lies on the wrong side of it.
+    """
+    queryset = with_discounts(
+        Purchase._default_manager.select_related('category', 'subcategory').filter(
+            mrp__isnull=False, mrp__gt=0
+        ),
+        today=today,
+    ).filter(discount_id__isnull=False)
+
+    if status == 'finished':
+        queryset = queryset.filter(status=STATUS_FINISHED)
+    elif status:
+        queryset = queryset.filter(status=status)
+    else:
+        queryset = queryset.filter(status__in=[STATUS_PENDING, STATUS_ACTIVE])
+
+    if from_date and to_date:
+        queryset = queryset.filter(
+            Q(start_date__range=(from_date, to_date)) | Q(end_date__range=(from_date, to_date))
+        )
+    elif from_date:
+        queryset = queryset.exclude(start_date__lt=from_date, end_date__lt=from_date)
+    elif to_date:
+        queryset = queryset.exclude(start_date__gt=to_date, end_date__gt=to_date)
+
+    return queryset.order_by('-date', '-id')
+
+
+# ==============================================================================
+# Status Transitions
+# ==============================================================================
+
+def due_transitions(today=None):
+    """Discounts whose stored status no longer matches their date window."""
+    today = today or timezone.now().date()
+    return Discount._default_manager.annotate(
+        target_status=status_expression(today)
+    ).exclude(status=F('target_status'))
+
+
+def next_transition(today=None):
+    """Return the next day after ``today`` on which a discount changes state.
+
+    A discount becomes active on its ``start_date`` and finishes the day
+    after its ``end_date``; both columns are indexed so this is two index
+    seeks. Returns None when nothing is scheduled.
+    """
+    today = today or timezone.now().date()
+    upcoming = Discount._default_manager.aggregate(
+        next_start=Min('start_date', filter=Q(start_date__gt=today)),
+        next_end=Min('end_date', filter=Q(end_date__gte=today)),
+    )
+    candidates = []
+    if upcoming['next_start']:
+        candidates.append(upcoming['next_start'])
+    if upcoming['next_end']:
+        candidates.append(upcoming['next_end'] + timedelta(days=1))
+    return min(candidates) if candidates else None
+
+
+def apply_transitions(today=None, dry_run=False):
+    """Move due discounts to their new status and reprice their purchases.
+
+    Only discounts whose status actually changes are touched. Expiring
+    discounts revert ``Purchase.sale_rate`` to MRP and newly active ones then
+    set it to the discounted MRP, so a discount that follows another one
+    back to back wins. Both are single UPDATE statements inside one
+    transaction, which also bumps the reports and prices data versions.
+    With ``dry_run`` nothing is written. Returns a dict of counts
+    describing the changes.
+    """
+    today = today or timezone.now().date()
+    with transaction.atomic():
+        due = list(due_transitions(today).only('id', 'status'))
+        activated = [d.pk for d in due if d.target_status == STATUS_ACTIVE]
+        expired = [
+            d.pk for d in due
+            if d.status == STATUS_ACTIVE and d.target_status == STATUS_FINISHED
+        ]
+        to_activate = Purchase._default_manager.filter(product__discount__id__in=activated)
+        to_expire = Purchase._default_manager.filter(product__discount__id__in=expired)
+
+        metrics = {
+            'status_changed': len(due),
+            'activated': len(activated),
+            'expired': len(expired),
+        }
+        if dry_run:
+            metrics['purchases_repriced'] = to_activate.count() + to_expire.count()
+            return metrics
+
+        for discount in due:
+            discount.status = discount.target_status
+        Discount._default_manager.bulk_update(due, ['status'], batch_size=500)
+
+        # Expire first: a purchase can lose one discount and gain the next
+        repriced = to_expire.update(sale_rate=F('mrp'))
+        percent = Discount._default_manager.filter(
+            id__in=activated, product__purchase=OuterRef('pk')
+        ).values('discount_percent')[:1]
+        repriced += to_activate.update(
+            sale_rate=Round(
+                F('mrp') - F('mrp') * Subquery(percent) / Value(100.0),
+                output_field=MoneyField(),
+            )
+        )
+        metrics['purchases_repriced'] = repriced
+        if repriced:
+            # The UPDATEs send no signals; the bumps commit with them
+            versioning.bump(versioning.REPORTS)
+            versioning.bump(versioning.PRICES)
+        catalog.record(CatalogChange.KIND_PURCHASE, Purchase._default_manager.filter(
+            product__discount__id__in=activated + expired
+        ).values_list('pk', flat=True))
+    return metrics
@@ -0,0 +1,140 @@
+"""
+Expiry module for the Bizeasy application.
+Days-to-expiry and expiry buckets computed in SQL, and the daily
+near-expiry alert rows.
+"""
+
+# Standard library imports
+from datetime import timedelta
+
+# Django imports
+from django.db import transaction
+from django.db.models import Case, Count, DateField, F, Func, IntegerField, Q, Sum, Value, When
+from django.utils import timezone
+
+# Local imports
+from .models import ExpiryAlert, Purchase
+from .money import MoneyField
+
+
+# Upper bound (days to expiry) of each alert bucket
+BUCKETS = (
+    (ExpiryAlert.BUCKET_EXPIRED, -1),
+    (ExpiryAlert.BUCKET_WEEK, 7),
+    (ExpiryAlert.BUCKET_MONTH, 30),
+)
+BUCKET_LATER = 'later'
+
+
+class DaysUntil(Func):
+    """Whole days from ``day`` to a date column; negative once it has passed."""
+
+    output_field = IntegerField()
+
+    def __init__(self, expression, day, **extra):
+        super().__init__(expression, Value(day, output_field=DateField()), **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # date - date is a day count on PostgreSQL and Oracle
+        return super().as_sql(compiler, connection, template='(%(expressions)s)', arg_joiner=' - ', **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) AS INTEGER)', arg_joiner=') - julianday(',
+            **extra_context
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, template='DATEDIFF(%(expressions)s)', arg_joiner=', ', **extra_context)
+
+
+def live_batches():
+    """Live purchases (not deleted, not stock-update rows) that have an expiry date."""
+    return Purchase._default_manager.filter(
+        is_deleted=False, expire_date__isnull=False, kind=Purchase.KIND_PURCHASE
+    )
+
+
+def bucket(today):
+    """Expression naming each batch's expiry bucket as of ``today``."""
+    return Case(
+        *[
+            When(expire_date__lte=today + timedelta(days=days), then=Value(name))
+            for name, days in BUCKETS
+        ],
+        default=Value(BUCKET_LATER),
+    )
+
+
+def expiring(today=None, within=None):
+    """Live batches expiring within ``within`` days (all of them by default),
+    soonest first, annotated with ``days_to_expiry``. Expired batches are
+    always included.
+    """
+    today = today or timezone.now().date()
+    batches = live_batches()
+    if within is not None:
+        batches = batches.filter(expire_date__lte=today + timedelta(days=within))
+    return batches.annotate(days_to_expiry=DaysUntil('expire_date', today)).order_by('expire_date', 'pk')
+
+
+def bucket_counts(today=None, batches=None):
+    """Return ``{bucket: count}`` for the expired, week, month and later buckets."""
+    today = today or timezone.now().date()
+    counts, lower = {}, None
+    for name, days in BUCKETS:
+        condition = Q(expire_date__lte=today + timedelta(days=days))
+        if lower is not None:
+            condition &= Q(expire_date__gt=lower)
+        counts[name] = Count('pk', filter=condition)
+        lower = today + timedelta(days=days)
+    counts[BUCKET_LATER] = Count('pk', filter=Q(expire_date__gt=lower))
+    return (batches if batches is not None else live_batches()).aggregate(**counts)
+
+
+# ==============================================================================
+# Daily Alerts
+# ==============================================================================
+
+@transaction.atomic
+def record_alerts(day=None):
+    """Record the near-expiry stock per category and bucket for ``day``.
+
+    Replaces that day's rows and returns the number written.
+    """
+    day = day or timezone.now().date()
+    rows = (
+        live_batches()
+        .filter(quantity__gt=0, expire_date__lte=day + timedelta(days=BUCKETS[-1][1]))
+        .annotate(bucket=bucket(day))
+        .values('category_id', 'bucket')
+        .annotate(
+            batch_count=Count('pk'),
+            total_quantity=Sum('quantity'),
+            stock_value=Sum(F('quantity') * F('product_rate'), output_field=MoneyField()),
+        )
+        .order_by()
+    )
+    alerts = [
+        ExpiryAlert(
+            day=day,
+            category_id=row['category_id'],
+            bucket=row['bucket'],
+            batch_count=row['batch_count'],
+            quantity=row['total_quantity'] or 0,
+            stock_value=row['stock_value'],
+        )
+        for row in rows
+    ]
+    ExpiryAlert._default_manager.filter(day=day).delete()
+    ExpiryAlert._default_manager.bulk_create(alerts)
+    return len(alerts)
+
+
+def latest_alerts():
+    """Alert rows of the most recently recorded day, with their categories."""
+    day = ExpiryAlert._default_manager.order_by('-day').values_list('day', flat=True).first()
+    if day is None:
+        return []
+    return list(ExpiryAlert._default_manager.filter(day=day).select_related('category'))
@@ -0,0 +1,242 @@
+"""
+Export module for the Bizeasy application.
+Streams report sections and invoice tables as CSV or XLSX downloads.
+"""
+
+# Standard library imports
+import csv
+import tempfile
+
+# Django imports
+from django.db.models import F
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+# Local imports
+from . import expiry, reorder, reports
+from .models import CustomUser, InvoiceItem
+from .utils import as_date
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # pragma: no cover - XLSX export is optional
+    Workbook = None
+
+
+# Rows fetched per database round trip
+CHUNK_SIZE = 2000
+
+FORMATS = ('csv', 'xlsx')
+
+
+class ExportError(Exception):
+    """Raised for an unknown table or an unavailable format."""
+
+
+def _rows(queryset, *fields):
+    return queryset.values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+
+def _dates(params):
+    return as_date(params.get('from_date')), as_date(params.get('to_date'))
+
+
+# ==============================================================================
+# Tables
+# ==============================================================================
+# Each table takes the request and returns (header, rows); rows is an
+# iterator of tuples so nothing is held in memory beyond one chunk.
+
+def invoices(request):
+    header = ('Bill Number', 'Date', 'Customer', 'Phone', 'Subtotal', 'Discount', 'Roundoff', 'Total', 'Created By')
+    queryset = reports.visible_invoices(request.user, request.GET).order_by('date', 'id')
+    return header, _rows(
+        queryset, 'bill_number', 'date', 'customer_name', 'customer_phone',
+        'subtotal', 'discount_amount', 'roundoff', 'total', 'created_by__username',
+    )
+
+
+def invoice_items(request):
+    header = (
+        'Bill Number', 'Date', 'Customer', 'Product', 'Category', 'Subcategory',
+        'Quantity', 'Rate', 'Discount %', 'Discount', 'Total',
+    )
+    queryset = InvoiceItem._default_manager.filter(
+        invoice__in=reports.visible_invoices(request.user, request.GET)
+    ).order_by('invoice__date', 'invoice_id', 'id')
+    return header, _rows(
+        queryset, 'invoice__bill_number', 'invoice__date', 'invoice__customer_name',
+        'purchase__product_name', 'purchase__category__name', 'purchase__subcategory__name',
+        'quantity', 'rate', 'discount_percent', 'discount_amount', 'total',
+    )
+
+
+STOCK_HEADER = ('Product', 'Category', 'Subcategory', 'Purchase Date', 'Purchased', 'Sold', 'Balance')
+STOCK_FIELDS = ('product_name', 'category__name', 'subcategory__name', 'date', 'total_purchased', 'total_sold', 'balance')
+
+
+def stock_report(request):
+    queryset = reports.stock_report_purchases(request.GET).order_by('-date', '-id')
+    return STOCK_HEADER, _rows(queryset, *STOCK_FIELDS)
+
+
+def purchase_history(request):
+    header = (
+        'Product', 'Category', 'Subcategory', 'Date', 'Expire Date', 'Received', 'In Stock',
+        'Sold', 'Rate', 'Total Rate', 'MRP', 'Deleted', 'Notes',
+    )
+    queryset = reports.history_purchases(request.GET).order_by('-date', '-id')
+    return header, _rows(
+        queryset, 'product_name', 'category__name', 'subcategory__name', 'date', 'expire_date',
+        'received_quantity', 'quantity', 'sold_quantity', 'product_rate', 'total_rate', 'mrp',
+        'is_deleted', 'notes',
+    )
+
+
+# Shop report sections, filtered by the report's date range only
+
+def shop_summary(request):
+    summary = reports.sales_summary(reports.report_base(*_dates(request.GET)))
+    return ('Total Sales', 'Total Discount', 'Net Revenue'), iter([
+        (summary['total_sales'], summary['total_discount'], summary['net_revenue'])
+    ])
+
+
+def _rollup(grain, *keys):
+    def table(request):
+        # Rollups are already aggregated, so they are small enough to build at once
+        rows = reports.SECTIONS[f'{grain}_sales'](reports.report_base(*_dates(request.GET)))
+        header = keys + ('Quantity', 'Amount', 'Cost', 'Profit')
+        fields = {
+            'Product': 'purchase__product_name',
+            'Category': 'purchase__category__name',
+            'Subcategory': 'purchase__subcategory__name',
+        }
+        return header, (
+            tuple(row[fields[key]] for key in keys)
+            + (row['total_qty'], row['total_amount'], row['total_cost'], row['profit'])
+            for row in rows
+        )
+    return table
+
+
+def shop_invoices(request):
+    base = reports.report_base(*_dates(request.GET))
+    queryset = base.invoices.annotate(net_amount=F('total') - F('discount_amount')).order_by('-total')
+    return ('Bill Number', 'Date', 'Customer', 'Total', 'Discount', 'Net Amount'), _rows(
+        queryset, 'bill_number', 'date', 'customer_name', 'total', 'discount_amount', 'net_amount'
+    )
+
+
+def shop_stock(request):
+    base = reports.report_base(*_dates(request.GET))
+    queryset = reports.stock_levels(base.purchases, base.from_date, base.to_date).order_by('balance', 'pk')
+    return STOCK_HEADER, _rows(queryset, *STOCK_FIELDS)
+
+
+def shop_expiry(request):
+    header = ('Product', 'Category', 'Subcategory', 'Purchase Date', 'Expire Date', 'Quantity', 'Days To Expiry')
+    return header, _rows(
+        expiry.expiring(), 'product_name', 'category__name', 'subcategory__name', 'date', 'expire_date',
+        'quantity', 'days_to_expiry',
+    )
+
+
+def shop_staff(request):
+    queryset = CustomUser._default_manager.filter(role='staff').order_by('username')
+    return ('Username', 'Email', 'Phone', 'Session', 'Last Login', 'Work Hours'), _rows(
+        queryset, 'username', 'email', 'phone_number', 'session_number', 'last_login', 'work_hours'
+    )
+
+
+def reorder_suggestions(request):
+    header = (
+        'Product', 'Category', 'Subcategory', 'On Hand', 'Sold Per Day', 'Days Of Cover',
+        'Reorder Point', 'Suggested Quantity', 'Status',
+    )
+    return header, _rows(
+        reorder.suggestions(request.GET), 'purchase__product_name', 'purchase__category__name',
+        'purchase__subcategory__name', 'on_hand', 'velocity', 'days_of_cover', 'reorder_point',
+        'suggested_quantity', 'status',
+    )
+
+
+# Export name -> table
+TABLES = {
+    'invoices': invoices,
+    'invoice-items': invoice_items,
+    'stock-report': stock_report,
+    'purchase-history': purchase_history,
+    'shop-summary': shop_summary,
+    'shop-products': _rollup('product', 'Product', 'Category', 'Subcategory'),
+    'shop-categories': _rollup('category', 'Category'),
+    'shop-subcategories': _rollup('subcategory', 'Category', 'Subcategory'),
+    'shop-invoices': shop_invoices,
+    'shop-stock': shop_stock,
+    'shop-expiry': shop_expiry,
+    'shop-staff': shop_staff,
+    'reorder-suggestions': reorder_suggestions,
+}
+
+# Tables only owners may export, like the pages they come from
+OWNER_TABLES = {'reorder-suggestions'}
+
+
+# ==============================================================================
+# Writers
+# ==============================================================================
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    """Yield the CSV lines for a header and an iterator of rows."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def csv_response(filename, header, rows):
+    response = StreamingHttpResponse(stream_csv(header, rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def xlsx_response(filename, header, rows):
+    """Write the rows to a temporary workbook and stream the file.
+
+    openpyxl's write-only mode flushes rows to disk as they are appended, so
+    memory stays flat; the finished file is then sent in chunks.
+    """
+    if Workbook is None:
+        raise ExportError('XLSX export needs the openpyxl package; use CSV instead')
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(filename[:31])
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(
+        output, as_attachment=True, filename=f'{filename}.xlsx',
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
+
+def export(request, table, export_format='csv'):
+    """Return a download response for one of the TABLES."""
+    if table not in TABLES:
+        raise ExportError(f'Unknown export: {table}')
+    if export_format not in FORMATS:
+        raise ExportError(f'Unknown format: {export_format}')
+    header, rows = TABLES[table](request)
+    filename = f"{table}-{timezone.now().date().isoformat()}"
+    if export_format == 'xlsx':
+        return xlsx_response(filename, header, rows)
+    return csv_response(filename, header, rows)
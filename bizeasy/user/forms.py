@@ -5,6 +5,7 @@ from decimal import Decimal
 import re
 
 # Local imports
+from .categories import category_tree
 from .models import Category, SubCategory, Purchase, Product, Discount, Invoice, InvoiceItem, SellingProduct, CustomUser
 
 
@@ -21,6 +22,25 @@ def sanitize_input(input_str):
     return sanitized
 
 
+class CategoryChoicesMixin:
+    """Fills the category and subcategory selects from the cached category
+    tree rather than querying them (and each subcategory's category).
+
+    Submitted values are still checked against the database.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name, choices in (
+            ('category', category_tree.category_choices),
+            ('subcategory', category_tree.subcategory_choices),
+        ):
+            field = self.fields.get(name)
+            if field is not None:
+                empty = [] if field.empty_label is None else [('', field.empty_label)]
+                field.choices = empty + choices()
+
+
 # ==============================================================================
 # Category Management Forms
 # ==============================================================================
@@ -56,7 +76,7 @@ class CategoryForm(forms.ModelForm):
         return name
 
 
-class SubCategoryForm(forms.ModelForm):
+class SubCategoryForm(CategoryChoicesMixin, forms.ModelForm):
     """Form for creating and editing subcategories."""
     class Meta:
         model = SubCategory
@@ -97,7 +117,7 @@ class SubCategoryForm(forms.ModelForm):
 # Purchase Management Forms
 # ==============================================================================
 
-class PurchaseForm(forms.ModelForm):
+class PurchaseForm(CategoryChoicesMixin, forms.ModelForm):
     """Form for creating and editing purchases."""
     class Meta:
         model = Purchase
@@ -224,7 +244,7 @@ class PurchaseForm(forms.ModelForm):
 class PurchaseEditForm(PurchaseForm):
     """Form for editing purchases with additional change_price field."""
     # Extends the same fields, with one additional field: change_price
-    change_price = forms.FloatField(required=False, label='Change Price')
+    change_price = forms.DecimalField(required=False, decimal_places=2, label='Change Price')
 
     class Meta(PurchaseForm.Meta):
         fields = PurchaseForm.Meta.fields + ['change_price']
@@ -240,7 +260,7 @@ class PurchaseEditForm(PurchaseForm):
 # Product Management Forms
 # ==============================================================================
 
-class ProductForm(forms.ModelForm):
+class ProductForm(CategoryChoicesMixin, forms.ModelForm):
     """Form for creating and editing products."""
     class Meta:
         model = Product
@@ -0,0 +1,305 @@
+"""
+Import module for the Bizeasy application.
+Loads a supplier's catalog and opening purchases from CSV or XLSX in bulk.
+"""
+
+# Standard library imports
+import csv
+import io
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+# Django imports
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+# Local imports
+from . import catalog, ledger, search, versioning
+from .categories import category_tree
+from .models import Category, Purchase, SubCategory
+from .money import Money
+from .utils import as_date
+
+try:
+    from openpyxl import load_workbook
+except ImportError:  # pragma: no cover - XLSX import is optional
+    load_workbook = None
+
+
+# Rows per INSERT
+CHUNK_SIZE = 1000
+
+FORMATS = ('csv', 'xlsx')
+
+REQUIRED_COLUMNS = ('product_name', 'category', 'subcategory', 'quantity', 'product_rate', 'mrp', 'date')
+OPTIONAL_COLUMNS = ('sale_rate', 'expire_date', 'notes')
+
+
+class CatalogImportError(Exception):
+    """Raised for an unreadable file, an unknown format or missing columns."""
+
+
+# ``line`` is the spreadsheet line number; the header is line 1
+RowError = namedtuple('RowError', 'line message')
+
+ImportResult = namedtuple('ImportResult', 'rows categories subcategories purchases errors')
+
+
+# ==============================================================================
+# Reading
+# ==============================================================================
+
+def detect_format(filename):
+    """'csv' or 'xlsx' from a file name's extension."""
+    extension = Path(filename or '').suffix.lower().lstrip('.')
+    if extension not in FORMATS:
+        raise CatalogImportError(f'Unknown format: {extension or filename}; use CSV or XLSX')
+    return extension
+
+
+def _column(name):
+    return str(name or '').strip().lower().replace(' ', '_')
+
+
+def _records(header, rows):
+    """Yield ``(line, {column: value})`` for each non-empty row."""
+    columns = [_column(name) for name in header]
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise CatalogImportError(f"Missing columns: {', '.join(missing)}")
+    for line, row in enumerate(rows, start=2):
+        values = [value.strip() if isinstance(value, str) else value for value in row]
+        if all(value in (None, '') for value in values):
+            continue
+        yield line, dict(zip(columns, values))
+
+
+def read_rows(file, file_format='csv'):
+    """Return ``[(line, {column: value})]`` for a CSV or XLSX file.
+
+    ``file`` is a path or a binary file object (such as an upload).
+    Column names are matched case-insensitively, spaces read as underscores.
+    """
+    if file_format not in FORMATS:
+        raise CatalogImportError(f'Unknown format: {file_format}')
+    if isinstance(file, (str, Path)):
+        with open(file, 'rb') as handle:
+            return read_rows(handle, file_format)
+
+    if file_format == 'xlsx':
+        if load_workbook is None:
+            raise CatalogImportError('XLSX import needs the openpyxl package; use CSV instead')
+        try:
+            workbook = load_workbook(file, read_only=True, data_only=True)
+        except Exception as e:
+            raise CatalogImportError(f'Could not read the workbook: {e}')
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                raise CatalogImportError('The file is empty')
+            return list(_records(header, rows))
+        finally:
+            workbook.close()
+
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        rows = csv.reader(text)
+        header = next(rows, None)
+        if header is None:
+            raise CatalogImportError('The file is empty')
+        return list(_records(header, rows))
+    except UnicodeDecodeError:
+        raise CatalogImportError('The CSV file must be UTF-8 encoded')
+    finally:
+        # Leave the caller's file open
+        text.detach()
+
+
+# ==============================================================================
+# Validation
+# ==============================================================================
+# Rows are checked in memory without touching the database; the existing
+# category and subcategory names are then fetched once each and matched
+# case-insensitively, instead of the per-row queries of the model clean()s.
+
+def _text(record, column):
+    value = record.get(column)
+    return '' if value is None else str(value).strip()
+
+
+def _quantity(value):
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValidationError(f"Quantity '{value}' is not a number.")
+    if number != number.to_integral_value():
+        raise ValidationError(f"Quantity '{value}' must be a whole number.")
+    return int(number)
+
+
+def _money(value, label, required=True):
+    if value in (None, ''):
+        if required:
+            raise ValidationError(f"{label} is required.")
+        return None
+    try:
+        return Money(str(value).strip().replace(',', ''))
+    except InvalidOperation:
+        raise ValidationError(f"{label} '{value}' is not an amount.")
+
+
+def _date(value, label, required=True):
+    if value in (None, ''):
+        if required:
+            raise ValidationError(f"{label} is required.")
+        return None
+    try:
+        return as_date(value)
+    except ValidationError:
+        raise ValidationError(f"{label} '{value}' is not a date (use YYYY-MM-DD).")
+
+
+def _purchase(record):
+    """Build an unsaved Purchase from a record; raises ValidationError."""
+    name = _text(record, 'product_name')
+    if len(name) > Purchase._meta.get_field('product_name').max_length:
+        raise ValidationError("Product name is too long.")
+    purchase = Purchase(
+        product_name=name,
+        quantity=_quantity(record.get('quantity')),
+        product_rate=_money(record.get('product_rate'), 'Product rate'),
+        mrp=_money(record.get('mrp'), 'MRP'),
+        sale_rate=_money(record.get('sale_rate'), 'Sale rate', required=False),
+        date=_date(record.get('date'), 'Date'),
+        expire_date=_date(record.get('expire_date'), 'Expire date', required=False),
+        notes=_text(record, 'notes') or None,
+    )
+    # Purchase.clean() only looks at the instance's own fields
+    purchase.clean()
+    purchase.total_rate = purchase.quantity * purchase.product_rate
+    purchase.received_quantity = purchase.quantity
+    return purchase
+
+
+def validate(records):
+    """Check every record; returns ``(rows, errors)``.
+
+    ``rows`` is ``[(category_name, subcategory_name, purchase)]`` with the
+    names as given; ``errors`` is a list of RowError.
+    """
+    max_length = Category._meta.get_field('name').max_length
+    rows, errors = [], []
+    for line, record in records:
+        category_name, subcategory_name = _text(record, 'category'), _text(record, 'subcategory')
+        try:
+            if not category_name:
+                raise ValidationError("Category is required.")
+            if not subcategory_name:
+                raise ValidationError("Subcategory is required.")
+            if max(len(category_name), len(subcategory_name)) > max_length:
+                raise ValidationError(f"Category and subcategory names are limited to {max_length} characters.")
+            purchase = _purchase(record)
+        except ValidationError as e:
+            errors.extend(RowError(line, message) for message in e.messages)
+            continue
+        rows.append((category_name, subcategory_name, purchase))
+    return rows, errors
+
+
+# ==============================================================================
+# Import
+# ==============================================================================
+
+def _category_map():
+    """Lower-cased name -> (id, name) of every category."""
+    return {name.lower(): (pk, name) for pk, name in Category._default_manager.values_list('pk', 'name')}
+
+
+def _subcategory_map():
+    """(category id, lower-cased name) -> (id, name) of every subcategory."""
+    return {
+        (category_id, name.lower()): (pk, name)
+        for pk, category_id, name in SubCategory._default_manager.values_list('pk', 'category_id', 'name')
+    }
+
+
+def _create_categories(rows):
+    """Create the categories and subcategories named by ``rows`` that do not
+    exist yet (case-insensitive).
+
+    Returns ``(categories, subcategories, created categories, created
+    subcategories)``, the maps covering the new rows too.
+    """
+    categories = _category_map()
+    new_categories = {}
+    for category_name, _, _ in rows:
+        if category_name.lower() not in categories:
+            new_categories.setdefault(category_name.lower(), category_name)
+    if new_categories:
+        # Same description Category.save() would set
+        Category._default_manager.bulk_create([
+            Category(name=name, description=f"All items of {name} company") for name in new_categories.values()
+        ], batch_size=CHUNK_SIZE)
+        # Not every backend returns the new ids from bulk_create
+        categories = _category_map()
+
+    subcategories = _subcategory_map()
+    new_subcategories = {}
+    for category_name, subcategory_name, _ in rows:
+        category = categories[category_name.lower()]
+        key = (category[0], subcategory_name.lower())
+        if key not in subcategories:
+            new_subcategories.setdefault(key, (category[1], subcategory_name))
+    if new_subcategories:
+        # Same title-cased name and description SubCategory.save() would set
+        SubCategory._default_manager.bulk_create([
+            SubCategory(category_id=category_id, name=name.title(), description=f"{category_name} {name} items")
+            for (category_id, _), (category_name, name) in new_subcategories.items()
+        ], batch_size=CHUNK_SIZE)
+        subcategories = _subcategory_map()
+    return categories, subcategories, len(new_categories), len(new_subcategories)
+
+
+def import_rows(records, dry_run=False):
+    """Validate ``records`` (from read_rows) and insert them.
+
+    Nothing is written if any row has an error, or with ``dry_run``.
+    Missing categories and subcategories are created; purchases are
+    inserted in chunks of CHUNK_SIZE inside one transaction, after which
+    the daily ledger, the search index, category tree, report caches and
+    the billing catalog are refreshed (bulk_create sends no signals). Returns an ImportResult.
+    """
+    records = list(records)
+    rows, errors = validate(records)
+    if errors or dry_run or not rows:
+        return ImportResult(len(records), 0, 0, 0, errors)
+
+    with transaction.atomic():
+        categories, subcategories, new_categories, new_subcategories = _create_categories(rows)
+        if new_categories or new_subcategories:
+            versioning.bump(versioning.CATEGORIES)
+            category_tree.clear()
+        purchases = []
+        for category_name, subcategory_name, purchase in rows:
+            purchase.category_id, category = categories[category_name.lower()]
+            purchase.subcategory_id, subcategory = subcategories[(purchase.category_id, subcategory_name.lower())]
+            if not purchase.notes:
+                purchase.notes = f"Purchase of {purchase.product_name} in {category} - {subcategory}"
+            purchases.append(purchase)
+        last_pk = Purchase._default_manager.order_by('-pk').values_list('pk', flat=True).first() or 0
+        Purchase._default_manager.bulk_create(purchases, batch_size=CHUNK_SIZE)
+        new_ids = list(Purchase._default_manager.filter(pk__gt=last_pk).values_list('pk', flat=True))
+
+        ledger.refresh_days({purchase.date for purchase in purchases})
+        search.index_purchases(new_ids)
+        versioning.bump(versioning.REPORTS)
+        # Billing screens reload the catalog rather than take a delta this size
+        catalog.reset()
+    return ImportResult(len(records), new_categories, new_subcategories, len(purchases), [])
+
+
+def import_file(file, file_format='csv', dry_run=False):
+    """Read and import a CSV or XLSX file; see import_rows."""
+    return import_rows(read_rows(file, file_format), dry_run=dry_run)
@@ -0,0 +1,182 @@
+"""
+Invoice batch module for the Bizeasy application.
+Renders many invoices to PDF in a process pool and zips them up.
+"""
+
+# Standard library imports
+import hashlib
+import multiprocessing
+import os
+import re
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Django imports
+from django.conf import settings
+from django.db.models import Prefetch
+from django.template.loader import render_to_string
+
+# Local imports
+from . import pdf
+from .models import Invoice, InvoiceItem
+from .utils import as_date, date_filter
+
+
+DEFAULTS = {
+    'OUTPUT_DIR': 'invoice_pdfs',
+    'WORKERS': None,
+    'CHUNK_SIZE': 200,
+}
+
+TEMPLATE = 'print_invoice.html'
+
+
+def config(key):
+    """Read an ``INVOICE_PDFS`` setting, falling back to DEFAULTS."""
+    return getattr(settings, 'INVOICE_PDFS', {}).get(key, DEFAULTS[key])
+
+
+class BatchError(Exception):
+    """Raised for an invalid selection or an unavailable output format."""
+
+
+BatchResult = namedtuple('BatchResult', 'zip_path total rendered skipped')
+
+
+# ==============================================================================
+# Selection
+# ==============================================================================
+
+def parse_ids(value):
+    """Parse '1, 2,3' (or a list) into a list of invoice ids."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    try:
+        return [int(str(pk).strip()) for pk in value if str(pk).strip()]
+    except ValueError:
+        raise BatchError('Invoice ids must be numbers')
+
+
+def select_invoices(from_date=None, to_date=None, ids=None):
+    """Invoices in an inclusive date range and/or with the given ids."""
+    from_date, to_date, ids = as_date(from_date), as_date(to_date), parse_ids(ids)
+    if not (from_date or to_date or ids):
+        raise BatchError('Give a date range or a list of invoice ids')
+    invoices = Invoice._default_manager.filter(date_filter('date', from_date=from_date, to_date=to_date))
+    if ids:
+        invoices = invoices.filter(pk__in=ids)
+    return invoices.order_by('date', 'pk')
+
+
+def batch_name(from_date=None, to_date=None, ids=None):
+    """Zip file name for a selection, stable so a rerun resumes the same batch."""
+    ids = parse_ids(ids)
+    name = f"invoices_{as_date(from_date) or 'start'}_{as_date(to_date) or 'end'}"
+    if ids:
+        name += '_' + hashlib.sha256(','.join(map(str, sorted(ids))).encode()).hexdigest()[:8]
+    return name
+
+
+def _chunks(invoices, size):
+    """Yield lists of invoices with their items and purchases prefetched."""
+    ids = list(invoices.values_list('pk', flat=True))
+    items = InvoiceItem._default_manager.select_related('purchase').order_by('pk')
+    for start in range(0, len(ids), size):
+        yield list(
+            Invoice._default_manager.filter(pk__in=ids[start:start + size])
+            .select_related('created_by')
+            .prefetch_related(Prefetch('items', queryset=items))
+            .order_by('date', 'pk')
+        )
+
+
+# ==============================================================================
+# Rendering
+# ==============================================================================
+
+def _safe(value):
+    return re.sub(r'[^\w.-]+', '_', value).strip('_') or 'invoice'
+
+
+def render_batch(invoices, output_format='pdf', output_dir=None, name='invoices',
+                 workers=None, chunk_size=None, progress=None):
+    """Render ``invoices`` and write ``<output_dir>/<name>.zip``.
+
+    Each invoice is rendered to HTML here and converted by a pool of
+    worker processes. Files are stored as ``<id>-<content hash>.<ext>`` in
+    ``<output_dir>/files``, so a rerun (after an interruption, or for an
+    overlapping range) skips every invoice whose rendered content has not
+    changed. ``progress(done, total)`` is called after each chunk.
+    """
+    if output_format not in pdf.FORMATS:
+        raise BatchError(f'Unknown format: {output_format}')
+    if not pdf.available(output_format):
+        raise BatchError('PDF output needs the xhtml2pdf package; use the html format instead')
+    extension = pdf.FORMATS[output_format]
+    output_dir = Path(output_dir or config('OUTPUT_DIR'))
+    if not output_dir.is_absolute():
+        output_dir = Path(settings.BASE_DIR) / output_dir
+    files_dir = output_dir / 'files'
+    files_dir.mkdir(parents=True, exist_ok=True)
+
+    workers = workers or config('WORKERS') or os.cpu_count() or 1
+    # Spawned workers import only user.pdf, never the parent's threads or connections
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) if workers > 1 else None
+
+    total = invoices.count()
+    entries = []
+    rendered = skipped = 0
+    try:
+        for chunk in _chunks(invoices, chunk_size or config('CHUNK_SIZE')):
+            pending = {}
+            for invoice in chunk:
+                html = render_to_string(TEMPLATE, {'invoice': invoice})
+                digest = hashlib.sha256(f'{output_format}\n{html}'.encode()).hexdigest()[:16]
+                path = files_dir / f'{invoice.pk}-{digest}.{extension}'
+                entries.append((path, f'{_safe(invoice.bill_number)}.{extension}'))
+                if path.exists():
+                    skipped += 1
+                else:
+                    pending[path] = (invoice.pk, html)
+
+            if pool is not None:
+                futures = {path: pool.submit(pdf.convert, html, output_format) for path, (_, html) in pending.items()}
+                documents = ((path, future.result()) for path, future in futures.items())
+            else:
+                documents = ((path, pdf.convert(html, output_format)) for path, (_, html) in pending.items())
+            for path, document in documents:
+                invoice_id = pending[path][0]
+                partial = path.with_suffix('.part')
+                partial.write_bytes(document)
+                os.replace(partial, path)
+                # Drop the files of earlier, now stale, renderings
+                for stale in files_dir.glob(f'{invoice_id}-*.{extension}'):
+                    if stale != path:
+                        stale.unlink()
+                rendered += 1
+
+            if progress:
+                progress(rendered + skipped, total)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    zip_path = output_dir / f'{name}.zip'
+    partial = zip_path.with_suffix('.part')
+    with zipfile.ZipFile(partial, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for path, arcname in entries:
+            archive.write(path, arcname)
+    os.replace(partial, zip_path)
+    return BatchResult(zip_path, total, rendered, skipped)
+
+
+def render_selection(from_date=None, to_date=None, ids=None, output_format='pdf', **options):
+    """Select invoices by date range and/or ids and render them as one batch."""
+    return render_batch(
+        select_invoices(from_date, to_date, ids), output_format=output_format,
+        name=batch_name(from_date, to_date, ids), **options
+    )
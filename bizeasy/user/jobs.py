@@ -0,0 +1,187 @@
+"""
+Report job module for the Bizeasy application.
+Queues long-running reports in the database and runs them in a worker.
+"""
+
+# Standard library imports
+import hashlib
+import json
+from datetime import timedelta
+from pathlib import Path
+
+# Django imports
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+# Local imports
+from . import invoice_batch, reports
+from .models import CustomUser, ReportJob
+
+
+DEFAULTS = {
+    'CONCURRENCY': 2,
+    'POLL_INTERVAL': 2,
+    'STALE_AFTER': 900,
+    'KEEP_DAYS': 7,
+}
+
+
+def config(key):
+    """Read a ``REPORT_JOBS`` setting, falling back to DEFAULTS."""
+    return getattr(settings, 'REPORT_JOBS', {}).get(key, DEFAULTS[key])
+
+
+class JobError(Exception):
+    """Raised for an unknown report kind or invalid parameters."""
+
+
+# ==============================================================================
+# Report Kinds
+# ==============================================================================
+# Each handler takes the job's parameters and a progress(done, total)
+# callback and returns (content, content_type); content is the result text,
+# or the Path of a file the result view should send.
+
+def shop_report(params, progress=None):
+    return render_to_string('shop_report.html', reports.shop_report_context(params)), 'text/html'
+
+
+def staff_wise_report(params, progress=None):
+    staff = CustomUser._default_manager.filter(pk=params.get('staff_id'), role='staff').first()
+    if staff is None:
+        raise JobError('Staff member not found')
+    return render_to_string('staff_wise_report.html', reports.staff_report_context(staff, params)), 'text/html'
+
+
+def dashboard_data(params, progress=None):
+    return json.dumps(reports.dashboard_data(params), cls=DjangoJSONEncoder), 'application/json'
+
+
+def invoice_pdfs(params, progress=None):
+    result = invoice_batch.render_selection(
+        params.get('from_date'), params.get('to_date'), params.get('ids'),
+        output_format=params.get('format', 'pdf'), progress=progress,
+    )
+    return result.zip_path, 'application/zip'
+
+
+HANDLERS = {
+    'shop_report': shop_report,
+    'staff_wise_report': staff_wise_report,
+    'dashboard_data': dashboard_data,
+    'invoice_pdfs': invoice_pdfs,
+}
+
+# Kinds only owners may queue
+OWNER_KINDS = ('invoice_pdfs',)
+
+# Parameters each kind reads; anything else is dropped before hashing
+PARAMS = {
+    'shop_report': ('from_date', 'to_date'),
+    'staff_wise_report': ('staff_id', 'from_date', 'to_date'),
+    'dashboard_data': ('from_date', 'to_date', 'period'),
+    'invoice_pdfs': ('from_date', 'to_date', 'ids', 'format'),
+}
+
+
+# ==============================================================================
+# Queue
+# ==============================================================================
+
+def normalise(kind, params):
+    """Keep the parameters ``kind`` reads, as strings, dropping blanks."""
+    return {
+        key: str(params[key]) for key in PARAMS[kind]
+        if params.get(key) not in (None, '')
+    }
+
+
+def params_hash(kind, params, user=None):
+    user_id = user.pk if user is not None else None
+    return hashlib.sha256(json.dumps([kind, params, user_id], sort_keys=True).encode()).hexdigest()
+
+
+def submit(kind, params, user=None):
+    """Queue a report job and return it.
+
+    If an identical job (same kind, parameters and user) is still pending
+    or running, that job is returned instead of queueing another. Jobs are
+    not shared between users, since only the requester (or the owner) may
+    read a job's result.
+    """
+    if kind not in HANDLERS:
+        raise JobError(f'Unknown report: {kind}')
+    params = normalise(kind, params)
+    digest = params_hash(kind, params, user)
+    live = ReportJob._default_manager.filter(params_hash=digest, status__in=ReportJob.ACTIVE_STATUSES)
+    while True:
+        job = live.first()
+        if job is not None:
+            return job
+        try:
+            with transaction.atomic():
+                return ReportJob._default_manager.create(
+                    kind=kind, params=params, params_hash=digest, requested_by=user
+                )
+        except IntegrityError:
+            # An identical job was queued concurrently
+            pass
+
+
+def claim(worker):
+    """Mark the oldest pending job as running for ``worker``.
+
+    Returns the job, or None when the queue is empty. The status change is
+    a compare-and-swap UPDATE, so two workers never claim the same job.
+    """
+    pending = ReportJob._default_manager.filter(status=ReportJob.STATUS_PENDING)
+    while True:
+        job = pending.order_by('created_at', 'pk').first()
+        if job is None:
+            return None
+        now = timezone.now()
+        if pending.filter(pk=job.pk).update(status=ReportJob.STATUS_RUNNING, started_at=now, worker=worker):
+            job.status, job.started_at, job.worker = ReportJob.STATUS_RUNNING, now, worker
+            return job
+
+
+def run(job):
+    """Compute a claimed job and store its result or error."""
+    def progress(done, total):
+        ReportJob._default_manager.filter(pk=job.pk).update(progress=done * 100 // total if total else 100)
+
+    try:
+        content, content_type = HANDLERS[job.kind](job.params, progress)
+    except Exception as e:
+        fields = {'status': ReportJob.STATUS_FAILED, 'error': f'{type(e).__name__}: {e}'}
+    else:
+        fields = {'status': ReportJob.STATUS_DONE, 'content_type': content_type, 'progress': 100}
+        if isinstance(content, Path):
+            fields['result_file'] = str(content)
+        else:
+            fields['result'] = content
+    fields['finished_at'] = timezone.now()
+    ReportJob._default_manager.filter(pk=job.pk).update(**fields)
+    for name, value in fields.items():
+        setattr(job, name, value)
+    return job
+
+
+def requeue_stale(seconds=None):
+    """Put jobs left running by a dead worker back in the queue."""
+    cutoff = timezone.now() - timedelta(seconds=seconds or config('STALE_AFTER'))
+    return ReportJob._default_manager.filter(
+        status=ReportJob.STATUS_RUNNING, started_at__lt=cutoff
+    ).update(status=ReportJob.STATUS_PENDING, started_at=None, worker='')
+
+
+def purge(days=None):
+    """Delete finished jobs older than ``days``; returns how many went."""
+    cutoff = timezone.now() - timedelta(days=days or config('KEEP_DAYS'))
+    deleted, _ = ReportJob._default_manager.filter(
+        status__in=(ReportJob.STATUS_DONE, ReportJob.STATUS_FAILED), finished_at__lt=cutoff
+    ).delete()
+    return deleted
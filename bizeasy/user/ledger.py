@@ -0,0 +1,143 @@
+"""
+Daily ledger module for the Bizeasy application.
+Maintains the DailyLedger rollup that backs the dashboard charts.
+"""
+
+# Standard library imports
+from decimal import Decimal
+
+# Django imports
+from django.db import transaction
+from django.db.models import Count, F, Sum, Value
+from django.utils import timezone
+
+# Local imports
+from .models import DailyLedger, Invoice, InvoiceItem, Purchase
+from .money import Money, MoneyField
+from .utils import as_date, date_filter
+
+
+def _build_rows(**filters):
+    """Compute fresh ledger rows from the source tables (three grouped queries)."""
+    rows = {}
+
+    def row(day):
+        if day not in rows:
+            rows[day] = DailyLedger(date=day)
+        return rows[day]
+
+    invoices = (
+        Invoice._default_manager.filter(date_filter('date', **filters))
+        .values('date')
+        .annotate(income=Sum('total'), invoices=Count('id'))
+    )
+    for entry in invoices:
+        day = row(entry['date'])
+        day.income = entry['income']
+        day.invoice_count = entry['invoices']
+
+    items = (
+        InvoiceItem._default_manager.filter(date_filter('invoice__date', **filters))
+        .values('invoice__date')
+        .annotate(items=Count('id'))
+    )
+    for entry in items:
+        row(entry['invoice__date']).item_count = entry['items']
+
+    purchases = (
+        Purchase._default_manager.filter(date_filter('date', **filters))
+        .values('date')
+        .annotate(expense=Sum('total_rate'))
+    )
+    for entry in purchases:
+        row(entry['date']).expense = entry['expense']
+
+    return rows
+
+
+# ==============================================================================
+# Maintenance
+# ==============================================================================
+
+@transaction.atomic
+def refresh_days(dates):
+    """Recompute the ledger rows for the given days."""
+    days = {as_date(value) for value in dates} - {None}
+    if not days:
+        return
+    rows = _build_rows(dates=days)
+    DailyLedger._default_manager.filter(date__in=days).delete()
+    DailyLedger._default_manager.bulk_create(rows.values())
+
+
+def add_to_day(day, income=0, invoice_count=0, item_count=0):
+    """Add a new invoice's figures to its day's row with one F() UPDATE.
+
+    A day without a row yet is computed from the source tables instead,
+    which already hold the new rows.
+    """
+    day = as_date(day)
+    updated = DailyLedger._default_manager.filter(date=day).update(
+        income=F('income') + Value(Money(income), output_field=MoneyField()),
+        invoice_count=F('invoice_count') + invoice_count,
+        item_count=F('item_count') + item_count,
+        updated_at=timezone.now(),
+    )
+    if not updated:
+        refresh_days([day])
+
+
+@transaction.atomic
+def rebuild(from_date=None, to_date=None):
+    """Rebuild the ledger for an inclusive date range (everything by default)."""
+    rows = _build_rows(from_date=from_date, to_date=to_date)
+    DailyLedger._default_manager.filter(
+        date_filter('date', from_date=from_date, to_date=to_date)
+    ).delete()
+    DailyLedger._default_manager.bulk_create(
+        sorted(rows.values(), key=lambda entry: entry.date), batch_size=500
+    )
+    return len(rows)
+
+
+# ==============================================================================
+# Queries
+# ==============================================================================
+
+def totals(from_date=None, to_date=None):
+    """Return income, expense and count totals over an inclusive date range."""
+    result = DailyLedger._default_manager.filter(
+        date_filter('date', from_date=from_date, to_date=to_date)
+    ).aggregate(
+        income=Sum('income'),
+        expense=Sum('expense'),
+        invoice_count=Sum('invoice_count'),
+        item_count=Sum('item_count'),
+    )
+    return {
+        'income': result['income'] or Decimal('0.00'),
+        'expense': result['expense'] or Decimal('0.00'),
+        'invoice_count': result['invoice_count'] or 0,
+        'item_count': result['item_count'] or 0,
+    }
+
+
+def daily_rows(from_date, to_date):
+    """Return ``{date: (income, expense)}`` for every active day in the range."""
+    return {
+        entry['date']: (entry['income'], entry['expense'])
+        for entry in DailyLedger._default_manager.filter(
+            date__range=(from_date, to_date)
+        ).values('date', 'income', 'expense')
+    }
+
+
+def bucket_total(rows, start, end):
+    """Sum ``(income, expense)`` of pre-fetched ``daily_rows`` between two days."""
+    income = Decimal('0.00')
+    expense = Decimal('0.00')
+    for day, (day_income, day_expense) in rows.items():
+        if start <= day <= end:
+            income += day_income
+            expense += day_expense
+    return income, expense
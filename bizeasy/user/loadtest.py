@@ -0,0 +1,212 @@
+"""
+Load test module for the Bizeasy application.
+Billing terminals and report readers in separate processes against the
+configured database (readers optionally on the report snapshot), to measure
+sustained mixed read/write throughput.
+"""
+
+# Standard library imports
+import contextlib
+import multiprocessing
+import time
+from datetime import timedelta
+
+# Django imports
+import django
+from django.db import OperationalError, connections
+
+# Models are imported inside the functions: worker processes started with
+# the 'spawn' method import this module before Django is set up.
+
+
+PREFIX = 'Load test '
+
+
+# ==============================================================================
+# Workers
+# ==============================================================================
+
+def _terminal(number, purchase_id, rate, shop, seconds, results):
+    """Sell one unit per invoice until ``seconds`` have passed."""
+    django.setup()
+    from . import checkout, sequences, writes
+
+    counts = {'ok': 0, 'rejected': 0, 'busy': 0}
+    latencies = []
+    deadline = time.monotonic() + seconds
+    try:
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                checkout.checkout(
+                    [checkout.Line(purchase_id, 1, rate)],
+                    customer_name=f'{PREFIX}terminal {number}',
+                    bill_number=sequences.next_bill_number(shop=shop),
+                )
+                counts['ok'] += 1
+            except checkout.CheckoutError:
+                counts['rejected'] += 1
+            except OperationalError as e:
+                if not writes.is_busy(e):
+                    raise
+                # Still locked after every retry
+                counts['busy'] += 1
+            latencies.append(time.perf_counter() - started)
+    finally:
+        connections.close_all()
+        results.put(('writes', counts, latencies))
+
+
+def _reader(number, seconds, results, snapshot=False, pause=0):
+    """Read the stock report, dashboard figures and a year's shop report in
+    turn, as the owner's screens do, until ``seconds`` have passed, waiting
+    ``pause`` seconds between reads. With ``snapshot`` the reads go to the
+    report snapshot."""
+    django.setup()
+    from django.utils import timezone
+    from . import reports, snapshots, writes
+
+    today = timezone.now().date()
+    reads = (
+        lambda: list(reports.stock_report_purchases({}).order_by('-date')[:50]),
+        lambda: reports.dashboard_data({}),
+        lambda: reports.shop_report(today - timedelta(days=365), today),
+    )
+    counts = {'ok': 0, 'rejected': 0, 'busy': 0}
+    latencies = []
+    deadline = time.monotonic() + seconds
+    try:
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                with snapshots.reading() if snapshot else contextlib.nullcontext():
+                    reads[(counts['ok'] + counts['busy']) % len(reads)]()
+                counts['ok'] += 1
+            except OperationalError as e:
+                if not writes.is_busy(e):
+                    raise
+                counts['busy'] += 1
+            latencies.append(time.perf_counter() - started)
+            time.sleep(pause)
+    finally:
+        connections.close_all()
+        results.put(('reads', counts, latencies))
+
+
+def _snapshotter(seconds, interval, results):
+    """Refresh the report snapshot every ``interval`` seconds until
+    ``seconds`` have passed."""
+    django.setup()
+    from . import snapshots
+
+    taken = []
+    deadline = time.monotonic() + seconds
+    try:
+        while time.monotonic() < deadline:
+            taken.append(snapshots.take().seconds)
+            time.sleep(min(interval, max(0, deadline - time.monotonic())))
+    finally:
+        connections.close_all()
+        results.put(('snapshots', {'ok': len(taken), 'rejected': 0, 'busy': 0}, taken))
+
+
+# ==============================================================================
+# Runner
+# ==============================================================================
+
+def _summary(counts, latencies, seconds):
+    from .benchmark import _percentile
+
+    summary = dict(counts, per_second=round(counts['ok'] / seconds, 1))
+    if latencies:
+        summary.update(
+            p50_ms=round(_percentile(latencies, 50) * 1000, 1),
+            p95_ms=round(_percentile(latencies, 95) * 1000, 1),
+            max_ms=round(max(latencies) * 1000, 1),
+        )
+    return summary
+
+
+def run(terminals=2, readers=1, seconds=30, stock=1_000_000, keep=False, snapshot_interval=None, reader_pause=0):
+    """Run ``terminals`` billing processes and ``readers`` report processes
+    (each waiting ``reader_pause`` seconds between reads) for ``seconds``
+    against the default database.
+
+    With ``snapshot_interval`` the readers read the report snapshot, which
+    another process refreshes that often (seconds); the copy times are
+    reported under ``snapshots``.
+
+    Each terminal sells one unit per invoice of a throwaway purchase; the
+    rows are deleted afterwards unless ``keep``. Returns a dict with the
+    engine, journal mode, and per-kind counts (ok, rejected for stock,
+    still busy after retries), throughput and latency percentiles, plus
+    ``oversold``, which must be 0.
+    """
+    from django.conf import settings
+    from django.utils import timezone
+    from . import snapshots
+    from .models import Category, Invoice, InvoiceItem, InvoiceSequence, Purchase, SubCategory
+
+    run_id = timezone.now().strftime('%Y%m%d%H%M%S')
+    shop = f'LOAD{run_id[-6:]}'
+    category = Category._default_manager.create(name=f'{PREFIX}{run_id}')
+    subcategory = SubCategory._default_manager.create(category=category, name='Terminals')
+    purchase = Purchase._default_manager.create(
+        product_name=f'{PREFIX}item {run_id}', category=category, subcategory=subcategory,
+        quantity=stock, product_rate=1, total_rate=0, mrp=2, sale_rate=2, date=timezone.now().date()
+    )
+    journal_mode = None
+    if connections['default'].vendor == 'sqlite':
+        with connections['default'].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+    if snapshot_interval:
+        snapshots.take()
+    # Forked workers must not share this process's connection
+    connections.close_all()
+
+    context = multiprocessing.get_context()
+    results = context.Queue()
+    processes = [
+        context.Process(target=_terminal, args=(number, purchase.pk, purchase.sale_rate, shop, seconds, results))
+        for number in range(terminals)
+    ] + [
+        context.Process(target=_reader, args=(number, seconds, results, bool(snapshot_interval), reader_pause))
+        for number in range(readers)
+    ]
+    if snapshot_interval:
+        processes.append(context.Process(target=_snapshotter, args=(seconds, snapshot_interval, results)))
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    totals = {kind: ({'ok': 0, 'rejected': 0, 'busy': 0}, []) for kind in ('writes', 'reads', 'snapshots')}
+    for _ in processes:
+        # A worker that dies before reporting fails the run instead of hanging it
+        kind, counts, latencies = results.get(timeout=seconds + 300)
+        for key, value in counts.items():
+            totals[kind][0][key] += value
+        totals[kind][1].extend(latencies)
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    purchase.refresh_from_db()
+    sold = sum(InvoiceItem._default_manager.filter(purchase=purchase).values_list('quantity', flat=True))
+    report = {
+        'engine': settings.DATABASES['default']['ENGINE'],
+        'journal_mode': journal_mode,
+        'terminals': terminals,
+        'readers': readers,
+        'seconds': round(elapsed, 1),
+        'writes': _summary(*totals['writes'], elapsed),
+        'reads': _summary(*totals['reads'], elapsed),
+        'snapshots': _summary(*totals['snapshots'], elapsed) if snapshot_interval else None,
+        'oversold': abs(stock - sold - purchase.quantity),
+    }
+
+    if not keep:
+        Invoice._default_manager.filter(items__purchase=purchase).delete()
+        InvoiceSequence._default_manager.filter(shop=shop).delete()
+        purchase.hard_delete()
+        category.delete()
+    return report
@@ -0,0 +1,117 @@
+"""
+Management command to load-test the checkout path with parallel terminals.
+It writes invoices, so it refuses to run on a database that already holds
+purchases or invoices unless --confirm is given; use a scratch database.
+"""
+
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.utils import timezone
+from ... import checkout, sequences
+from ...models import Category, Invoice, InvoiceItem, InvoiceSequence, Purchase, SubCategory
+
+
+class Command(BaseCommand):
+    help = 'Simulate parallel billing terminals and report invoices/sec and oversell count'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--terminals', type=int, default=8, help='Parallel terminals (threads)')
+        parser.add_argument('--invoices', type=int, default=50, help='Invoices attempted per terminal')
+        parser.add_argument('--stock', type=int, default=200, help='Units of stock on the benchmark purchase')
+        parser.add_argument('--quantity', type=int, default=1, help='Units sold per invoice')
+        parser.add_argument('--retries', type=int, default=20, help='Retries when the database is locked')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark rows afterwards')
+        parser.add_argument('--confirm', action='store_true', help='Run even though the database holds shop data')
+
+    def handle(self, *args, **options):
+        if options['terminals'] < 1 or options['invoices'] < 1 or options['quantity'] < 1:
+            raise CommandError('--terminals, --invoices and --quantity must be positive.')
+        if not options['confirm'] and (Purchase._default_manager.exists() or Invoice._default_manager.exists()):
+            raise CommandError(
+                'The database holds purchases or invoices. Run the benchmark against a scratch '
+                'database (e.g. with --settings), or pass --confirm to write to this one.'
+            )
+
+        run_id = timezone.now().strftime('%Y%m%d%H%M%S')
+        shop = f'BENCH{run_id[-6:]}'
+        category = Category._default_manager.create(name=f'Benchmark {run_id}')
+        subcategory = SubCategory._default_manager.create(category=category, name='Checkout')
+        purchase = Purchase._default_manager.create(
+            product_name=f'Benchmark item {run_id}', category=category, subcategory=subcategory,
+            quantity=options['stock'], product_rate=1, total_rate=0, mrp=2, sale_rate=2,
+            date=timezone.now().date()
+        )
+
+        counts = {'sold': 0, 'rejected': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def terminal(number):
+            try:
+                for _ in range(options['invoices']):
+                    lines = [checkout.Line(purchase.pk, options['quantity'], purchase.sale_rate)]
+                    bill_number = sequences.next_bill_number(shop=shop)
+                    outcome = 'errors'
+                    for retry in range(options['retries'] + 1):
+                        try:
+                            checkout.checkout(
+                                lines,
+                                customer_name=f'Terminal {number}',
+                                bill_number=bill_number,
+                            )
+                            outcome = 'sold'
+                            break
+                        except checkout.CheckoutError:
+                            outcome = 'rejected'
+                            break
+                        except OperationalError:
+                            # SQLite refuses concurrent writers; back off and retry
+                            time.sleep(random.uniform(0, 0.01 * (retry + 1)))
+                    with lock:
+                        counts[outcome] += 1
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=terminal, args=(number,))
+            for number in range(options['terminals'])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        purchase.refresh_from_db()
+        sold_units = InvoiceItem._default_manager.filter(purchase=purchase).aggregate(
+            total=Sum('quantity')
+        )['total'] or 0
+        problems = []
+        if Purchase._default_manager.filter(pk=purchase.pk, quantity__lt=0).exists():
+            problems.append(f'stock went negative ({purchase.quantity})')
+        if sold_units != options['stock'] - purchase.quantity:
+            problems.append(
+                f'{sold_units} units invoiced but stock fell by {options["stock"] - purchase.quantity}'
+            )
+
+        self.stdout.write(
+            f'{counts["sold"]} invoices in {elapsed:.2f}s '
+            f'({counts["sold"] / elapsed if elapsed else 0:.1f} invoices/sec), '
+            f'{counts["rejected"]} rejected for stock, {counts["errors"]} failed'
+        )
+        self.stdout.write(f'Units sold: {sold_units}, stock left: {purchase.quantity}')
+
+        if not options['keep']:
+            Invoice._default_manager.filter(items__purchase=purchase).delete()
+            InvoiceSequence._default_manager.filter(shop=shop).delete()
+            purchase.hard_delete()
+            category.delete()
+
+        if problems:
+            raise CommandError('Oversold: ' + '; '.join(problems))
+        self.stdout.write(self.style.SUCCESS('Oversell count: 0'))
@@ -0,0 +1,50 @@
+"""
+Management command to load-test the database with billing terminals and
+report readers in separate processes and print throughput, latency and
+busy errors as JSON. Run it with and without the user.backends.sqlite3
+engine to compare the journal modes, and with --snapshot-interval to move
+the readers to the report snapshot.
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from ... import loadtest
+
+
+class Command(BaseCommand):
+    help = 'Run parallel billing and report processes and report sustained read/write throughput as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--terminals', type=int, default=2, help='Billing terminal processes')
+        parser.add_argument('--readers', type=int, default=1, help='Report reader processes')
+        parser.add_argument('--seconds', type=float, default=30, help='How long to run')
+        parser.add_argument('--reader-pause', type=float, default=0, help='Seconds each reader waits between reads')
+        parser.add_argument('--snapshot-interval', type=float, default=None,
+                            help='Read from the report snapshot, refreshed every this many seconds')
+        parser.add_argument('--keep', action='store_true', help='Keep the load test rows afterwards')
+        parser.add_argument('--output', help='Write the JSON to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        if options['terminals'] < 0 or options['readers'] < 0 or options['terminals'] + options['readers'] < 1:
+            raise CommandError('Run at least one terminal or reader.')
+        if options['seconds'] <= 0:
+            raise CommandError('--seconds must be positive.')
+        if options['snapshot_interval'] is not None and options['snapshot_interval'] <= 0:
+            raise CommandError('--snapshot-interval must be positive.')
+        if options['reader_pause'] < 0:
+            raise CommandError('--reader-pause must not be negative.')
+        report = loadtest.run(
+            terminals=options['terminals'], readers=options['readers'],
+            seconds=options['seconds'], keep=options['keep'], snapshot_interval=options['snapshot_interval'],
+            reader_pause=options['reader_pause'],
+        )
+        text = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(text + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            self.stdout.write(text)
+        if report['oversold']:
+            raise CommandError(f"Oversold by {report['oversold']} units")
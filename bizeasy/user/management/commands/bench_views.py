@@ -0,0 +1,41 @@
+"""
+Management command to time the main views through the Django test client
+and print p50/p95 latency, query counts and peak RSS as JSON, so runs
+before and after a change can be compared.
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from ... import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the main views and report latency percentiles, query counts and peak RSS as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10, help='Timed requests per view')
+        parser.add_argument('--warmup', type=int, default=1, help='Untimed requests per view first')
+        parser.add_argument('--cold', action='store_true', help='Clear the report cache, price book and category tree before each request')
+        parser.add_argument('--views', help='Comma-separated view labels to run (default: all)')
+        parser.add_argument('--user', help='Username to run the views as (default: the first owner)')
+        parser.add_argument('--output', help='Write the JSON to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or options['warmup'] < 0:
+            raise CommandError('--repeat must be positive and --warmup not negative.')
+        only = [label.strip() for label in options['views'].split(',')] if options['views'] else None
+        try:
+            results = benchmark.bench_views(
+                repeat=options['repeat'], warmup=options['warmup'], cold=options['cold'],
+                only=only, username=options['user'],
+            )
+        except benchmark.BenchmarkError as e:
+            raise CommandError(str(e))
+        report = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            self.stdout.write(report)
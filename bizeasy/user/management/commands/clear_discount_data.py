@@ -27,7 +27,7 @@ class Command(BaseCommand):
         purchases_updated = 0
         for purchase in Purchase._default_manager.filter(mrp__isnull=False):
             if purchase.mrp and purchase.mrp > 0:
-                purchase.sale_rate = float(purchase.mrp)
+                purchase.sale_rate = purchase.mrp
                 purchase.save()
                 purchases_updated += 1
         
@@ -0,0 +1,25 @@
+"""
+Management command to recompute the reorder suggestions of every live batch.
+Run it once a night (e.g. from cron) so the reorder page and the shop
+report read the stored ReorderSuggestion rows.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from ... import reorder
+from ...utils import as_date
+
+
+class Command(BaseCommand):
+    help = 'Compute sales velocity, days of cover and reorder points for every live batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to compute as of (YYYY-MM-DD), default today')
+
+    def handle(self, *args, **options):
+        try:
+            day = as_date(options['date'])
+        except Exception:
+            raise CommandError('--date must be YYYY-MM-DD.')
+        written = reorder.refresh(day)
+        engine = 'numpy' if reorder.np is not None else 'python'
+        self.stdout.write(self.style.SUCCESS(f'Stored {written} reorder suggestions ({engine})'))
@@ -0,0 +1,38 @@
+"""
+Management command to import categories, subcategories and purchases from
+a CSV or XLSX supplier list. Nothing is written unless every row is valid.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from ... import importer
+
+
+class Command(BaseCommand):
+    help = 'Bulk import a catalog of purchases (with their categories) from a CSV or XLSX file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file')
+        parser.add_argument('--format', choices=importer.FORMATS, help='File format (default: from the extension)')
+        parser.add_argument('--dry-run', action='store_true', help='Validate the file without importing it')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            file_format = options['format'] or importer.detect_format(options['path'])
+            result = importer.import_file(options['path'], file_format, dry_run=options['dry_run'])
+        except (importer.CatalogImportError, OSError) as e:
+            raise CommandError(str(e))
+
+        for error in result.errors:
+            self.stderr.write(f'Line {error.line}: {error.message}')
+        if result.errors:
+            raise CommandError(f'{len(result.errors)} errors in {result.rows} rows; nothing was imported')
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'{result.rows} rows are valid (dry run, nothing imported)'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.purchases} purchases, {result.categories} new categories and '
+            f'{result.subcategories} new subcategories in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,16 @@
+"""
+Management command to drop old billing catalog change log entries.
+Run it once a day (e.g. from cron); counters further behind than the
+retention period reload the full snapshot.
+"""
+
+from django.core.management.base import BaseCommand
+from ... import catalog
+
+
+class Command(BaseCommand):
+    help = 'Delete catalog change log entries older than CATALOG["RETENTION_DAYS"]'
+
+    def handle(self, *args, **options):
+        deleted = catalog.prune()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} catalog change log entries'))
@@ -0,0 +1,33 @@
+"""
+Management command to backfill or rebuild the daily income/expense ledger.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from ... import ledger
+from ...utils import as_date
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the DailyLedger rollup from invoices and purchases'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from-date',
+            help='First day to rebuild (YYYY-MM-DD). Defaults to the earliest record.'
+        )
+        parser.add_argument(
+            '--to-date',
+            help='Last day to rebuild (YYYY-MM-DD). Defaults to the latest record.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            from_date = as_date(options['from_date'])
+            to_date = as_date(options['to_date'])
+        except Exception:
+            raise CommandError('Dates must be in YYYY-MM-DD format.')
+
+        rebuilt = ledger.rebuild(from_date=from_date, to_date=to_date)
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {rebuilt} daily ledger rows')
+        )
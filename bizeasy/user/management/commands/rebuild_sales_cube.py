@@ -0,0 +1,33 @@
+"""
+Management command to backfill or rebuild the pre-aggregated sales cube.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from ... import cube
+from ...utils import as_date
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the SalesCube rollup from invoice line items'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from-date',
+            help='First invoice day to rebuild (YYYY-MM-DD). Defaults to the earliest invoice.'
+        )
+        parser.add_argument(
+            '--to-date',
+            help='Last invoice day to rebuild (YYYY-MM-DD). Defaults to the latest invoice.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            from_date = as_date(options['from_date'])
+            to_date = as_date(options['to_date'])
+        except Exception:
+            raise CommandError('Dates must be in YYYY-MM-DD format.')
+
+        rebuilt = cube.rebuild(from_date=from_date, to_date=to_date)
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {rebuilt} sales cube rows')
+        )
@@ -0,0 +1,21 @@
+"""
+Management command to rebuild the full-text purchase search index.
+"""
+
+from django.core.management.base import BaseCommand
+from ... import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the SQLite FTS5 index used for product search'
+
+    def handle(self, *args, **options):
+        indexed = search.rebuild()
+        if indexed is None:
+            self.stdout.write(
+                self.style.WARNING('FTS5 is not available on this database; searches use LIKE instead')
+            )
+            return
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {indexed} purchases')
+        )
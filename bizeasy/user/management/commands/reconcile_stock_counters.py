@@ -0,0 +1,33 @@
+"""
+Management command to check the received/sold counters on purchases
+against the invoice items and fix any drift.
+"""
+
+from django.core.management.base import BaseCommand
+from ... import stock
+
+
+class Command(BaseCommand):
+    help = 'Recompute Purchase.sold_quantity / received_quantity and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report drifted purchases, do not correct them',
+        )
+
+    def handle(self, *args, **options):
+        drifted = stock.reconcile(dry_run=options['dry_run'])
+        for row in drifted:
+            self.stdout.write(
+                f"#{row['id']} {row['product_name']}: "
+                f"sold {row['sold_quantity']} -> {row['actual_sold']}, "
+                f"received {row['received_quantity']} -> {row['actual_received']}"
+            )
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('All stock counters are in step'))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{len(drifted)} purchases have drifted (dry run, nothing changed)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Corrected {len(drifted)} purchases'))
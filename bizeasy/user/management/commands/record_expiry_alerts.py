@@ -0,0 +1,24 @@
+"""
+Management command to record the day's near-expiry stock per category.
+Run it once a day (e.g. from cron) so the owner dashboard reads the
+precomputed ExpiryAlert rows.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from ... import expiry
+from ...utils import as_date
+
+
+class Command(BaseCommand):
+    help = 'Record expired / 7-day / 30-day expiry alerts per category for a day (default: today)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to record (YYYY-MM-DD), default today')
+
+    def handle(self, *args, **options):
+        try:
+            day = as_date(options['date'])
+        except Exception:
+            raise CommandError('--date must be YYYY-MM-DD.')
+        written = expiry.record_alerts(day)
+        self.stdout.write(self.style.SUCCESS(f'Recorded {written} expiry alert rows'))
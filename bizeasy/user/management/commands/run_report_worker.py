@@ -0,0 +1,69 @@
+"""
+Management command to run queued report jobs (see user.jobs).
+"""
+
+import os
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from ... import jobs
+
+
+class Command(BaseCommand):
+    help = 'Poll the ReportJob queue and compute queued reports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=None, help='Jobs run at the same time (threads)')
+        parser.add_argument('--poll-interval', type=float, default=None, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency'] or jobs.config('CONCURRENCY')
+        poll_interval = options['poll_interval'] or jobs.config('POLL_INTERVAL')
+        if concurrency < 1:
+            raise CommandError('--concurrency must be positive.')
+
+        requeued = jobs.requeue_stale()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale jobs'))
+        purged = jobs.purge()
+        if purged:
+            self.stdout.write(f'Purged {purged} old jobs')
+
+        name = f'{socket.gethostname()}:{os.getpid()}'
+        stop = threading.Event()
+
+        def work(number):
+            try:
+                while not stop.is_set():
+                    job = jobs.claim(f'{name}/{number}')
+                    if job is None:
+                        if options['once']:
+                            return
+                        stop.wait(poll_interval)
+                        continue
+                    started = time.perf_counter()
+                    jobs.run(job)
+                    self.stdout.write(
+                        f'{job.kind} #{job.pk}: {job.status} in {time.perf_counter() - started:.2f}s'
+                        + (f' ({job.error})' if job.error else '')
+                    )
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work, args=(number,), daemon=True) for number in range(concurrency)]
+        self.stdout.write(f'Report worker {name} running {concurrency} jobs at a time')
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        self.stdout.write(self.style.SUCCESS('Report worker stopped'))
@@ -1,62 +1,79 @@
 """
-Management command to run discount status updates periodically.
-This command can be scheduled to run at regular intervals.
+Management command to apply discount status transitions as they fall due.
+Sleeps until the next discount start or end boundary instead of polling.
 """
 
+import datetime
 import time
 import logging
 from django.core.management.base import BaseCommand
-from django.core.management import call_command
+from django.utils import timezone
+from ... import discounts
 
 logger = logging.getLogger(__name__)
 
 class Command(BaseCommand):
-    help = 'Run discount status updates periodically'
+    help = 'Apply discount status transitions at each start/end date boundary'
 
     def add_arguments(self, parser):
         parser.add_argument(
             '--interval',
             type=int,
             default=3600,  # 1 hour default
-            help='Interval in seconds between updates (default: 3600 seconds/1 hour)'
+            help='Maximum seconds to sleep between checks, so discounts added '
+                 'while sleeping are picked up (default: 3600 seconds/1 hour)'
         )
         parser.add_argument(
             '--once',
             action='store_true',
             help='Run once and exit instead of running continuously'
         )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report due transitions without writing anything'
+        )
+
+    def run_transitions(self, dry_run):
+        try:
+            metrics = discounts.apply_transitions(dry_run=dry_run)
+            message = (
+                f'{"Would change" if dry_run else "Changed"} {metrics["status_changed"]} discounts '
+                f'({metrics["activated"]} activated, {metrics["expired"]} expired, '
+                f'{metrics["purchases_repriced"]} purchases repriced)'
+            )
+            self.stdout.write(self.style.SUCCESS(message))
+            logger.info(message)
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'Error running discount status update: {str(e)}')
+            )
+            logger.error(f'Error running discount status update: {str(e)}')
+
+    def seconds_until_next_transition(self, interval):
+        """Seconds until the next boundary (midnight of the transition day), capped."""
+        now = timezone.now()
+        next_day = discounts.next_transition(now.date())
+        if next_day is None:
+            return interval
+        wake_at = datetime.datetime.combine(next_day, datetime.time.min, tzinfo=now.tzinfo)
+        return max(1, min(interval, (wake_at - now).total_seconds()))
 
     def handle(self, *args, **options):
         interval = options['interval']
-        once = options['once']
+        dry_run = options['dry_run']
         
-        if once:
+        if options['once']:
             self.stdout.write('Running discount status update once...')
-            try:
-                call_command('update_discount_status')
-                self.stdout.write(
-                    self.style.SUCCESS('Discount status update completed successfully')
-                )
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f'Error running discount status update: {str(e)}')
-                )
+            self.run_transitions(dry_run)
             return
         
-        self.stdout.write(f'Starting periodic discount status updates every {interval} seconds...')
-        self.stdout.write('Press Ctrl+C to stop')
+        self.stdout.write('Starting discount scheduler (Ctrl+C to stop)...')
         
         while True:
-            try:
-                self.stdout.write('Running discount status update...')
-                call_command('update_discount_status')
-                self.stdout.write(
-                    self.style.SUCCESS(f'Discount status update completed. Next run in {interval} seconds.')
-                )
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f'Error running discount status update: {str(e)}')
-                )
+            self.run_transitions(dry_run)
             
-            # Wait for the specified interval
-            time.sleep(interval)
\ No newline at end of file
+            # Sleep until the next discount boundary
+            delay = self.seconds_until_next_transition(interval)
+            self.stdout.write(f'Next check in {int(delay)} seconds.')
+            time.sleep(delay)
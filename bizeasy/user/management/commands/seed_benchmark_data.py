@@ -0,0 +1,45 @@
+"""
+Management command to fill a database with a deterministic, production-sized
+benchmark dataset. Run it against a scratch database, never a shop's.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from ... import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Seed staff, categories, purchases, discounts and invoices for benchmarking (bulk inserts)'
+
+    def add_arguments(self, parser):
+        defaults = benchmark.DEFAULTS
+        parser.add_argument('--categories', type=int, help=f"Categories (default {defaults['categories']})")
+        parser.add_argument('--subcategories', type=int, help=f"Subcategories per category (default {defaults['subcategories']})")
+        parser.add_argument('--purchases', type=int, help=f"Purchases (default {defaults['purchases']})")
+        parser.add_argument('--items', type=int, help=f"Invoice items (default {defaults['items']})")
+        parser.add_argument('--years', type=int, help=f"Years of history (default {defaults['years']})")
+        parser.add_argument('--staff', type=int, help=f"Staff users (default {defaults['staff']})")
+        parser.add_argument('--discounts', type=int, help=f"Discounted products (default {defaults['discounts']})")
+        parser.add_argument('--seed', type=int, help=f"Random seed (default {defaults['seed']})")
+        parser.add_argument('--batch-size', type=int, help=f"Rows per INSERT (default {defaults['batch_size']})")
+
+    def handle(self, *args, **options):
+        sizes = {key: options[key] for key in benchmark.DEFAULTS}
+        if any(value is not None and value < 0 for value in sizes.values()):
+            raise CommandError('Sizes must not be negative.')
+        if sizes['years'] == 0 or sizes['batch_size'] == 0:
+            raise CommandError('--years and --batch-size must be positive.')
+        started = time.perf_counter()
+
+        def progress(message):
+            self.stdout.write(f'{message} ({time.perf_counter() - started:.1f}s)')
+
+        try:
+            counts = benchmark.seed(progress=progress, **sizes)
+        except benchmark.BenchmarkError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {counts['purchases']} purchases and {counts['invoice_items']} invoice items "
+            f"in {time.perf_counter() - started:.1f}s; log in as {benchmark.OWNER_USERNAME} / {benchmark.PASSWORD}"
+        ))
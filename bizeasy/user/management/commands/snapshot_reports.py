@@ -0,0 +1,45 @@
+"""
+Management command to copy the database to the read-only report snapshot
+(see user.snapshots), once or every INTERVAL seconds.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from ... import snapshots
+
+
+class Command(BaseCommand):
+    help = 'Copy the database to the read-only snapshot the report pages read'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None, help='Seconds between copies')
+        parser.add_argument('--once', action='store_true', help='Take one snapshot and exit')
+
+    def handle(self, *args, **options):
+        if not snapshots.enabled():
+            raise CommandError(f"DATABASES has no '{snapshots.config('ALIAS')}' database for the snapshot.")
+        interval = options['interval'] or snapshots.config('INTERVAL')
+        if interval <= 0:
+            raise CommandError('--interval must be positive.')
+
+        target = snapshots.path()
+        if not options['once']:
+            self.stdout.write(f'Copying the database to {target} every {interval:g}s')
+        try:
+            while True:
+                started = time.monotonic()
+                try:
+                    snapshot = snapshots.take()
+                except (snapshots.SnapshotError, OSError) as e:
+                    raise CommandError(str(e))
+                self.stdout.write(self.style.SUCCESS(
+                    f'{snapshot}: {snapshot.size / 1048576:.1f} MiB in {snapshot.seconds:.2f}s'
+                ))
+                if options['once']:
+                    return
+                connection.close()
+                time.sleep(max(0, interval - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('Snapshots stopped'))
@@ -0,0 +1,57 @@
+# Generated by Django 3.2 on 2026-10-18 19:47
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_ledger(apps, schema_editor):
+    """Populate DailyLedger from the existing invoices and purchases."""
+    DailyLedger = apps.get_model('user', 'DailyLedger')
+    Invoice = apps.get_model('user', 'Invoice')
+    InvoiceItem = apps.get_model('user', 'InvoiceItem')
+    Purchase = apps.get_model('user', 'Purchase')
+
+    rows = {}
+
+    def row(day):
+        if day not in rows:
+            rows[day] = DailyLedger(date=day)
+        return rows[day]
+
+    for entry in Invoice.objects.values('date').annotate(income=Sum('total'), invoices=Count('id')):
+        day = row(entry['date'])
+        day.income = Decimal(str(entry['income'] or 0)).quantize(Decimal('0.01'))
+        day.invoice_count = entry['invoices']
+    for entry in InvoiceItem.objects.values('invoice__date').annotate(items=Count('id')):
+        row(entry['invoice__date']).item_count = entry['items']
+    for entry in Purchase.objects.values('date').annotate(expense=Sum('total_rate')):
+        row(entry['date']).expense = Decimal(str(entry['expense'] or 0)).quantize(Decimal('0.01'))
+
+    DailyLedger.objects.bulk_create(rows.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0037_discount_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('income', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('expense', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('invoice_count', models.PositiveIntegerField(default=0)),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
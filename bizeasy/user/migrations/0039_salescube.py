@@ -0,0 +1,63 @@
+# Generated by Django 3.2 on 2026-10-18 19:49
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, FloatField, Sum
+import django.db.models.deletion
+
+
+def backfill_cube(apps, schema_editor):
+    """Populate SalesCube from the existing invoice line items."""
+    SalesCube = apps.get_model('user', 'SalesCube')
+    InvoiceItem = apps.get_model('user', 'InvoiceItem')
+
+    items = InvoiceItem.objects.values(
+        'invoice__date', 'invoice__created_by_id', 'purchase_id',
+        'purchase__category_id', 'purchase__subcategory_id',
+    ).annotate(
+        qty=Sum('quantity'),
+        revenue=Sum('total'),
+        cost=Sum(F('quantity') * F('purchase__product_rate'), output_field=FloatField()),
+    )
+    SalesCube.objects.bulk_create([
+        SalesCube(
+            day=entry['invoice__date'],
+            created_by_id=entry['invoice__created_by_id'],
+            purchase_id=entry['purchase_id'],
+            category_id=entry['purchase__category_id'],
+            subcategory_id=entry['purchase__subcategory_id'],
+            qty=entry['qty'] or 0,
+            revenue=Decimal(str(entry['revenue'] or 0)).quantize(Decimal('0.01')),
+            cost=Decimal(str(entry['cost'] or 0)).quantize(Decimal('0.01')),
+        )
+        for entry in items
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0038_dailyledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesCube',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('qty', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('cost', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='user.category')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('purchase', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='user.purchase')),
+                ('subcategory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='user.subcategory')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'category'], name='user_cube_day_category_idx'), models.Index(fields=['created_by', 'day'], name='user_cube_staff_day_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_cube, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2 on 2026-10-18 19:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0039_salescube'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='discount',
+            index=models.Index(fields=['start_date'], name='user_discount_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='discount',
+            index=models.Index(fields=['end_date'], name='user_discount_end_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2 on 2026-10-18 19:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0040_discount_transition_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shop', models.CharField(max_length=20)),
+                ('financial_year', models.CharField(max_length=9)),
+                ('prefix', models.CharField(default='INV', max_length=20)),
+                ('number_format', models.CharField(default='{prefix}-{shop}-{fy}-{number:06d}', max_length=100)),
+                ('next_value', models.PositiveBigIntegerField(default=1)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('shop', 'financial_year')},
+            },
+        ),
+    ]
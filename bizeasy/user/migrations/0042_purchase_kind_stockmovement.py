@@ -0,0 +1,86 @@
+# Generated by Django 3.2 on 2026-10-18 19:58
+
+import datetime
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+# Suffix the old update_stock view appended to Purchase.notes
+STOCK_UPDATE_NOTE = re.compile(r'\s*\|\s*Stock updated on (\d{4}-\d{2}-\d{2})\. Added (\d+) units\.')
+
+
+def reclassify_purchases(apps, schema_editor):
+    """Mark legacy stock-update rows and move appended stock notes to StockMovement."""
+    Purchase = apps.get_model('user', 'Purchase')
+    StockMovement = apps.get_model('user', 'StockMovement')
+
+    Purchase.objects.filter(notes__icontains='Stock update entry').update(kind='stock_update')
+
+    movements = []
+    cleaned = []
+    for purchase in Purchase.objects.filter(notes__contains='Stock updated on').only('id', 'notes'):
+        for day, quantity in STOCK_UPDATE_NOTE.findall(purchase.notes):
+            created_at = datetime.datetime.combine(
+                datetime.date.fromisoformat(day), datetime.time(), tzinfo=datetime.timezone.utc
+            )
+            movements.append(StockMovement(
+                purchase_id=purchase.id, delta=int(quantity), reason='restock', created_at=created_at
+            ))
+        purchase.notes = STOCK_UPDATE_NOTE.sub('', purchase.notes)
+        cleaned.append(purchase)
+    StockMovement.objects.bulk_create(movements, batch_size=500)
+    Purchase.objects.bulk_update(cleaned, ['notes'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0041_invoicesequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('reason', models.CharField(choices=[('restock', 'Restock'), ('sale', 'Sale'), ('sale_reversal', 'Sale reversal')], max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='purchase',
+            name='kind',
+            field=models.CharField(choices=[('purchase', 'Purchase'), ('stock_update', 'Stock update')], default='purchase', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['kind'], name='user_purchase_kind_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(condition=models.Q(is_deleted=False), fields=['kind', '-date'], name='user_purchase_live_idx'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='purchase',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='user.purchase'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['purchase', 'created_at'], name='user_movement_purchase_idx'),
+        ),
+        migrations.RunPython(reclassify_purchases, migrations.RunPython.noop),
+    ]
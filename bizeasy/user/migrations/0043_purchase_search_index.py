@@ -0,0 +1,45 @@
+# Generated by Django 3.2 on 2026-10-18 20:00
+
+from django.db import OperationalError, migrations
+
+
+def create_search_index(apps, schema_editor):
+    """Create and fill the FTS5 purchase search table (SQLite only)."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS user_purchase_search USING fts5("
+                "product_name, category, subcategory, notes, dates, "
+                "tokenize='unicode61', prefix='2 3')"
+            )
+        except OperationalError:
+            # SQLite was built without FTS5; searches fall back to LIKE
+            return
+        cursor.execute(
+            "INSERT INTO user_purchase_search "
+            "(rowid, product_name, category, subcategory, notes, dates) "
+            "SELECT p.id, p.product_name, COALESCE(c.name, ''), COALESCE(s.name, ''), "
+            "COALESCE(p.notes, ''), COALESCE(p.date, '') || ' ' || COALESCE(p.expire_date, '') "
+            "FROM user_purchase p "
+            "LEFT JOIN user_category c ON c.id = p.category_id "
+            "LEFT JOIN user_subcategory s ON s.id = p.subcategory_id"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS user_purchase_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0042_purchase_kind_stockmovement'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
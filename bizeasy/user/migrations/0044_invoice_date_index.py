@@ -0,0 +1,17 @@
+# Generated by Django 3.2 on 2026-10-18 20:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0043_purchase_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['date', 'id'], name='user_invoice_date_idx'),
+        ),
+    ]
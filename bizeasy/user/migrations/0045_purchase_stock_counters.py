@@ -0,0 +1,38 @@
+# Generated by Django 3.2 on 2026-10-18 20:05
+
+from django.db import migrations, models
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    """Set sold_quantity from the invoice items and received_quantity from it."""
+    Purchase = apps.get_model('user', 'Purchase')
+    InvoiceItem = apps.get_model('user', 'InvoiceItem')
+
+    sold = InvoiceItem.objects.filter(purchase=OuterRef('pk')).values('purchase').annotate(
+        total=Sum('quantity')
+    ).values('total')
+    sold = Coalesce(Subquery(sold, output_field=IntegerField()), Value(0))
+    Purchase.objects.update(sold_quantity=sold, received_quantity=F('quantity') + sold)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0044_invoice_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchase',
+            name='received_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='purchase',
+            name='sold_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.2 on 2026-10-18 20:17
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0048_reportjob_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpiryAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('bucket', models.CharField(choices=[('expired', 'Expired'), ('week', 'Within 7 days'), ('month', 'Within 30 days')], max_length=10)),
+                ('batch_count', models.PositiveIntegerField(default=0)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('stock_value', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+            ],
+            options={
+                'ordering': ['day', 'bucket', '-stock_value'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['is_deleted', 'expire_date'], name='user_purchase_expiry_idx'),
+        ),
+        migrations.AddField(
+            model_name='expiryalert',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='user.category'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='expiryalert',
+            unique_together={('day', 'category', 'bucket')},
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2 on 2026-10-18 20:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0049_expiry_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReorderSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('on_hand', models.PositiveIntegerField(default=0)),
+                ('velocity', models.FloatField(default=0)),
+                ('days_of_cover', models.FloatField(blank=True, null=True)),
+                ('reorder_point', models.PositiveIntegerField(default=0)),
+                ('suggested_quantity', models.PositiveIntegerField(default=0)),
+                ('status', models.CharField(choices=[('out', 'Out of stock'), ('reorder', 'Reorder'), ('ok', 'Enough stock'), ('idle', 'No recent sales')], default='idle', max_length=10)),
+                ('purchase', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reorder', to='user.purchase')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'days_of_cover'], name='user_reorder_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,114 @@
+# Generated by Django 3.2 on 2026-10-18 20:28
+
+from decimal import Decimal
+
+from django.db import migrations, models
+import user.money
+
+
+# (model, field, old definition made nullable, final definition) of every
+# amount moved to whole paise
+MONEY_FIELDS = [
+    ('purchase', 'product_rate', models.FloatField(null=True), user.money.MoneyField()),
+    ('purchase', 'total_rate', models.FloatField(null=True), user.money.MoneyField()),
+    ('purchase', 'mrp', models.FloatField(null=True), user.money.MoneyField()),
+    ('purchase', 'change_price', models.FloatField(blank=True, null=True), user.money.MoneyField(blank=True, null=True)),
+    ('purchase', 'sale_rate', models.FloatField(blank=True, null=True), user.money.MoneyField(blank=True, null=True)),
+    ('product', 'final_price', models.DecimalField(decimal_places=2, max_digits=10, null=True), user.money.MoneyField()),
+    ('product', 'mrp', models.DecimalField(decimal_places=2, max_digits=10, null=True), user.money.MoneyField()),
+    ('product', 'purchase_rate', models.DecimalField(decimal_places=2, max_digits=10, null=True), user.money.MoneyField()),
+    ('product', 'selling_price', models.DecimalField(decimal_places=2, default=0.0, max_digits=10, null=True), user.money.MoneyField(default=Decimal('0.00'))),
+    ('sellingproduct', 'selling_price', models.DecimalField(decimal_places=2, max_digits=10, null=True), user.money.MoneyField()),
+    ('invoice', 'subtotal', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, null=True), user.money.MoneyField(default=Decimal('0.00'))),
+    ('invoice', 'discount_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, null=True), user.money.MoneyField(default=Decimal('0.00'))),
+    ('invoice', 'roundoff', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, null=True), user.money.MoneyField(default=Decimal('0.00'))),
+    ('invoice', 'total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, null=True), user.money.MoneyField(default=Decimal('0.00'))),
+    ('invoiceitem', 'rate', models.DecimalField(decimal_places=2, max_digits=12, null=True), user.money.MoneyField()),
+    ('invoiceitem', 'discount_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, null=True), user.money.MoneyField(default=Decimal('0.00'))),
+    ('invoiceitem', 'total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, null=True), user.money.MoneyField(default=Decimal('0.00'))),
+    ('dailyledger', 'income', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, null=True), user.money.MoneyField(default=Decimal('0.00'))),
+    ('dailyledger', 'expense', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, null=True), user.money.MoneyField(default=Decimal('0.00'))),
+    ('salescube', 'revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, null=True), user.money.MoneyField(default=Decimal('0.00'))),
+    ('salescube', 'cost', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, null=True), user.money.MoneyField(default=Decimal('0.00'))),
+    ('expiryalert', 'stock_value', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, null=True), user.money.MoneyField(default=Decimal('0.00'))),
+]
+
+
+# Rows read and written per round trip
+BATCH_SIZE = 1000
+
+
+def _copy(apps, convert, source, target):
+    """Copy every money column of each model from ``source(name)`` to
+    ``target(name)`` through ``convert(field, value)``, a batch of rows at
+    a time."""
+    columns = {}
+    for model_name, name, _, _ in MONEY_FIELDS:
+        columns.setdefault(model_name, []).append(name)
+    for model_name, names in columns.items():
+        model = apps.get_model('user', model_name)
+        fields = [model._meta.get_field(target(name)) for name in names]
+        queryset = model.objects.order_by('pk').values_list('pk', *[source(name) for name in names])
+        last = None
+        while True:
+            batch = list((queryset.filter(pk__gt=last) if last is not None else queryset)[:BATCH_SIZE])
+            if not batch:
+                break
+            model.objects.bulk_update([
+                model(pk=pk, **{
+                    field.name: None if value is None else convert(field, value)
+                    for field, value in zip(fields, values)
+                })
+                for pk, *values in batch
+            ], [field.name for field in fields])
+            last = batch[-1][0]
+
+
+def copy_to_paise(apps, schema_editor):
+    """Fill each ``<field>_paise`` column from the old float/decimal column.
+
+    Values are converted in Python with ``Money(str(value))``, so paise are
+    rounded half up from the amount as displayed (2.675 becomes 2.68, where
+    SQL would round the binary float 267.4999... down).
+    """
+    _copy(
+        apps, lambda field, value: user.money.Money(str(value)),
+        source=lambda name: name, target=lambda name: f'{name}_paise',
+    )
+
+
+def copy_to_rupees(apps, schema_editor):
+    """Migrating backwards: fill the re-added old columns from the paise ones."""
+    _copy(
+        apps, lambda field, value: field.to_python(value),
+        source=lambda name: f'{name}_paise', target=lambda name: name,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0050_reorder_suggestions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name=model_name, name=f'{name}_paise', field=user.money.MoneyField(null=True),
+        )
+        for model_name, name, _, _ in MONEY_FIELDS
+    ] + [
+        # Nullable first, so migrating backwards can add the columns back empty
+        migrations.AlterField(model_name=model_name, name=name, field=legacy)
+        for model_name, name, legacy, _ in MONEY_FIELDS
+    ] + [
+        migrations.RunPython(copy_to_paise, copy_to_rupees),
+    ] + [
+        migrations.RemoveField(model_name=model_name, name=name)
+        for model_name, name, _, _ in MONEY_FIELDS
+    ] + [
+        migrations.RenameField(model_name=model_name, old_name=f'{name}_paise', new_name=name)
+        for model_name, name, _, _ in MONEY_FIELDS
+    ] + [
+        migrations.AlterField(model_name=model_name, name=name, field=field)
+        for model_name, name, _, field in MONEY_FIELDS
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2 on 2026-10-18 20:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0051_money_in_paise'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='discount',
+            index=models.Index(fields=['product', 'start_date', 'end_date'], name='user_discount_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['created_by', 'date'], name='user_invoice_staff_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoiceitem',
+            index=models.Index(fields=['purchase', 'invoice'], name='user_item_purchase_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['is_deleted', 'date'], name='user_purchase_date_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2 on 2026-10-18 20:52
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0052_query_budget_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('category', 'Category'), ('subcategory', 'Subcategory'), ('purchase', 'Purchase'), ('reset', 'Reset')], max_length=20)),
+                ('object_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['changed_at'], name='user_catalogchange_time_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2 on 2026-10-18 21:25
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0053_catalog_change_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('seconds', models.FloatField(default=0)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
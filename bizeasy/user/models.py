@@ -4,14 +4,18 @@
 
 
 # Standard library imports
-from decimal import Decimal, ROUND_HALF_UP
+from decimal import Decimal
 from random import random
 
 # Django imports
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.utils import timezone
-from django.core.exceptions import ValidationError
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+
+# Local imports
+from . import writes
+from .money import Money, MoneyField
 
 
 # ==============================================================================
@@ -101,6 +105,12 @@ class SubCategory(models.Model):
         pass
 
     def __str__(self):
+        # Take the category's name from the category tree unless it is loaded
+        if not SubCategory.category.is_cached(self):
+            from .categories import category_tree
+            category_name = category_tree.category_name(self.category_id)
+            if category_name is not None:
+                return f"{self.name} ({category_name})"
         return f"{self.name} ({self.category.name})"
 
     def clean(self):
@@ -138,22 +148,59 @@ class SubCategory(models.Model):
 class Purchase(models.Model):
     """Model representing a product purchase."""
     
+    KIND_PURCHASE = 'purchase'
+    KIND_STOCK_UPDATE = 'stock_update'
+    KIND_CHOICES = (
+        (KIND_PURCHASE, 'Purchase'),
+        (KIND_STOCK_UPDATE, 'Stock update'),  # legacy rows created by old stock updates
+    )
+    
     product_name = models.CharField(max_length=100)  
     category = models.ForeignKey(Category, on_delete=models.CASCADE, default=1)
     subcategory = models.ForeignKey(SubCategory, on_delete=models.CASCADE, default=1)
     quantity = models.PositiveIntegerField()
-    product_rate = models.FloatField()
-    total_rate = models.FloatField()  # quantity * product_rate
+    product_rate = MoneyField()
+    total_rate = MoneyField()  # quantity * product_rate
     date = models.DateField()
-    mrp = models.FloatField()
+    mrp = MoneyField()
     notes = models.TextField(blank=True, null=True)
-    change_price = models.FloatField(blank=True, null=True)  # For edit use
-    sale_rate = models.FloatField(blank=True, null=True)  # For sale rate
+    change_price = MoneyField(blank=True, null=True)  # For edit use
+    sale_rate = MoneyField(blank=True, null=True)  # For sale rate
     expire_date = models.DateField(blank=True, null=True) 
     is_deleted = models.BooleanField(default=False)  # Soft delete flag
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=KIND_PURCHASE)
+    # Stock counters: quantity (in stock) = received_quantity - sold_quantity.
+    # sold_quantity is kept by the checkout and invoice-delete paths; see
+    # the reconcile_stock_counters command.
+    received_quantity = models.PositiveIntegerField(default=0)
+    sold_quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind'], name='user_purchase_kind_idx'),
+            # Listings only show live purchases, newest first
+            models.Index(
+                fields=['kind', '-date'], name='user_purchase_live_idx',
+                condition=models.Q(is_deleted=False),
+            ),
+            # Expiry report and alerts range-scan live batches by expiry date
+            models.Index(fields=['is_deleted', 'expire_date'], name='user_purchase_expiry_idx'),
+            # Purchase history and the ledger's expense sums filter by date
+            models.Index(fields=['is_deleted', 'date'], name='user_purchase_date_idx'),
+        ]
+
+    # Columns moved by stock changes (see user.stock)
+    STOCK_FIELDS = ('quantity', 'received_quantity', 'sold_quantity', 'total_rate')
 
     def __str__(self):
         return str(f"{self.product_name} - {self.date}")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Kept so save() can turn a quantity edit into a delta
+        instance._loaded_quantity = instance.__dict__.get('quantity')
+        return instance
     
     def clean(self):
         """Validate model fields before saving."""
@@ -203,23 +250,48 @@ class Purchase(models.Model):
             raise ValidationError("Expire date cannot be before the purchase date.")
     
     def save(self, *args, **kwargs):
-        """Override save method to include validation and auto-calculate total_rate."""
+        """Override save method to include validation and auto-calculate total_rate.
+
+        Sales and restocks may have moved the stock counters since this
+        instance was loaded, so an existing row re-reads them under the
+        write lock and applies a quantity edit as a delta on top.
+        """
         # Run validation
         self.clean()
         
-        # Auto-calculate total_rate if not provided or if quantity/product_rate changed
-        if self.quantity is not None and self.product_rate is not None:
-            self.total_rate = self.quantity * self.product_rate
-        
         # If notes is empty, set default description
         if not self.notes:
             category_name = self.category.name if self.category else "Unknown Category"
             subcategory_name = self.subcategory.name if self.subcategory else "Unknown Subcategory"
             self.notes = f"Purchase of {self.product_name} in {category_name} - {subcategory_name}"
         
+        if self._state.adding or not self.pk:
+            self._save_stock(*args, **kwargs)
+            return
+        loaded = getattr(self, '_loaded_quantity', None)
+        with writes.immediate():
+            stored = Purchase._default_manager.filter(pk=self.pk).values(
+                'quantity', 'sold_quantity'
+            ).first()
+            if stored:
+                if loaded is not None:
+                    self.quantity = stored['quantity'] + self.quantity - loaded
+                self.sold_quantity = stored['sold_quantity']
+            self._save_stock(*args, **kwargs)
+
+    def _save_stock(self, *args, **kwargs):
+        # Auto-calculate total_rate if not provided or if quantity/product_rate changed
+        if self.quantity is not None and self.product_rate is not None:
+            self.total_rate = self.quantity * self.product_rate
+        
+        # Everything in stock or already sold has been received
+        if self.quantity is not None:
+            self.received_quantity = self.quantity + (self.sold_quantity or 0)
+        
         # Call the parent save method
         super().save(*args, **kwargs)
-    
+        self._loaded_quantity = self.quantity
+
     def delete(self, using=None, keep_parents=False):
         """Soft delete - mark as deleted instead of actual deletion"""
         self.is_deleted = True
@@ -241,23 +313,12 @@ class Purchase(models.Model):
 
     def get_active_discount(self):
         """Get the active discount for this purchase."""
-        # First get the Product associated with this Purchase
-        try:
-            product = Product.objects.get(purchase=self)
-        except Exception:
-            return None
-            
-        # Then get the active discount for that Product
-        today = timezone.now().date()
-        try:
-            discount = Discount._default_manager.filter(
-                product=product,
-                start_date__lte=today,
-                end_date__gte=today
-            ).first()
-            return discount
-        except Exception:
+        # Resolved through the shared price book (see user.pricing)
+        from .pricing import price_book
+        if not self.pk:
             return None
+        entry = price_book.for_purchase(self.pk)
+        return entry.discount if entry else None
 
     def get_final_price(self):
         """Get the final price after applying active discount."""
@@ -297,6 +358,31 @@ class Purchase(models.Model):
         }
 
 
+class StockMovement(models.Model):
+    """A single change to a purchase's stock quantity."""
+
+    REASON_CHOICES = (
+        ('restock', 'Restock'),
+        ('sale', 'Sale'),
+        ('sale_reversal', 'Sale reversal'),
+    )
+
+    purchase = models.ForeignKey(Purchase, related_name='movements', on_delete=models.CASCADE)
+    delta = models.IntegerField()  # positive adds stock, negative removes it
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    user = models.ForeignKey('CustomUser', on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['purchase', 'created_at'], name='user_movement_purchase_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.purchase.product_name}: {self.delta:+d} ({self.reason})"
+
+
 # ==============================================================================
 # Product Management Models
 # ==============================================================================
@@ -304,14 +390,14 @@ class Purchase(models.Model):
 class Product(models.Model):
     """Model representing a product."""
     
-    final_price = models.DecimalField(max_digits=10, decimal_places=2)
+    final_price = MoneyField()
     name = models.CharField(max_length=200)
     purchase = models.OneToOneField(Purchase, on_delete=models.CASCADE, null=True, blank=True)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     subcategory = models.ForeignKey(SubCategory, on_delete=models.CASCADE, blank=True, null=True)
-    mrp = models.DecimalField(max_digits=10, decimal_places=2)  # Max Retail Price
-    purchase_rate = models.DecimalField(max_digits=10, decimal_places=2)
-    selling_price = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    mrp = MoneyField()  # Max Retail Price
+    purchase_rate = MoneyField()
+    selling_price = MoneyField(default=Decimal('0.00'))
     stock_quantity = models.PositiveIntegerField(default=0)
     date_added = models.DateTimeField(default=timezone.now)
     discount_percentage = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
@@ -320,21 +406,19 @@ class Product(models.Model):
         sub = f" ({self.subcategory.name})" if self.subcategory else ""
         return f"{self.name}{sub}"
 
+    def _price_entry(self):
+        # Prices are cached in the shared price book (see user.pricing)
+        from .pricing import PriceEntry, price_book
+        entry = price_book.get(self) if self.pk else None
+        if entry is None:
+            entry = PriceEntry(self.selling_price, None, self.selling_price)
+        return entry
+
     def get_latest_selling_price(self):
-        # Type hint to help linter understand the relationship
-        # sellingproduct_set is created by the ForeignKey in SellingProduct
-        latest = self.sellingproduct_set.order_by('-date_added').first()  # type: ignore
-        if latest and latest.selling_price is not None:
-            return latest.selling_price
-        return self.selling_price
+        return self._price_entry().selling_price
 
     def get_active_discount(self):
-        today = timezone.now().date()
-        return Discount._default_manager.filter(
-            product=self,
-            start_date__lte=today,
-            end_date__gte=today
-        ).order_by('-start_date').first()
+        return self._price_entry().discount
 
     def get_discount_percent(self):
         discount = self.get_active_discount()
@@ -343,29 +427,29 @@ class Product(models.Model):
         return None
 
     def get_discount_amount(self):
-        discount_percent = self.get_discount_percent()
-        selling = self.get_latest_selling_price()
-        try:
-            if discount_percent is not None and selling is not None:
-                amount = (Decimal(discount_percent) / Decimal('100.00')) * Decimal(selling)
-                # round to 2 decimals
-                return amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-        except Exception:
-            pass
-        return Decimal('0.00')
+        from .pricing import discount_amount
+        return discount_amount(self.get_latest_selling_price(), self.get_discount_percent())
 
     def get_final_price(self):
-        selling = self.get_latest_selling_price()
-        discount_amount = self.get_discount_amount()
+        return self._price_entry().final_price
+
+    def _reorder_suggestion(self):
+        if self.purchase_id is None:
+            return None
+        if not Product.purchase.is_cached(self):
+            return ReorderSuggestion._default_manager.filter(purchase_id=self.purchase_id).first()
         try:
-            if selling is None:
-                return None
-            final = Decimal(selling) - Decimal(discount_amount)
-            return final.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-        except Exception:
-            return selling
+            return self.purchase.reorder
+        except ObjectDoesNotExist:
+            return None
 
     def stock_status(self):
+        # Velocity based once the nightly reorder run has covered the batch;
+        # lists select_related('purchase__reorder') so this needs no query
+        from .reorder import stock_level
+        level = stock_level(self._reorder_suggestion())
+        if level:
+            return level
         qty = self.stock_quantity
         if qty > 15:
             return 'High'
@@ -399,7 +483,7 @@ class SellingProduct(models.Model):
     """Model representing a product's selling price history."""
     
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
-    selling_price = models.DecimalField(max_digits=10, decimal_places=2)
+    selling_price = MoneyField()
     date_added = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -424,6 +508,15 @@ class Discount(models.Model):
     end_date = models.DateField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
 
+    class Meta:
+        # Transition boundaries are looked up by date (see user.discounts)
+        indexes = [
+            models.Index(fields=['start_date'], name='user_discount_start_idx'),
+            models.Index(fields=['end_date'], name='user_discount_end_idx'),
+            # The price book looks up each product's discount running today
+            models.Index(fields=['product', 'start_date', 'end_date'], name='user_discount_product_idx'),
+        ]
+
     def is_active(self):
         today = timezone.now().date()
         return self.status == 'active' and self.start_date <= today <= self.end_date
@@ -437,12 +530,8 @@ class Discount(models.Model):
         selling = self.product.get_latest_selling_price()
         if selling is None:
             return None
-        try:
-            discount_amount = (Decimal(str(self.discount_percent)) / Decimal('100.00')) * Decimal(str(selling))
-            final = Decimal(str(selling)) - Decimal(str(discount_amount))
-            return final.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-        except Exception:
-            return None
+        from .pricing import final_price
+        return final_price(selling, self.discount_percent)
 
     @classmethod
     def remove_expired_discounts(cls):
@@ -471,16 +560,24 @@ class Invoice(models.Model):
     customer_phone = models.CharField(max_length=30, blank=True, null=True)
     customer_address = models.TextField(blank=True, null=True)
 
-    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
-    discount_amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))  # overall discount if any
+    subtotal = MoneyField(default=Decimal('0.00'))
+    discount_amount = MoneyField(default=Decimal('0.00'))  # overall discount if any
     # gst_percent = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal('0.00'))
     # gst_amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
-    roundoff = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
-    total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    roundoff = MoneyField(default=Decimal('0.00'))
+    total = MoneyField(default=Decimal('0.00'))
 
     created_by = models.ForeignKey('CustomUser', on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Invoice listings page by (date, id), newest first (see user.pagination)
+        indexes = [
+            models.Index(fields=['date', 'id'], name='user_invoice_date_idx'),
+            # Staff only see their own invoices (see reports.visible_invoices)
+            models.Index(fields=['created_by', 'date'], name='user_invoice_staff_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.bill_number} - {self.customer_name} ({self.date})"
 
@@ -489,16 +586,12 @@ class Invoice(models.Model):
         # Type hint to help linter understand the relationship
         # items is created by the related_name in InvoiceItem
         items = self.items.all()  # type: ignore
-        subtotal = sum((it.total for it in items), Decimal('0.00'))
+        # Line totals are whole paise, so the sums need no rounding
+        subtotal = sum((it.total for it in items), Money())
         # gst_amount = (subtotal * (self.gst_percent or Decimal('0.00'))) / Decimal('100.00')
-        total = subtotal - (self.discount_amount or Decimal('0.00')) - (self.roundoff or Decimal('0.00'))
-        # quantize to 2 decimals
-        subtotal = subtotal.quantize(Decimal('0.01'))
-        # gst_amount = gst_amount.quantize(Decimal('0.01'))
-        total = total.quantize(Decimal('0.01'))
         self.subtotal = subtotal
         # self.gst_amount = gst_amount
-        self.total = total
+        self.total = subtotal - (self.discount_amount or 0) - (self.roundoff or 0)
         return
 
 class InvoiceItem(models.Model):
@@ -507,20 +600,276 @@ class InvoiceItem(models.Model):
     invoice = models.ForeignKey(Invoice, related_name='items', on_delete=models.CASCADE)
     purchase = models.ForeignKey('Purchase', on_delete=models.PROTECT)  # 👈 instead of Product
     quantity = models.PositiveIntegerField(default=1)
-    rate = models.DecimalField(max_digits=12, decimal_places=2)
+    rate = MoneyField()
     discount_percent = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
-    discount_amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
-    total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    discount_amount = MoneyField(default=Decimal('0.00'))
+    total = MoneyField(default=Decimal('0.00'))
+
+    class Meta:
+        # Stock levels sum each batch's sales joined to the invoice date
+        indexes = [
+            models.Index(fields=['purchase', 'invoice'], name='user_item_purchase_idx'),
+        ]
 
     def calculate_line(self):
-        qty = Decimal(self.quantity)
-        rate = Decimal(self.rate)
+        gross = self.rate * self.quantity
         if self.discount_percent:
-            disc_amt = (rate * qty) * (Decimal(self.discount_percent) / Decimal('100.00'))
+            self.discount_amount = Money(gross * Decimal(self.discount_percent) / 100)
         else:
-            disc_amt = Decimal('0.00')
-        self.discount_amount = disc_amt.quantize(Decimal('0.01'))
-        line_total = (rate * qty) - self.discount_amount
-        self.discount_amount = disc_amt.quantize(Decimal('0.01'))
-        self.total = line_total.quantize(Decimal('0.01'))
-        return
\ No newline at end of file
+            self.discount_amount = Money()
+        self.total = gross - self.discount_amount
+        return
+
+class InvoiceSequence(models.Model):
+    """Bill number counter for one shop and financial year.
+
+    Numbers are leased in blocks by ``user.sequences`` so ``next_value`` is
+    the first number not yet handed to any worker; numbers left unused in a
+    block are skipped, never reused.
+    """
+
+    shop = models.CharField(max_length=20)
+    financial_year = models.CharField(max_length=9)
+    prefix = models.CharField(max_length=20, default='INV')
+    number_format = models.CharField(max_length=100, default='{prefix}-{shop}-{fy}-{number:06d}')
+    next_value = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('shop', 'financial_year')
+
+    def __str__(self):
+        return f"{self.shop} {self.financial_year}: next {self.next_value}"
+
+
+class CatalogChange(models.Model):
+    """One entry in the billing catalog's change log.
+
+    Written whenever a category, subcategory or purchase changes (see
+    ``user.catalog``); the id is the catalog version, so billing screens
+    ask for the entries after the version they hold.
+    """
+
+    KIND_CATEGORY = 'category'
+    KIND_SUBCATEGORY = 'subcategory'
+    KIND_PURCHASE = 'purchase'
+    KIND_RESET = 'reset'  # everything may have changed; clients reload the snapshot
+    KIND_CHOICES = (
+        (KIND_CATEGORY, 'Category'),
+        (KIND_SUBCATEGORY, 'Subcategory'),
+        (KIND_PURCHASE, 'Purchase'),
+        (KIND_RESET, 'Reset'),
+    )
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField(null=True, blank=True)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['changed_at'], name='user_catalogchange_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"v{self.pk}: {self.kind} {self.object_id or ''}".rstrip()
+
+
+# ==============================================================================
+# Reporting Models
+# ==============================================================================
+
+class DataVersion(models.Model):
+    """Change counter for one scope of data, e.g. everything the reports read.
+
+    The counter is bumped by the signal handlers in ``user.signals`` on every
+    write to the scope, so caches keyed by it (see ``user.versioning``) stay
+    valid across processes without being flushed explicitly.
+    """
+
+    scope = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.scope}: v{self.version}"
+
+
+class DailyLedger(models.Model):
+    """Per-day rollup of income and expenses used by the dashboards.
+
+    Rows are maintained by the signal handlers in ``user.signals`` and can be
+    rebuilt from scratch with the ``rebuild_daily_ledger`` management command.
+    """
+
+    date = models.DateField(unique=True)
+    income = MoneyField(default=Decimal('0.00'))
+    expense = MoneyField(default=Decimal('0.00'))
+    invoice_count = models.PositiveIntegerField(default=0)
+    item_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.date}: income ₹{self.income}, expense ₹{self.expense}"
+
+
+class SalesCube(models.Model):
+    """Pre-aggregated sales keyed by day, category, subcategory, purchase and staff.
+
+    Rows are maintained by the signal handlers in ``user.signals`` and can be
+    rebuilt from scratch with the ``rebuild_sales_cube`` management command.
+    """
+
+    day = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    subcategory = models.ForeignKey(SubCategory, on_delete=models.CASCADE)
+    purchase = models.ForeignKey(Purchase, on_delete=models.CASCADE)
+    created_by = models.ForeignKey('CustomUser', on_delete=models.SET_NULL, null=True, blank=True)
+    qty = models.PositiveIntegerField(default=0)
+    revenue = MoneyField(default=Decimal('0.00'))
+    cost = MoneyField(default=Decimal('0.00'))
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['day', 'category'], name='user_cube_day_category_idx'),
+            models.Index(fields=['created_by', 'day'], name='user_cube_staff_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} - {self.purchase_id}: {self.qty} sold"
+
+
+class ExpiryAlert(models.Model):
+    """Near-expiry stock of one category on one day, in one expiry bucket.
+
+    Rows are recorded daily by the ``record_expiry_alerts`` management
+    command (see ``user.expiry``) and read by the owner dashboard.
+    """
+
+    BUCKET_EXPIRED = 'expired'
+    BUCKET_WEEK = 'week'
+    BUCKET_MONTH = 'month'
+    BUCKET_CHOICES = (
+        (BUCKET_EXPIRED, 'Expired'),
+        (BUCKET_WEEK, 'Within 7 days'),
+        (BUCKET_MONTH, 'Within 30 days'),
+    )
+
+    day = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    bucket = models.CharField(max_length=10, choices=BUCKET_CHOICES)
+    batch_count = models.PositiveIntegerField(default=0)
+    quantity = models.PositiveIntegerField(default=0)
+    stock_value = MoneyField(default=Decimal('0.00'))
+
+    class Meta:
+        unique_together = ('day', 'category', 'bucket')
+        ordering = ['day', 'bucket', '-stock_value']
+
+    def __str__(self):
+        return f"{self.day} {self.category_id} {self.bucket}: ₹{self.stock_value}"
+
+
+class ReportJob(models.Model):
+    """A report computed in the background by the ``run_report_worker`` command.
+
+    Jobs are queued by ``user.jobs.submit``; while one is pending or running,
+    identical submissions (same kind and parameters) share it.
+    """
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    )
+    ACTIVE_STATUSES = (STATUS_PENDING, STATUS_RUNNING)
+
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    params_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    result = models.TextField(blank=True)
+    result_file = models.CharField(max_length=500, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    progress = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    requested_by = models.ForeignKey('CustomUser', on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='user_reportjob_queue_idx'),
+        ]
+        constraints = [
+            # At most one live job per kind and parameters
+            models.UniqueConstraint(
+                fields=['params_hash'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='user_reportjob_live_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+class ReorderSuggestion(models.Model):
+    """Sales velocity and reorder point of one live batch.
+
+    Rows are replaced nightly by the ``compute_reorder_suggestions``
+    management command (see ``user.reorder``).
+    """
+
+    STATUS_OUT = 'out'
+    STATUS_REORDER = 'reorder'
+    STATUS_OK = 'ok'
+    STATUS_IDLE = 'idle'
+    STATUS_CHOICES = (
+        (STATUS_OUT, 'Out of stock'),
+        (STATUS_REORDER, 'Reorder'),
+        (STATUS_OK, 'Enough stock'),
+        (STATUS_IDLE, 'No recent sales'),
+    )
+
+    day = models.DateField()
+    purchase = models.OneToOneField(Purchase, on_delete=models.CASCADE, related_name='reorder')
+    on_hand = models.PositiveIntegerField(default=0)
+    velocity = models.FloatField(default=0)  # units sold per day
+    days_of_cover = models.FloatField(null=True, blank=True)  # None when nothing sells
+    reorder_point = models.PositiveIntegerField(default=0)
+    suggested_quantity = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_IDLE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'days_of_cover'], name='user_reorder_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.purchase_id}: {self.status} ({self.on_hand} on hand)"
+
+
+class ReportSnapshot(models.Model):
+    """A read-only copy of the database for the report pages.
+
+    Recorded by the ``snapshot_reports`` management command after each copy
+    (see ``user.snapshots``); report views read from the latest copy while
+    it is younger than REPORT_SNAPSHOT['MAX_AGE'].
+    """
+
+    taken_at = models.DateTimeField(default=timezone.now)  # the data is as of this time
+    seconds = models.FloatField(default=0)  # how long the copy took
+    size = models.PositiveBigIntegerField(default=0)  # bytes
+
+    def __str__(self):
+        return f"Snapshot of {self.taken_at:%Y-%m-%d %H:%M:%S}"
@@ -0,0 +1,111 @@
+"""
+Money module for the Bizeasy application.
+Amounts are stored as whole paise and handled in Python as ``Money``.
+"""
+
+# Standard library imports
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+# Django imports
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+from django.utils.translation import gettext_lazy as _
+
+try:
+    from django.db.models.expressions import Combinable, register_combinable_fields
+except ImportError:  # Django < 4.2 infers same-type expressions itself
+    register_combinable_fields = None
+
+
+CENT = Decimal('0.01')
+
+
+class Money(Decimal):
+    """A rupee amount with exactly two decimal places.
+
+    A ``Decimal`` subclass, so it formats, compares and does arithmetic like
+    the DecimalField values it replaced; ``paise`` is the stored integer.
+    Floats are converted through their shortest repr, so 0.1 is 0.10.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, value='0'):
+        if isinstance(value, float):
+            value = repr(value)
+        return super().__new__(cls, Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP))
+
+    @classmethod
+    def from_paise(cls, paise):
+        # Database sums come back as int, Decimal (PostgreSQL) or float
+        return cls(Decimal(paise).scaleb(-2))
+
+    @property
+    def paise(self):
+        return int(self.scaleb(2))
+
+
+def to_paise(value):
+    """Whole paise for a rupee amount (int, float, Decimal or string)."""
+    return None if value is None else Money(value).paise
+
+
+def number(value):
+    """A money value as a JSON number, or None."""
+    return None if value is None else float(value)
+
+
+# ==============================================================================
+# Model Field
+# ==============================================================================
+
+class MoneyAttribute(DeferredAttribute):
+    """Coerces numbers assigned to a MoneyField to Money."""
+
+    def __set__(self, instance, value):
+        if isinstance(value, (int, float, Decimal)) and not isinstance(value, (bool, Money)):
+            value = Money(value)
+        instance.__dict__[self.field.attname] = value
+
+
+class MoneyField(models.Field):
+    """Rupee amount stored as a whole number of paise (BIGINT).
+
+    SUMs and comparisons are exact integer arithmetic in the database.
+    Expressions mixing it with another type (quantity * rate) need
+    ``output_field=MoneyField()``.
+    """
+
+    description = _('Amount of money, stored in paise')
+    descriptor_class = MoneyAttribute
+    default_error_messages = {
+        'invalid': _('“%(value)s” value must be an amount of money.'),
+    }
+
+    def get_internal_type(self):
+        return 'BigIntegerField'
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else Money.from_paise(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Money):
+            return value
+        try:
+            return Money(value)
+        except (InvalidOperation, TypeError, ValueError):
+            raise ValidationError(self.error_messages['invalid'], code='invalid', params={'value': value})
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        return None if value is None else self.to_python(value).paise
+
+    def formfield(self, **kwargs):
+        return super().formfield(**{'form_class': forms.DecimalField, 'decimal_places': 2, **kwargs})
+
+
+if register_combinable_fields is not None:
+    for _connector in (Combinable.ADD, Combinable.SUB):
+        register_combinable_fields(MoneyField, _connector, MoneyField, MoneyField)
@@ -0,0 +1,123 @@
+"""
+Keyset pagination module for the Bizeasy application.
+Pages listings newest first by (date, id) without OFFSET scans.
+"""
+
+# Standard library imports
+from urllib.parse import urlencode
+
+# Django imports
+from django.db.models import Q
+from django.http import JsonResponse
+
+# Local imports
+from .utils import as_date
+
+
+PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+
+def encode_cursor(obj, date_field='date'):
+    """Cursor for a row: its date and id, e.g. '2024-05-01_42'."""
+    return f"{as_date(getattr(obj, date_field)).isoformat()}_{obj.pk}"
+
+
+def decode_cursor(cursor):
+    """Return ``(date, id)`` for a cursor, or None if it is missing or malformed."""
+    try:
+        day, pk = cursor.rsplit('_', 1)
+        return as_date(day), int(pk)
+    except Exception:
+        return None
+
+
+class KeysetPage:
+    """One page of a keyset-paginated listing.
+
+    ``object_list`` holds the rows, newest first. ``next_cursor`` and
+    ``previous_cursor`` are passed back as ``?after=`` and ``?before=`` to
+    fetch the older and newer neighbouring pages.
+    """
+
+    def __init__(self, object_list, has_next, has_previous, date_field, query=None):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.date_field = date_field
+        self.query = query or {}
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def next_cursor(self):
+        if self.has_next and self.object_list:
+            return encode_cursor(self.object_list[-1], self.date_field)
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous and self.object_list:
+            return encode_cursor(self.object_list[0], self.date_field)
+        return None
+
+    def _url(self, **cursor):
+        return '?' + urlencode(dict(self.query, **cursor))
+
+    @property
+    def next_url(self):
+        return self._url(after=self.next_cursor) if self.next_cursor else None
+
+    @property
+    def previous_url(self):
+        return self._url(before=self.previous_cursor) if self.previous_cursor else None
+
+
+def paginate(queryset, params, date_field='date', per_page=PER_PAGE):
+    """Return a KeysetPage of ``queryset`` ordered by (date, id) descending.
+
+    ``params`` is the request's GET QueryDict: ``after`` / ``before`` select
+    the page, ``per_page`` (capped at MAX_PER_PAGE) its size, and every
+    other parameter is kept in the page's navigation URLs.
+    """
+    try:
+        per_page = max(1, min(int(params.get('per_page', per_page)), MAX_PER_PAGE))
+    except (TypeError, ValueError):
+        pass
+    query = {
+        key: value for key, value in params.items()
+        if key not in ('after', 'before', 'format') and value != ''
+    }
+
+    after = decode_cursor(params.get('after') or '')
+    before = None if after else decode_cursor(params.get('before') or '')
+
+    if before:
+        day, pk = before
+        rows = list(
+            queryset.filter(Q(**{f'{date_field}__gt': day}) | Q(**{date_field: day, 'pk__gt': pk}))
+            .order_by(date_field, 'pk')[:per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        return KeysetPage(rows, True, has_previous, date_field, query)
+
+    if after:
+        day, pk = after
+        queryset = queryset.filter(Q(**{f'{date_field}__lt': day}) | Q(**{date_field: day, 'pk__lt': pk}))
+    rows = list(queryset.order_by(f'-{date_field}', '-pk')[:per_page + 1])
+    return KeysetPage(rows[:per_page], len(rows) > per_page, bool(after), date_field, query)
+
+
+def json_page(page, serialize, **extra):
+    """JSON response for infinite scroll: rows, cursors and any extra keys."""
+    return JsonResponse(dict(
+        results=[serialize(obj) for obj in page.object_list],
+        next_cursor=page.next_cursor,
+        previous_cursor=page.previous_cursor,
+        **extra
+    ))
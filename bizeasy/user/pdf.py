@@ -0,0 +1,44 @@
+"""
+Document conversion module for the Bizeasy application.
+Turns rendered invoice HTML into PDF. Runs inside worker processes, so it
+must not import Django.
+"""
+
+# Standard library imports
+import io
+
+try:
+    from xhtml2pdf import pisa
+except ImportError:  # pragma: no cover - PDF output is optional
+    pisa = None
+
+
+# Output format -> file extension
+FORMATS = {
+    'pdf': 'pdf',
+    'html': 'html',
+}
+
+
+class ConversionError(Exception):
+    """Raised when a document cannot be produced."""
+
+
+def available(output_format):
+    """Return True if ``output_format`` can be produced here."""
+    return output_format == 'html' or (output_format == 'pdf' and pisa is not None)
+
+
+def convert(html, output_format='pdf'):
+    """Return the bytes of ``html`` converted to ``output_format``."""
+    if output_format == 'html':
+        return html.encode('utf-8')
+    if output_format != 'pdf':
+        raise ConversionError(f'Unknown format: {output_format}')
+    if pisa is None:
+        raise ConversionError('PDF output needs the xhtml2pdf package')
+    output = io.BytesIO()
+    status = pisa.CreatePDF(html, dest=output, encoding='utf-8')
+    if status.err:
+        raise ConversionError(f'xhtml2pdf reported {status.err} errors')
+    return output.getvalue()
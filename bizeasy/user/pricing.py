@@ -0,0 +1,203 @@
+"""
+Price book module for the Bizeasy application.
+Caches each product's latest selling price, active discount and final price.
+"""
+
+# Standard library imports
+import threading
+import time
+from collections import namedtuple
+from decimal import Decimal
+
+# Django imports
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+# Local imports
+from . import snapshots, versioning
+from .money import Money
+
+
+DEFAULTS = {
+    # How often a process checks the database stamp for other processes' edits
+    'CHECK_SECONDS': 5,
+}
+
+
+def config(key):
+    """Read a ``PRICE_BOOK`` setting, falling back to DEFAULTS."""
+    return getattr(settings, 'PRICE_BOOK', {}).get(key, DEFAULTS[key])
+
+
+PriceEntry = namedtuple('PriceEntry', ['selling_price', 'discount', 'final_price'])
+
+
+def discount_amount(selling_price, discount_percent):
+    """Discount on ``selling_price`` for a percentage, rounded to paise."""
+    if discount_percent is None or selling_price is None:
+        return Money()
+    return Money(Money(selling_price) * Decimal(discount_percent) / 100)
+
+
+def final_price(selling_price, discount_percent):
+    """Selling price after the discount, rounded to paise."""
+    if selling_price is None:
+        return None
+    return Money(Money(selling_price) - discount_amount(selling_price, discount_percent))
+
+
+class PriceBook:
+    """Process-level cache of product prices.
+
+    Entries are loaded in bulk (two queries for any number of products).
+    Writes in this process drop them through the signal handlers in
+    ``user.signals``; writes in other processes bump the ``prices`` data
+    version, which is compared at most every CHECK_SECONDS. The whole book
+    also expires when the date changes, since discounts switch on and off
+    by date.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._purchase_products = {}
+        self._day = None
+        self._stamp = None
+        self._checked = 0.0
+        # Bumped by invalidate() and clear(), so a load that raced a write is not kept
+        self._generation = 0
+
+    def _drop(self):
+        self._entries.clear()
+        self._purchase_products.clear()
+        self._generation += 1
+
+    def _revalidate(self):
+        """Expire the book on a new day or when the prices stamp moved.
+
+        Returns ``(today, generation)``; loads started after this call may
+        be stored only while the generation is unchanged.
+        """
+        now = time.monotonic()
+        with self._lock:
+            today = timezone.now().date()
+            if self._day != today:
+                self._drop()
+                self._day = today
+            if self._stamp is not None and now - self._checked < config('CHECK_SECONDS'):
+                return today, self._generation
+        # Shared with billing, so never read from the report snapshot
+        with snapshots.live():
+            current = versioning.stamp(versioning.PRICES)
+        with self._lock:
+            if current != self._stamp:
+                self._drop()
+                self._stamp = current
+            self._checked = now
+            return today, self._generation
+
+    def _load(self, product_ids, today):
+        from .models import Discount, Product, SellingProduct
+
+        latest_price = SellingProduct._default_manager.filter(
+            product=OuterRef('pk')
+        ).order_by('-date_added').values('selling_price')[:1]
+        prices = Product._default_manager.filter(pk__in=product_ids).annotate(
+            latest_price=Subquery(latest_price)
+        ).values_list('pk', 'selling_price', 'latest_price')
+
+        discounts = {}
+        for discount in Discount._default_manager.filter(
+            product_id__in=product_ids, start_date__lte=today, end_date__gte=today
+        ).order_by('product_id', '-start_date'):
+            discounts.setdefault(discount.product_id, discount)
+
+        entries = {}
+        for pk, selling_price, latest in prices:
+            selling = latest if latest is not None else selling_price
+            discount = discounts.get(pk)
+            percent = discount.discount_percent if discount else None
+            entries[pk] = PriceEntry(selling, discount, final_price(selling, percent))
+        return entries
+
+    def resolve(self, products):
+        """Return ``{product_id: PriceEntry}`` for products or product ids."""
+        product_ids = {getattr(product, 'pk', product) for product in products}
+        today, generation = self._revalidate()
+        with self._lock:
+            found = {pk: self._entries[pk] for pk in product_ids if pk in self._entries}
+        missing = [pk for pk in product_ids if pk not in found]
+        if missing:
+            with snapshots.live():
+                loaded = self._load(missing, today)
+            with self._lock:
+                if self._generation == generation:
+                    self._entries.update(loaded)
+            found.update(loaded)
+        return found
+
+    def get(self, product):
+        """Return the PriceEntry for a single product (or None if it is gone)."""
+        pk = getattr(product, 'pk', product)
+        return self.resolve([pk]).get(pk)
+
+    def for_purchase(self, purchase_id):
+        """Return the PriceEntry of the product created for a purchase, if any."""
+        return self.resolve_purchases([purchase_id]).get(purchase_id)
+
+    def resolve_purchases(self, purchase_ids):
+        """Return ``{purchase_id: PriceEntry}`` for the purchases that have a product.
+
+        Purchases not seen before are mapped to their product in one query;
+        the products are then resolved in bulk.
+        """
+        from .models import Product
+
+        purchase_ids = set(purchase_ids)
+        _, generation = self._revalidate()
+        with self._lock:
+            mapped = {pk: self._purchase_products[pk] for pk in purchase_ids if pk in self._purchase_products}
+        missing = purchase_ids - set(mapped)
+        if missing:
+            loaded = dict.fromkeys(missing)
+            with snapshots.live():
+                # Descending, so the oldest product of a purchase is kept
+                loaded.update(Product._default_manager.filter(
+                    purchase_id__in=missing
+                ).order_by('-pk').values_list('purchase_id', 'pk'))
+            with self._lock:
+                if self._generation == generation:
+                    self._purchase_products.update(loaded)
+            mapped.update(loaded)
+        prices = self.resolve([product_id for product_id in mapped.values() if product_id])
+        return {
+            purchase_id: prices[product_id]
+            for purchase_id, product_id in mapped.items() if product_id in prices
+        }
+
+    def invalidate(self, product_id=None, purchase_id=None):
+        """Drop cached entries for a product and/or a purchase.
+
+        The product cached for ``purchase_id`` is dropped as well as
+        ``product_id`` when they differ (a product moved to another purchase).
+        """
+        with self._lock:
+            self._generation += 1
+            if purchase_id is not None:
+                self._entries.pop(self._purchase_products.pop(purchase_id, None), None)
+            if product_id is not None:
+                self._entries.pop(product_id, None)
+                for purchase, product in list(self._purchase_products.items()):
+                    if product == product_id:
+                        del self._purchase_products[purchase]
+
+    def clear(self):
+        """Drop every cached entry; the next read checks the stamp again."""
+        with self._lock:
+            self._drop()
+            self._stamp = None
+
+
+# Shared instance used by the models and views
+price_book = PriceBook()
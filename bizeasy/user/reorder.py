@@ -0,0 +1,259 @@
+"""
+Reorder module for the Bizeasy application.
+Sales velocity, days of cover and reorder points for every live batch,
+computed in one vectorised pass and stored nightly.
+"""
+
+# Standard library imports
+import math
+from datetime import timedelta
+
+# Django imports
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+# Local imports
+from . import versioning
+from .models import Purchase, ReorderSuggestion, SalesCube
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - falls back to a plain Python pass
+    np = None
+
+
+DEFAULTS = {
+    'WINDOW_DAYS': 28,
+    'LEAD_TIME_DAYS': 7,
+    'REVIEW_DAYS': 7,
+    # Standard deviations of daily demand held as safety stock (~95% service)
+    'SERVICE_FACTOR': 1.65,
+}
+
+NEEDS_ACTION = (ReorderSuggestion.STATUS_OUT, ReorderSuggestion.STATUS_REORDER)
+
+
+def config(key):
+    """Read a ``REORDER`` setting, falling back to DEFAULTS."""
+    return getattr(settings, 'REORDER', {}).get(key, DEFAULTS[key])
+
+
+def live_batches():
+    """Purchases that can still be sold from (not deleted, not stock-update rows)."""
+    return Purchase._default_manager.filter(is_deleted=False, kind=Purchase.KIND_PURCHASE)
+
+
+# ==============================================================================
+# Computation
+# ==============================================================================
+
+def _load(today, window):
+    """Return ``(batches, sales)``.
+
+    ``batches`` is ``[(purchase_id, on_hand, purchase_date)]``; ``sales`` is
+    ``[(purchase_id, day, qty)]`` for every day in the window with a sale.
+    """
+    batches = list(live_batches().order_by('pk').values_list('pk', 'quantity', 'date'))
+    sales = list(
+        SalesCube._default_manager
+        .filter(
+            day__gt=today - timedelta(days=window), day__lte=today,
+            purchase__is_deleted=False, purchase__kind=Purchase.KIND_PURCHASE,
+        )
+        .values_list('purchase_id', 'day')
+        .annotate(total=Sum('qty'))
+        .order_by()
+    )
+    return batches, sales
+
+
+def _ceil(value):
+    # Round first so 6.0000000001 (float noise) does not become 7
+    return math.ceil(round(value, 6))
+
+
+def _compute_numpy(batches, sales, today, window, lead_time, review, factor):
+    """Column-wise pass over all batches at once; returns per-batch lists."""
+    position = {pk: index for index, (pk, _, _) in enumerate(batches)}
+    count = len(batches)
+    on_hand = np.fromiter((quantity for _, quantity, _ in batches), float, count)
+    # Days each batch has been on sale within the window (at least one)
+    days = np.clip(np.fromiter(((today - date).days + 1 for _, _, date in batches), float, count), 1, window)
+    # A batch deleted between the two queries is simply left out
+    sales = [row for row in sales if row[0] in position]
+    rows = np.fromiter((position[pk] for pk, _, _ in sales), int, len(sales))
+    qty = np.fromiter((total for _, _, total in sales), float, len(sales))
+
+    # Days without sales add nothing to either sum, so no day matrix is needed
+    sold = np.bincount(rows, weights=qty, minlength=count)
+    squares = np.bincount(rows, weights=qty * qty, minlength=count)
+    velocity = sold / days
+    deviation = np.sqrt(np.maximum(squares / days - velocity ** 2, 0))
+    safety = factor * deviation * math.sqrt(lead_time)
+
+    selling = velocity > 0
+    reorder_point = np.where(selling, np.ceil(np.round(velocity * lead_time + safety, 6)), 0)
+    target = np.ceil(np.round(velocity * (lead_time + review) + safety - on_hand, 6))
+    suggested = np.where(selling, np.maximum(target, 0), 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cover = np.where(selling, on_hand / velocity, np.nan)
+    return (
+        velocity.tolist(), [None if math.isnan(value) else value for value in cover.tolist()],
+        reorder_point.astype(int).tolist(), suggested.astype(int).tolist(),
+    )
+
+
+def _compute_python(batches, sales, today, window, lead_time, review, factor):
+    """Same figures as _compute_numpy, one batch at a time."""
+    sold, squares = {}, {}
+    for pk, _, total in sales:
+        sold[pk] = sold.get(pk, 0) + total
+        squares[pk] = squares.get(pk, 0) + total * total
+    velocities, covers, reorder_points, suggestions = [], [], [], []
+    for pk, on_hand, date in batches:
+        days = min(max((today - date).days + 1, 1), window)
+        velocity = sold.get(pk, 0) / days
+        deviation = math.sqrt(max(squares.get(pk, 0) / days - velocity ** 2, 0))
+        safety = factor * deviation * math.sqrt(lead_time)
+        velocities.append(velocity)
+        if velocity > 0:
+            covers.append(on_hand / velocity)
+            reorder_points.append(_ceil(velocity * lead_time + safety))
+            suggestions.append(max(_ceil(velocity * (lead_time + review) + safety - on_hand), 0))
+        else:
+            covers.append(None)
+            reorder_points.append(0)
+            suggestions.append(0)
+    return velocities, covers, reorder_points, suggestions
+
+
+def _status(on_hand, velocity, reorder_point):
+    if velocity <= 0:
+        return ReorderSuggestion.STATUS_IDLE
+    if on_hand <= 0:
+        return ReorderSuggestion.STATUS_OUT
+    if on_hand <= reorder_point:
+        return ReorderSuggestion.STATUS_REORDER
+    return ReorderSuggestion.STATUS_OK
+
+
+def compute(today=None, vectorised=None):
+    """Return unsaved ReorderSuggestion rows for every live batch.
+
+    Velocity is the average daily sale over the last ``WINDOW_DAYS`` (or
+    since the purchase, if later); the reorder point covers the lead time
+    plus safety stock, and the suggested quantity tops the batch up to
+    last until the next review. ``vectorised`` defaults to using NumPy
+    when it is installed.
+    """
+    today = today or timezone.now().date()
+    if vectorised is None:
+        vectorised = np is not None
+    window, lead_time, review = config('WINDOW_DAYS'), config('LEAD_TIME_DAYS'), config('REVIEW_DAYS')
+    batches, sales = _load(today, window)
+    if not batches:
+        return []
+    compute_pass = _compute_numpy if vectorised else _compute_python
+    velocities, covers, reorder_points, suggestions = compute_pass(
+        batches, sales, today, window, lead_time, review, config('SERVICE_FACTOR')
+    )
+    return [
+        ReorderSuggestion(
+            day=today,
+            purchase_id=pk,
+            on_hand=on_hand,
+            velocity=velocity,
+            days_of_cover=cover,
+            reorder_point=reorder_point,
+            suggested_quantity=suggested,
+            status=_status(on_hand, velocity, reorder_point),
+        )
+        for (pk, on_hand, _), velocity, cover, reorder_point, suggested
+        in zip(batches, velocities, covers, reorder_points, suggestions)
+    ]
+
+
+@transaction.atomic
+def refresh(today=None):
+    """Replace the stored suggestions with a fresh run; returns the row count."""
+    rows = compute(today)
+    ReorderSuggestion._default_manager.all().delete()
+    ReorderSuggestion._default_manager.bulk_create(rows, batch_size=500)
+    # The shop report's low-stock list reads these rows
+    versioning.bump(versioning.REPORTS)
+    return len(rows)
+
+
+# ==============================================================================
+# Reading
+# ==============================================================================
+
+def suggestions(params=None):
+    """Stored suggestions, the batches that will run out soonest first.
+
+    Only those out of stock or at their reorder point, unless
+    ``params['status']`` is 'all' (every batch that is selling).
+    """
+    statuses = NEEDS_ACTION
+    if params and params.get('status') == 'all':
+        statuses = NEEDS_ACTION + (ReorderSuggestion.STATUS_OK,)
+    return (
+        ReorderSuggestion._default_manager
+        .filter(status__in=statuses)
+        .select_related('purchase__category', 'purchase__subcategory')
+        .order_by('days_of_cover', 'pk')
+    )
+
+
+def computed_on():
+    """Day of the stored run, or None before the first one."""
+    return ReorderSuggestion._default_manager.values_list('day', flat=True).first()
+
+
+def low_stock(limit=5, today=None):
+    """The ``limit`` batches most in need of reordering.
+
+    Reads the stored run; before the first run the suggestions are
+    computed on the fly.
+    """
+    if computed_on() is not None:
+        return list(suggestions()[:limit])
+    rows = sorted(
+        (row for row in compute(today) if row.status in NEEDS_ACTION),
+        key=lambda row: (row.days_of_cover, row.purchase_id),
+    )[:limit]
+    purchases = live_batches().select_related('category', 'subcategory').in_bulk([row.purchase_id for row in rows])
+    for row in rows:
+        row.purchase = purchases[row.purchase_id]
+    return rows
+
+
+def stock_level(row):
+    """'Low', 'Medium' or 'High' from a stored suggestion, or None if there
+    is none (the batch has no recent sales or has not been covered yet)."""
+    if row is None or row.status == ReorderSuggestion.STATUS_IDLE:
+        return None
+    if row.status in NEEDS_ACTION:
+        return 'Low'
+    # Medium when the batch reaches its reorder point before the next review
+    if row.on_hand - row.velocity * config('REVIEW_DAYS') <= row.reorder_point:
+        return 'Medium'
+    return 'High'
+
+
+def as_json(row):
+    purchase = row.purchase
+    return {
+        'purchase_id': row.purchase_id,
+        'product_name': purchase.product_name,
+        'category': purchase.category.name,
+        'subcategory': purchase.subcategory.name,
+        'on_hand': row.on_hand,
+        'velocity': round(row.velocity, 3),
+        'days_of_cover': None if row.days_of_cover is None else round(row.days_of_cover, 1),
+        'reorder_point': row.reorder_point,
+        'suggested_quantity': row.suggested_quantity,
+        'status': row.status,
+    }
@@ -0,0 +1,487 @@
+"""
+Shop report module for the Bizeasy application.
+Builds every section of the shop report from one filtered base, runs the
+independent queries in parallel and caches the result per data version.
+"""
+
+# Standard library imports
+import contextvars
+import threading
+from datetime import datetime, timedelta
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+# Django imports
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+# Local imports
+from . import cube, expiry, ledger, reorder, search, versioning
+from .categories import category_tree
+from .models import CustomUser, Invoice, Purchase
+from .money import MoneyField
+from .utils import as_date, date_filter
+
+
+DEFAULTS = {
+    'WORKERS': 4,
+    'CACHE_SIZE': 32,
+}
+
+# The expiry section lists batches expiring within this many days (and all
+# expired ones); the bucket counts and the export cover every batch
+EXPIRY_LIST_DAYS = 365
+
+
+def config(key):
+    """Read a ``SHOP_REPORT`` setting, falling back to DEFAULTS."""
+    return getattr(settings, 'SHOP_REPORT', {}).get(key, DEFAULTS[key])
+
+
+# Filtered querysets shared by every section
+ReportBase = namedtuple('ReportBase', 'from_date to_date today invoices purchases sales_filters')
+
+
+def report_base(from_date=None, to_date=None, today=None, staff=None):
+    """Build the shared base for an inclusive date range.
+
+    With ``staff`` the invoices and sales are limited to that staff member's.
+    """
+    invoices = Invoice._default_manager.filter(date_filter('date', from_date=from_date, to_date=to_date))
+    if staff is not None:
+        invoices = invoices.filter(created_by=staff)
+    return ReportBase(
+        from_date=from_date,
+        to_date=to_date,
+        today=today or timezone.now().date(),
+        invoices=invoices,
+        purchases=Purchase._default_manager.filter(
+            is_deleted=False, kind=Purchase.KIND_PURCHASE
+        ).select_related('category', 'subcategory'),
+        sales_filters={} if staff is None else {'created_by': staff},
+    )
+
+
+# ==============================================================================
+# Page Filters
+# ==============================================================================
+
+def stock_levels(purchases, from_date=None, to_date=None):
+    """Annotate purchases with total_purchased, total_sold and balance.
+
+    Stock comes from the counters on Purchase; sales within a date range
+    come from the sales cube.
+    """
+    return purchases.annotate(
+        total_purchased=F("received_quantity"),
+        total_sold=cube.sold_quantity(from_date, to_date),
+    ).annotate(
+        balance=F("total_purchased") - F("total_sold")
+    )
+
+
+def filter_purchases(purchases, params, search_columns=search.NAME_COLUMNS):
+    """Apply the ``from_date``, ``to_date``, ``category`` and ``q`` filters."""
+    purchases = purchases.filter(date_filter(
+        'date', from_date=params.get('from_date'), to_date=params.get('to_date')
+    ))
+    if params.get('category'):
+        purchases = purchases.filter(category_id=params['category'])
+    search_query = (params.get('q') or '').strip()
+    if search_query:
+        purchases = search.filter_purchases(purchases, search_query, columns=search_columns)
+    return purchases
+
+
+def stock_report_purchases(params):
+    """Purchases shown on the stock report, with their stock levels."""
+    purchases = Purchase._default_manager.filter(is_deleted=False, kind=Purchase.KIND_PURCHASE)
+    from_date, to_date = params.get('from_date'), params.get('to_date')
+    # Sales are only scoped by date when both ends of the range are given
+    if not (from_date and to_date):
+        from_date = to_date = None
+    return stock_levels(filter_purchases(purchases, params), from_date, to_date)
+
+
+def history_purchases(params):
+    """Purchases shown on the purchase history, including deleted ones.
+
+    ``session`` selects 'active', 'deleted' or (by default) all purchases.
+    """
+    purchases = Purchase._default_manager.filter(kind=Purchase.KIND_PURCHASE)
+    session = params.get('session', 'all')
+    if session == 'active':
+        purchases = purchases.filter(is_deleted=False)
+    elif session == 'deleted':
+        purchases = purchases.filter(is_deleted=True)
+    return filter_purchases(purchases, params, search_columns=search.NAME_COLUMNS + ('notes',))
+
+
+def visible_invoices(user, params=None):
+    """Invoices a user may see (staff only their own), optionally date-filtered."""
+    invoices = Invoice._default_manager.all()
+    if getattr(user, 'role', None) == 'staff':
+        invoices = invoices.filter(created_by=user)
+    if params:
+        invoices = invoices.filter(date_filter(
+            'date', from_date=params.get('from_date'), to_date=params.get('to_date')
+        ))
+    return invoices
+
+
+# ==============================================================================
+# Sections
+# ==============================================================================
+
+def sales_summary(base):
+    summary = base.invoices.aggregate(
+        total_sales=Coalesce(Sum("total"), Value(0), output_field=MoneyField()),
+        total_discount=Coalesce(Sum("discount_amount"), Value(0), output_field=MoneyField()),
+    )
+    summary['net_revenue'] = summary['total_sales'] - summary['total_discount']
+    return summary
+
+
+def product_sales(base):
+    rows = cube.rollup('product', base.from_date, base.to_date, **base.sales_filters)
+    for row in rows:
+        if row['total_qty'] > 0:
+            row['avg_price'] = row['total_amount'] / row['total_qty']
+            row['profit_per_unit'] = row['profit'] / row['total_qty']
+        else:
+            row['avg_price'] = Decimal(0)
+            row['profit_per_unit'] = Decimal(0)
+    return rows
+
+
+def category_sales(base):
+    return cube.rollup('category', base.from_date, base.to_date, **base.sales_filters)
+
+
+def subcategory_sales(base):
+    return cube.rollup('subcategory', base.from_date, base.to_date, **base.sales_filters)
+
+
+def invoices(base):
+    return list(base.invoices.annotate(net_amount=F("total") - F("discount_amount")).order_by("-total"))
+
+
+def stock_data(base):
+    return list(stock_levels(base.purchases, base.from_date, base.to_date).order_by("balance", "pk"))
+
+
+def expired_purchases(base):
+    """Batches expired or expiring within EXPIRY_LIST_DAYS, soonest first."""
+    return list(expiry.expiring(base.today, within=EXPIRY_LIST_DAYS).select_related('category', 'subcategory'))
+
+
+def expiry_buckets(base):
+    return expiry.bucket_counts(base.today)
+
+
+def staff_users(base):
+    return list(CustomUser._default_manager.filter(role='staff'))
+
+
+def low_stock(base):
+    # Current stock against sales velocity, whatever the report's dates
+    return reorder.low_stock(today=base.today)
+
+
+# Independent sections of the shop report; each is one query against the base
+SECTIONS = {
+    'sales_summary': sales_summary,
+    'product_sales': product_sales,
+    'category_sales': category_sales,
+    'subcategory_sales': subcategory_sales,
+    'invoices': invoices,
+    'stock_data': stock_data,
+    'expired_purchases': expired_purchases,
+    'expiry_buckets': expiry_buckets,
+    'staff_users': staff_users,
+    'low_stock': low_stock,
+}
+
+# Sections of a staff member's report
+STAFF_SECTIONS = ('sales_summary', 'product_sales', 'category_sales', 'subcategory_sales', 'invoices')
+
+
+def _derive(report):
+    """Add the figures computed from other sections, without further queries."""
+    total_sales = report['sales_summary']['total_sales']
+    for row in report['category_sales']:
+        row['percentage'] = (row['total_amount'] / total_sales) * 100 if total_sales > 0 else 0
+
+    # product_sales is ordered by profit, highest first
+    profitable = [row for row in report['product_sales'] if row['profit'] > 0]
+    report['top_selling'] = report['product_sales'][:5]
+    report['high_profit_products'] = profitable[:5]
+    report['low_profit_products'] = profitable[::-1][:5]
+
+    report['total_cost'] = sum(row['total_cost'] for row in report['product_sales'])
+    report['total_profit'] = report['sales_summary']['net_revenue'] - report['total_cost']
+    return report
+
+
+# ==============================================================================
+# Building and Caching
+# ==============================================================================
+
+def _run_section(section, base):
+    try:
+        return section(base)
+    finally:
+        # Worker threads open their own connections; don't leak them
+        connections.close_all()
+
+
+def build(base, sections=None, workers=None):
+    """Compute the named sections (all of SECTIONS by default) for ``base``.
+
+    Sections run on a thread pool, each on its own connection. Inside a
+    transaction they run serially on the caller's connection instead, as
+    other connections would not see its uncommitted rows.
+    """
+    sections = {name: SECTIONS[name] for name in (sections or SECTIONS)}
+    workers = config('WORKERS') if workers is None else workers
+    if workers > 1 and not connection.in_atomic_block:
+        with ThreadPoolExecutor(max_workers=min(workers, len(sections))) as pool:
+            # Each section runs in a copy of this context, so it reads from
+            # the same database (see user.snapshots)
+            futures = {
+                name: pool.submit(contextvars.copy_context().run, _run_section, section, base)
+                for name, section in sections.items()
+            }
+            report = {name: future.result() for name, future in futures.items()}
+    else:
+        report = {name: section(base) for name, section in sections.items()}
+    return _derive(report)
+
+
+class ReportCache:
+    """Process-level LRU cache of built reports.
+
+    Keys include the ``reports`` data version, so any write to the data the
+    report reads makes older entries unreachable; they age out of the LRU.
+    Cached reports are shared between requests and must not be modified.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get_or_build(self, key, build_report):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        report = build_report()
+        with self._lock:
+            self._entries[key] = report
+            while len(self._entries) > (self.max_entries or config('CACHE_SIZE')):
+                self._entries.popitem(last=False)
+        return report
+
+    def clear(self):
+        """Drop every cached report."""
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared instance used by the shop report view
+report_cache = ReportCache()
+
+
+def shop_report(from_date=None, to_date=None):
+    """Return the shop report sections for an inclusive date range.
+
+    Reloading the same range costs a single query (the data version) until
+    something the report reads is written again.
+    """
+    from_date, to_date = as_date(from_date), as_date(to_date)
+    today = timezone.now().date()
+    key = ('shop', from_date, to_date, today, versioning.current(versioning.REPORTS))
+    return report_cache.get_or_build(key, lambda: build(report_base(from_date, to_date, today)))
+
+
+def staff_report(staff, from_date=None, to_date=None):
+    """Return the report sections for one staff member's sales."""
+    from_date, to_date = as_date(from_date), as_date(to_date)
+    today = timezone.now().date()
+    key = ('staff', staff.pk, from_date, to_date, today, versioning.current(versioning.REPORTS))
+    return report_cache.get_or_build(
+        key, lambda: build(report_base(from_date, to_date, today, staff=staff), sections=STAFF_SECTIONS)
+    )
+
+
+# ==============================================================================
+# Page Contexts
+# ==============================================================================
+# Shared by the report views and the background report jobs (user.jobs)
+
+def shop_report_context(params):
+    """Template context for shop_report.html."""
+    from_date = params.get('from_date')
+    to_date = params.get('to_date')
+    return dict(
+        shop_report(from_date, to_date),
+        today=timezone.now().date(),
+        from_date=from_date or '',
+        to_date=to_date or '',
+    )
+
+
+def staff_report_context(staff, params):
+    """Template context for staff_wise_report.html."""
+    from_date = params.get('from_date')
+    to_date = params.get('to_date')
+    return dict(
+        staff_report(staff, from_date, to_date),
+        staff=staff,
+        today=timezone.now().date(),
+        from_date=from_date or '',
+        to_date=to_date or '',
+    )
+
+
+# ==============================================================================
+# Dashboard
+# ==============================================================================
+
+def dashboard_data(params):
+    """Chart and total figures for the owner dashboard (api_dashboard_data).
+
+    ``params`` carries either ``from_date``/``to_date`` or a ``period`` of
+    '7days', '30days', '6months' (default) or '1year'.
+    """
+    # Get date range parameters
+    from_date_str = params.get('from_date')
+    to_date_str = params.get('to_date')
+    period = params.get('period', '6months')
+    
+    # Calculate date ranges
+    today = timezone.now().date()
+    
+    if from_date_str and to_date_str:
+        # Use provided date range
+        try:
+            from_date = datetime.strptime(from_date_str, '%Y-%m-%d').date()
+            to_date = datetime.strptime(to_date_str, '%Y-%m-%d').date()
+        except ValueError:
+            # If date parsing fails, fall back to default period
+            from_date = today - timedelta(days=180)
+            to_date = today
+    else:
+        # Use period-based calculation (fallback for backward compatibility)
+        if period == '7days':
+            from_date = today - timedelta(days=7)
+            to_date = today
+        elif period == '30days':
+            from_date = today - timedelta(days=30)
+            to_date = today
+        elif period == '1year':
+            from_date = today - timedelta(days=365)
+            to_date = today
+        else:  # 6months (default)
+            from_date = today - timedelta(days=180)
+            to_date = today
+    
+    # Generate chart data based on date range
+    chart_labels = []
+    income_data = []
+    expense_data = []
+    
+    # Calculate the number of days in the range
+    days_diff = (to_date - from_date).days
+    
+    # Build the chart buckets as (label, start, end)
+    buckets = []
+    if days_diff <= 31:  # Show daily data for up to 1 month
+        current_date = from_date
+        while current_date <= to_date:
+            buckets.append((current_date.strftime('%b %d'), current_date, current_date))
+            current_date += timedelta(days=1)
+    elif days_diff <= 90:  # Show weekly data for up to 3 months
+        current_date = from_date
+        while current_date <= to_date and len(buckets) < 12:  # Limit to 12 weeks
+            week_end = min(current_date + timedelta(days=6), to_date)
+            buckets.append((f'{current_date.strftime("%b %d")} - {week_end.strftime("%b %d")}', current_date, week_end))
+            current_date += timedelta(days=7)
+    else:  # Show monthly data for longer periods
+        current_date = from_date
+        while current_date <= to_date and len(buckets) < 12:  # Limit to 12 months
+            # Calculate the end of the month
+            if current_date.month == 12:
+                next_month = current_date.replace(year=current_date.year + 1, month=1, day=1)
+            else:
+                next_month = current_date.replace(month=current_date.month + 1, day=1)
+            
+            # Make sure month_end doesn't exceed to_date
+            month_end = min(next_month - timedelta(days=1), to_date)
+            buckets.append((current_date.strftime('%b %Y'), current_date, month_end))
+            current_date = next_month
+    
+    # One ledger range scan feeds every bucket
+    daily = ledger.daily_rows(from_date, to_date)
+    for label, bucket_start, bucket_end in buckets:
+        chart_labels.append(label)
+        bucket_income, bucket_expense = ledger.bucket_total(daily, bucket_start, bucket_end)
+        income_data.append(float(bucket_income))
+        expense_data.append(float(bucket_expense))
+    
+    # Calculate totals for the selected period
+    current = ledger.totals(from_date, to_date)
+    total_income = current['income']
+    total_expenses = current['expense']
+    net_profit = total_income - total_expenses
+    
+    # Category sales data for the selected period
+    category_labels = []
+    category_data = []
+    category_totals = cube.category_totals(from_date, to_date)
+    for category in category_tree.categories():
+        category_labels.append(category.name)
+        category_data.append(float(category_totals.get(category.pk, Decimal('0.00'))))
+    
+    # Calculate percentage changes (previous period of same duration)
+    prev_period_days = (to_date - from_date).days
+    prev_end = from_date - timedelta(days=1)
+    prev_start = prev_end - timedelta(days=prev_period_days)
+    
+    previous = ledger.totals(prev_start, prev_end)
+    prev_income = previous['income']
+    prev_expenses = previous['expense']
+    prev_profit = prev_income - prev_expenses
+    
+    # Calculate percentage changes
+    income_change = (
+        ((total_income - prev_income) / prev_income * Decimal('100.00'))
+        if prev_income != Decimal('0.00') else Decimal('0.00')
+    )
+    expense_change = (
+        ((total_expenses - prev_expenses) / prev_expenses * Decimal('100.00'))
+        if prev_expenses != Decimal('0.00') else Decimal('0.00')
+    )
+    profit_change = (
+        ((net_profit - prev_profit) / prev_profit * Decimal('100.00'))
+        if prev_profit != Decimal('0.00') else Decimal('0.00')
+    )
+    
+    return {
+        'chartLabels': chart_labels,
+        'incomeData': income_data,
+        'expenseData': expense_data,
+        'categoryLabels': category_labels,
+        'categoryData': category_data,
+        'totalIncome': float(total_income),
+        'totalExpenses': float(total_expenses),
+        'netProfit': float(net_profit),
+        'incomeChange': float(income_change),
+        'expenseChange': float(expense_change),
+        'profitChange': float(profit_change),
+    }
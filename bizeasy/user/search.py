@@ -0,0 +1,165 @@
+"""
+Product search module for the Bizeasy application.
+Full-text search over purchases using SQLite FTS5, with a LIKE fallback.
+"""
+
+# Standard library imports
+import re
+
+# Django imports
+from django.db import OperationalError, connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+
+TABLE = 'user_purchase_search'
+
+# Indexed columns and the lookups used when FTS5 is not available
+COLUMNS = {
+    'product_name': ('product_name',),
+    'category': ('category__name',),
+    'subcategory': ('subcategory__name',),
+    'notes': ('notes',),
+    'dates': ('date', 'expire_date'),
+}
+ALL_COLUMNS = tuple(COLUMNS)
+NAME_COLUMNS = ('product_name', 'category', 'subcategory')
+
+# Index rows built straight from the purchase tables
+SOURCE_SQL = (
+    "SELECT p.id, p.product_name, COALESCE(c.name, ''), COALESCE(s.name, ''), "
+    "COALESCE(p.notes, ''), COALESCE(p.date, '') || ' ' || COALESCE(p.expire_date, '') "
+    "FROM user_purchase p "
+    "LEFT JOIN user_category c ON c.id = p.category_id "
+    "LEFT JOIN user_subcategory s ON s.id = p.subcategory_id"
+)
+INSERT_SQL = f"INSERT INTO {TABLE} (rowid, {', '.join(COLUMNS)}) {SOURCE_SQL}"
+
+_available = None
+
+
+# ==============================================================================
+# Index Maintenance
+# ==============================================================================
+
+def create_index(conn=None):
+    """Create and fill the FTS5 table; returns False if FTS5 is unavailable."""
+    conn = conn or connection
+    if conn.vendor != 'sqlite':
+        return False
+    with conn.cursor() as cursor:
+        try:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+                f"{', '.join(COLUMNS)}, tokenize='unicode61', prefix='2 3')"
+            )
+        except OperationalError:
+            # SQLite was built without FTS5
+            return False
+        cursor.execute(f"DELETE FROM {TABLE}")
+        cursor.execute(INSERT_SQL)
+    return True
+
+
+def drop_index(conn=None):
+    """Drop the FTS5 table if it exists."""
+    conn = conn or connection
+    if conn.vendor == 'sqlite':
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+def available():
+    """Return True if the FTS5 index exists on the default database."""
+    global _available
+    if _available is None:
+        _available = connection.vendor == 'sqlite' and TABLE in connection.introspection.table_names()
+    return _available
+
+
+def index_purchases(purchase_ids):
+    """Re-index the given purchases (rows that no longer exist are dropped)."""
+    purchase_ids = [int(pk) for pk in purchase_ids if pk is not None]
+    if not purchase_ids or not available():
+        return
+    with connection.cursor() as cursor:
+        for start in range(0, len(purchase_ids), 500):
+            batch = purchase_ids[start:start + 500]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f"DELETE FROM {TABLE} WHERE rowid IN ({placeholders})", batch)
+            cursor.execute(f"{INSERT_SQL} WHERE p.id IN ({placeholders})", batch)
+
+
+def rebuild():
+    """Rebuild the whole index; returns the number of indexed purchases.
+
+    Returns None when FTS5 is not available.
+    """
+    global _available
+    _available = create_index()
+    if not _available:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM {TABLE}")
+        return cursor.fetchone()[0]
+
+
+# ==============================================================================
+# Queries
+# ==============================================================================
+
+def _tokens(query):
+    return re.findall(r'\w+', (query or '').lower())
+
+
+def match_expression(query, columns=NAME_COLUMNS):
+    """FTS5 MATCH expression requiring every word as a prefix, e.g. 'bas ri'."""
+    tokens = _tokens(query)
+    if not tokens:
+        return None
+    terms = ' '.join(f'"{token}"*' for token in tokens)
+    return f"{{{' '.join(columns)}}} : ({terms})"
+
+
+def _like_filter(query, columns):
+    condition = Q()
+    for token in _tokens(query):
+        token_condition = Q()
+        for column in columns:
+            for lookup in COLUMNS[column]:
+                token_condition |= Q(**{f'{lookup}__icontains': token})
+        condition &= token_condition
+    return condition
+
+
+def filter_purchases(queryset, query, columns=NAME_COLUMNS):
+    """Restrict a Purchase queryset to rows matching every word of ``query``."""
+    expression = match_expression(query, columns)
+    if expression is None:
+        return queryset
+    if available():
+        return queryset.filter(pk__in=RawSQL(
+            f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s", (expression,)
+        ))
+    return queryset.filter(_like_filter(query, columns))
+
+
+def ranked_purchases(queryset, query, limit=20, columns=NAME_COLUMNS):
+    """Return up to ``limit`` purchases from ``queryset`` best-match first.
+
+    With FTS5 the index is joined to the purchase query, which is ordered by
+    bm25 rank and limited in SQL; the fallback orders by name.
+    """
+    expression = match_expression(query, columns)
+    if expression is None:
+        return []
+    if not available():
+        return list(queryset.filter(_like_filter(query, columns)).order_by('product_name')[:limit])
+
+    purchases = queryset.model._meta.db_table
+    return list(queryset.extra(
+        tables=[TABLE],
+        where=[f"{TABLE}.rowid = {purchases}.id", f"{TABLE} MATCH %s"],
+        params=[expression],
+        order_by=[f"{TABLE}.rank"],
+    )[:limit])
@@ -0,0 +1,267 @@
+"""
+Signal handlers for the Bizeasy application.
+Keeps derived reporting tables, the price book, the category tree, the
+search index and the data versions in sync with writes to the core models.
+"""
+
+# Standard library imports
+import threading
+
+# Django imports
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+# Local imports
+from . import catalog, cube, ledger, search, snapshots, versioning
+from .models import CatalogChange, Category, CustomUser, Discount, Invoice, InvoiceItem, Product, Purchase, ReportSnapshot, SellingProduct, SubCategory
+from .categories import category_tree
+from .money import Money
+from .pricing import price_book
+from .utils import as_date
+
+
+# ==============================================================================
+# Change Tracking
+# ==============================================================================
+
+# Stored fields whose change affects a derived table
+TRACKED_FIELDS = {
+    Invoice: ('date', 'total', 'created_by_id'),
+    Purchase: ('date', 'total_rate', 'category_id', 'subcategory_id', 'product_rate'),
+}
+
+
+def _normalise(field, value):
+    if field == 'date':
+        return as_date(value)
+    if field.endswith('_id'):
+        return value
+    return Money(value or 0)
+
+
+def _previous(instance, field):
+    stored = getattr(instance, '_stored_state', None)
+    return stored[field] if stored else None
+
+
+def _changed(instance, *fields):
+    """Return True if any of ``fields`` differs from the value stored before save."""
+    stored = getattr(instance, '_stored_state', None)
+    if stored is None:
+        return True
+    return any(
+        _normalise(field, stored[field]) != _normalise(field, getattr(instance, field))
+        for field in fields
+    )
+
+
+@receiver(pre_save, sender=Invoice)
+@receiver(pre_save, sender=Purchase)
+def remember_stored_state(sender, instance, **kwargs):
+    """Stash the stored values so post_save knows what changed."""
+    stored = None
+    if instance.pk:
+        stored = sender._default_manager.filter(pk=instance.pk).values(
+            *TRACKED_FIELDS[sender]
+        ).first()
+    instance._stored_state = stored
+
+
+def _invoice_day(item):
+    """The ``(date, created_by_id)`` of an item's invoice."""
+    if InvoiceItem.invoice.is_cached(item):
+        return item.invoice.date, item.invoice.created_by_id
+    return Invoice._default_manager.filter(
+        pk=item.invoice_id
+    ).values_list('date', 'created_by_id').first() or (None, None)
+
+
+# ==============================================================================
+# Daily Ledger and Sales Cube
+# ==============================================================================
+
+# Invoices whose delete is cascading to their items, per thread
+_deleting = threading.local()
+
+
+def _deleting_invoices():
+    if not hasattr(_deleting, 'ids'):
+        _deleting.ids = set()
+    return _deleting.ids
+
+
+@receiver(pre_delete, sender=Invoice)
+def defer_item_refreshes(sender, instance, **kwargs):
+    # The cascade deletes the items first; the invoice's own post_delete
+    # then refreshes the day once instead of once per item
+    _deleting_invoices().add(instance.pk)
+
+
+@receiver(post_save, sender=Invoice)
+def refresh_for_invoice(sender, instance, created, **kwargs):
+    days = [instance.date, _previous(instance, 'date')]
+    if created:
+        ledger.add_to_day(instance.date, income=instance.total, invoice_count=1)
+    elif _changed(instance, 'date', 'total'):
+        ledger.refresh_days(days)
+    if not created and _changed(instance, 'date', 'created_by_id'):
+        cube.refresh_days(days)
+
+
+@receiver(post_save, sender=Purchase)
+def refresh_for_purchase(sender, instance, created, **kwargs):
+    if _changed(instance, 'date', 'total_rate'):
+        ledger.refresh_days([instance.date, _previous(instance, 'date')])
+    if not created and _changed(instance, 'category_id', 'subcategory_id', 'product_rate'):
+        cube.refresh_purchases([instance.pk])
+
+
+@receiver(post_delete, sender=Invoice)
+def refresh_for_deleted_invoice(sender, instance, **kwargs):
+    _deleting_invoices().discard(instance.pk)
+    ledger.refresh_days([instance.date])
+    cube.refresh_days([instance.date])
+
+
+@receiver(post_delete, sender=Purchase)
+def refresh_for_deleted_purchase(sender, instance, **kwargs):
+    ledger.refresh_days([instance.date])
+
+
+@receiver(post_save, sender=InvoiceItem)
+def refresh_for_invoice_item(sender, instance, created, **kwargs):
+    invoice_date, created_by_id = _invoice_day(instance)
+    if created:
+        ledger.add_to_day(invoice_date, item_count=1)
+        cube.add_items([instance], invoice_date, created_by_id)
+    else:
+        ledger.refresh_days([invoice_date])
+        cube.refresh_days([invoice_date])
+
+
+@receiver(post_delete, sender=InvoiceItem)
+def refresh_for_deleted_invoice_item(sender, instance, **kwargs):
+    if instance.invoice_id in _deleting_invoices():
+        return
+    invoice_date, _ = _invoice_day(instance)
+    ledger.refresh_days([invoice_date])
+    cube.refresh_days([invoice_date])
+
+
+# ==============================================================================
+# Price Book
+# ==============================================================================
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_price(sender, instance, **kwargs):
+    # The bump reaches other processes; this one drops the entries straight away
+    versioning.bump(versioning.PRICES)
+    price_book.invalidate(product_id=instance.pk, purchase_id=instance.purchase_id)
+
+
+@receiver(post_save, sender=SellingProduct)
+@receiver(post_delete, sender=SellingProduct)
+@receiver(post_save, sender=Discount)
+@receiver(post_delete, sender=Discount)
+def invalidate_price(sender, instance, **kwargs):
+    versioning.bump(versioning.PRICES)
+    price_book.invalidate(product_id=instance.product_id)
+
+
+@receiver(post_save, sender=Purchase)
+@receiver(post_delete, sender=Purchase)
+def invalidate_purchase_price(sender, instance, **kwargs):
+    price_book.invalidate(purchase_id=instance.pk)
+
+
+# ==============================================================================
+# Search Index
+# ==============================================================================
+
+@receiver(post_save, sender=Purchase)
+@receiver(post_delete, sender=Purchase)
+def index_purchase(sender, instance, **kwargs):
+    search.index_purchases([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=SubCategory)
+def index_renamed_category(sender, instance, created, **kwargs):
+    if created:
+        return
+    lookup = 'category' if sender is Category else 'subcategory'
+    search.index_purchases(
+        Purchase._default_manager.filter(**{lookup: instance}).values_list('pk', flat=True)
+    )
+
+
+# ==============================================================================
+# Billing Catalog
+# ==============================================================================
+
+CATALOG_KINDS = {
+    Category: CatalogChange.KIND_CATEGORY,
+    SubCategory: CatalogChange.KIND_SUBCATEGORY,
+    Purchase: CatalogChange.KIND_PURCHASE,
+}
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=SubCategory)
+@receiver(post_delete, sender=SubCategory)
+@receiver(post_save, sender=Purchase)
+@receiver(post_delete, sender=Purchase)
+def record_catalog_change(sender, instance, **kwargs):
+    catalog.record(CATALOG_KINDS[sender], [instance.pk])
+
+
+# ==============================================================================
+# Category Tree
+# ==============================================================================
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=SubCategory)
+@receiver(post_delete, sender=SubCategory)
+def invalidate_category_tree(sender, instance, **kwargs):
+    # The bump reaches other processes; this one reloads straight away
+    versioning.bump(versioning.CATEGORIES)
+    category_tree.clear()
+
+
+# ==============================================================================
+# Data Versions
+# ==============================================================================
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_save, sender=InvoiceItem)
+@receiver(post_delete, sender=InvoiceItem)
+@receiver(post_save, sender=Purchase)
+@receiver(post_delete, sender=Purchase)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=SubCategory)
+@receiver(post_delete, sender=SubCategory)
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def bump_reports_version(sender, instance, **kwargs):
+    if sender is InvoiceItem and instance.invoice_id in _deleting_invoices():
+        return  # bumped once by the invoice's post_delete
+    versioning.bump(versioning.REPORTS)
+
+
+# ==============================================================================
+# Report Snapshots
+# ==============================================================================
+
+@receiver(post_migrate)
+def discard_report_snapshots(sender, using, plan=None, **kwargs):
+    # Copies taken before the migrations have the old schema. Migrating to
+    # a state before the snapshot table leaves nothing to discard.
+    if sender.name == 'user' and using == DEFAULT_DB_ALIAS and plan:
+        if ReportSnapshot._meta.db_table in connections[using].introspection.table_names():
+            snapshots.discard()
@@ -0,0 +1,228 @@
+"""
+Report snapshot module for the Bizeasy application.
+Read-only copy of the database, taken with SQLite's online backup API, that
+the report pages read instead of the live database billing writes to.
+"""
+
+# Standard library imports
+import contextvars
+import functools
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
+
+# Django imports
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+# Local imports
+from . import writes
+from .models import ReportSnapshot
+
+
+DEFAULTS = {
+    # Database alias of the copy; its NAME is where the copy is written
+    'ALIAS': 'snapshot',
+    # Seconds between copies when snapshot_reports runs continuously
+    'INTERVAL': 300,
+    # Older copies are not used: the report pages read the live database
+    'MAX_AGE': 900,
+    # Views (by function name) that always read the live database
+    'LIVE_VIEWS': (),
+}
+
+# ReportSnapshot rows older than this are deleted when a copy is recorded
+HISTORY = timedelta(days=1)
+
+# Database the reads inside reading() go to; None leaves them to Django
+_reads_from = contextvars.ContextVar('reads_from', default=None)
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot cannot be taken."""
+
+
+def config(key):
+    """Read a ``REPORT_SNAPSHOT`` setting, falling back to DEFAULTS."""
+    return getattr(settings, 'REPORT_SNAPSHOT', {}).get(key, DEFAULTS[key])
+
+
+def enabled():
+    """Whether the snapshot database is configured."""
+    return config('ALIAS') in settings.DATABASES
+
+
+def path():
+    """File the snapshot is written to, from the alias's NAME (a plain path
+    or a ``file:`` URI such as ``file:///.../report_snapshot.sqlite3?mode=ro``)."""
+    name = str(settings.DATABASES[config('ALIAS')]['NAME'])
+    if name.startswith('file:'):
+        name = url2pathname(urlsplit(name).path)
+    return Path(name)
+
+
+# ==============================================================================
+# Taking Snapshots
+# ==============================================================================
+
+def _publish(temporary, target):
+    """Move the finished copy into place.
+
+    Requests already reading the old copy keep their open file, so every
+    query of one request sees the same snapshot.
+    """
+    try:
+        os.replace(temporary, target)
+    except PermissionError:
+        # Windows cannot replace a file a report has open; copy into it
+        # instead, which its readers see as a single transaction
+        source, destination = sqlite3.connect(str(temporary)), sqlite3.connect(str(target))
+        try:
+            source.backup(destination)
+        finally:
+            source.close()
+            destination.close()
+        os.remove(temporary)
+
+
+@writes.write_transaction
+def _record(taken_at, seconds, size):
+    snapshot = ReportSnapshot._default_manager.create(taken_at=taken_at, seconds=seconds, size=size)
+    ReportSnapshot._default_manager.filter(taken_at__lt=taken_at - HISTORY).delete()
+    return snapshot
+
+
+def take(target=None):
+    """Copy the default database to the snapshot file and record it.
+
+    The copy is made in a single backup step, that is one read transaction
+    on the live database, so it is consistent. (A stepped copy restarts
+    whenever a terminal writes, and would rarely finish during business
+    hours.) With the WAL journal billing carries on meanwhile; with the
+    default journal, commits wait for the copy (milliseconds for a shop
+    database). Returns the ReportSnapshot.
+    """
+    connection = connections[DEFAULT_DB_ALIAS]
+    if connection.vendor != 'sqlite':
+        raise SnapshotError('Report snapshots are only supported on SQLite.')
+    if connection.in_atomic_block:
+        raise SnapshotError('A snapshot must not be taken inside a transaction.')
+    target = Path(target or path())
+    temporary = target.with_name(target.name + '.tmp')
+    if temporary.exists():
+        # Left over from an interrupted copy
+        temporary.unlink()
+
+    taken_at = timezone.now()
+    started = time.perf_counter()
+    connection.ensure_connection()
+    copy = sqlite3.connect(str(temporary))
+    try:
+        connection.connection.backup(copy)
+        # The copy inherits the WAL journal mode from the source, and a
+        # read-only WAL database needs its -shm file; use a plain journal
+        copy.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        copy.close()
+    _publish(temporary, target)
+    return _record(taken_at, time.perf_counter() - started, target.stat().st_size)
+
+
+def discard():
+    """Forget every snapshot, so reports read the live database until the
+    next one (after migrations, when the copies have the old schema)."""
+    ReportSnapshot._default_manager.all().delete()
+
+
+# ==============================================================================
+# Routing
+# ==============================================================================
+
+@contextmanager
+def reading(alias=None):
+    """Send the reads inside the block to the snapshot database."""
+    token = _reads_from.set(alias or config('ALIAS'))
+    try:
+        yield
+    finally:
+        _reads_from.reset(token)
+
+
+@contextmanager
+def live():
+    """Send the reads inside the block to the live database, even within
+    reading(); for process-level caches shared with the live pages."""
+    token = _reads_from.set(DEFAULT_DB_ALIAS)
+    try:
+        yield
+    finally:
+        _reads_from.reset(token)
+
+
+def latest():
+    """The newest snapshot if it is fresh enough to read, else None."""
+    if not enabled():
+        return None
+    with live():
+        snapshot = ReportSnapshot._default_manager.order_by('-pk').first()
+    if snapshot is None or timezone.now() - snapshot.taken_at > timedelta(seconds=config('MAX_AGE')):
+        return None
+    if not path().exists():
+        return None
+    return snapshot
+
+
+def use_snapshot(view):
+    """View decorator: read from the latest snapshot while it is fresh.
+
+    Sets ``request.report_snapshot`` to the ReportSnapshot read, for the
+    page's "figures as of" notice, or None when the view reads the live
+    database: no fresh snapshot, the view is listed in LIVE_VIEWS, or the
+    request asks for ``live=1``.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        snapshot = None
+        if view.__name__ not in config('LIVE_VIEWS') and not request.GET.get('live'):
+            snapshot = latest()
+        request.report_snapshot = snapshot
+        if snapshot is None:
+            return view(request, *args, **kwargs)
+        with reading():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class SnapshotRouter:
+    """Database router for the report snapshot.
+
+    Reads inside reading() go to the snapshot; writes always go to the
+    live database, including saves of rows read from the snapshot, and the
+    snapshot is never migrated (it is a copy of the migrated database).
+    """
+
+    def db_for_read(self, model, **hints):
+        return _reads_from.get()
+
+    def db_for_write(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db == config('ALIAS'):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The snapshot holds the same rows as the live database
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, config('ALIAS')}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == config('ALIAS'):
+            return False
+        return None
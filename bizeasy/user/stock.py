@@ -0,0 +1,101 @@
+"""
+Stock movement module for the Bizeasy application.
+Changes purchase stock, records each change as a StockMovement and keeps
+the received/sold counters on Purchase in step.
+"""
+
+# Django imports
+from django.db.models import ExpressionWrapper, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+# Local imports
+from . import catalog, ledger, versioning, writes
+from .models import CatalogChange, InvoiceItem, Purchase, StockMovement
+from .money import MoneyField
+
+
+def record_sales(items, user=None):
+    """Record a 'sale' movement for each invoice item (one INSERT)."""
+    StockMovement._default_manager.bulk_create([
+        StockMovement(purchase_id=item.purchase_id, delta=-item.quantity, reason='sale', user=user)
+        for item in items
+    ])
+
+
+@writes.write_transaction
+def restock(purchase, quantity, user=None):
+    """Add ``quantity`` units to a purchase and record the movement.
+
+    The counters move with one F() UPDATE, so sales made since ``purchase``
+    was loaded are kept, and its in-memory counters are read back. The
+    UPDATE sends no signals: the ledger day and the reports version are
+    refreshed here.
+    """
+    Purchase._default_manager.filter(pk=purchase.pk).update(
+        quantity=F('quantity') + quantity,
+        received_quantity=F('received_quantity') + quantity,
+        total_rate=ExpressionWrapper(
+            (F('quantity') + quantity) * F('product_rate'), output_field=MoneyField()
+        ),
+    )
+    purchase.refresh_from_db(fields=Purchase.STOCK_FIELDS)
+    purchase._loaded_quantity = purchase.quantity
+    ledger.refresh_days([purchase.date])
+    versioning.bump(versioning.REPORTS)
+    catalog.record(CatalogChange.KIND_PURCHASE, [purchase.pk])
+    return StockMovement._default_manager.create(
+        purchase=purchase, delta=quantity, reason='restock', user=user
+    )
+
+
+@writes.write_transaction
+def restore_invoice_stock(invoice, user=None):
+    """Put an invoice's items back into stock before it is deleted."""
+    returned = {}
+    for purchase_id, quantity in invoice.items.values_list('purchase_id', 'quantity'):
+        returned[purchase_id] = returned.get(purchase_id, 0) + quantity
+    for purchase_id, quantity in returned.items():
+        Purchase._default_manager.filter(pk=purchase_id).update(
+            quantity=F('quantity') + quantity,
+            sold_quantity=F('sold_quantity') - quantity,
+        )
+    StockMovement._default_manager.bulk_create([
+        StockMovement(purchase_id=purchase_id, delta=quantity, reason='sale_reversal', user=user)
+        for purchase_id, quantity in returned.items()
+    ])
+    catalog.record(CatalogChange.KIND_PURCHASE, returned)
+
+
+# ==============================================================================
+# Reconciliation
+# ==============================================================================
+
+def _actual_sold():
+    sold = InvoiceItem._default_manager.filter(purchase=OuterRef('pk')).values('purchase').annotate(
+        total=Sum('quantity')
+    ).values('total')
+    return Coalesce(Subquery(sold, output_field=IntegerField()), Value(0))
+
+
+def reconcile(dry_run=False):
+    """Recompute the stock counters from the invoice items and report drift.
+
+    Returns a list of dicts (id, product_name, sold_quantity, actual_sold,
+    received_quantity, actual_received) for the purchases whose counters
+    were wrong; unless ``dry_run`` they are corrected in one UPDATE.
+    """
+    drifted = list(
+        Purchase._default_manager.annotate(actual_sold=_actual_sold())
+        .annotate(actual_received=F('quantity') + F('actual_sold'))
+        .filter(~Q(sold_quantity=F('actual_sold')) | ~Q(received_quantity=F('actual_received')))
+        .values('id', 'product_name', 'sold_quantity', 'actual_sold', 'received_quantity', 'actual_received')
+        .order_by('id')
+    )
+    if drifted and not dry_run:
+        with writes.immediate():
+            Purchase._default_manager.filter(pk__in=[row['id'] for row in drifted]).update(
+                sold_quantity=_actual_sold(),
+                received_quantity=F('quantity') + _actual_sold(),
+            )
+            versioning.bump(versioning.REPORTS)
+    return drifted
@@ -1,7 +1,31 @@
-from django.test import TestCase
+from decimal import Decimal
+
+from django.conf import settings
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.core.exceptions import ValidationError
-from .forms import StaffForm
-from .models import CustomUser
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, router, transaction
+from django.db.models import F
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+from datetime import timedelta
+import json
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import zipfile
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
+from . import benchmark, catalog, checkout, cube, discounts, expiry, exports, importer, invoice_batch, jobs, ledger, money, pagination, reorder, reports, search, sequences, snapshots, stock, versioning, writes
+from .forms import PurchaseForm, StaffForm
+from .models import CustomUser, CatalogChange, Category, SubCategory, Purchase, StockMovement, Product, SellingProduct, Discount, Invoice, InvoiceItem, InvoiceSequence, DailyLedger, ExpiryAlert, ReorderSuggestion, ReportJob, ReportSnapshot, SalesCube
+from .backends.sqlite3.base import DatabaseWrapper as ConcurrentSqliteWrapper
+from .categories import category_tree
+from .pricing import price_book
 
 
 class StaffFormTestCase(TestCase):
@@ -60,4 +84,1438 @@ class StaffFormTestCase(TestCase):
         
         form = StaffForm(data=form_data)
         # This should be valid
-        self.assertTrue(form.is_valid())
\ No newline at end of file
+        self.assertTrue(form.is_valid())
+
+class SalesFixtureMixin:
+    """Creates a category, subcategory and purchase plus an invoice helper."""
+
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(username='owner', password='testpass123', role='owner')
+        self.category = Category.objects.create(name='Grocery')
+        self.subcategory = SubCategory.objects.create(category=self.category, name='Rice')
+        self.today = timezone.now().date()
+        self.purchase = Purchase.objects.create(
+            product_name='Basmati', category=self.category, subcategory=self.subcategory,
+            quantity=10, product_rate=50, total_rate=0, mrp=80, date=self.today
+        )
+
+    def _create_invoice(self, number, amount, quantity=1, created_by=None):
+        invoice = Invoice.objects.create(
+            bill_number=number, customer_name='Walk-in', date=self.today, created_by=created_by
+        )
+        InvoiceItem.objects.create(
+            invoice=invoice, purchase=self.purchase, quantity=quantity, rate=amount, total=amount * quantity
+        )
+        invoice.calculate_totals()
+        invoice.save()
+        return invoice
+
+
+class DailyLedgerTestCase(SalesFixtureMixin, TestCase):
+    def test_writes_keep_ledger_current(self):
+        """Invoice and purchase writes update the day's ledger row"""
+        self._create_invoice('INV-1', Decimal('80.00'))
+        invoice = self._create_invoice('INV-2', Decimal('70.00'))
+
+        row = DailyLedger.objects.get(date=self.today)
+        self.assertEqual(row.income, Decimal('150.00'))
+        self.assertEqual(row.expense, Decimal('500.00'))
+        self.assertEqual(row.invoice_count, 2)
+        self.assertEqual(row.item_count, 2)
+
+        invoice.delete()
+        row = DailyLedger.objects.get(date=self.today)
+        self.assertEqual(row.income, Decimal('80.00'))
+        self.assertEqual(row.invoice_count, 1)
+
+    def test_invoice_delete_refreshes_its_day_once(self):
+        """Deleting an invoice refreshes the ledger and cube once, not per item"""
+        self._create_invoice('INV-1', Decimal('80.00'))
+        invoice = self._create_invoice('INV-2', Decimal('70.00'))
+        for _ in range(2):
+            InvoiceItem.objects.create(
+                invoice=invoice, purchase=self.purchase, quantity=1, rate=Decimal('70.00'), total=Decimal('70.00')
+            )
+        with mock.patch.object(ledger, 'refresh_days', wraps=ledger.refresh_days) as ledger_refresh, \
+                mock.patch.object(cube, 'refresh_days', wraps=cube.refresh_days) as cube_refresh:
+            invoice.delete()
+        self.assertEqual((ledger_refresh.call_count, cube_refresh.call_count), (1, 1))
+        row = DailyLedger.objects.get(date=self.today)
+        self.assertEqual((row.income, row.invoice_count, row.item_count), (Decimal('80.00'), 1, 1))
+        self.assertEqual(cube.rollup('product')[0]['total_qty'], 1)
+
+    def test_rebuild_matches_incremental_rows(self):
+        """Rebuilding from scratch gives the same rows as incremental updates"""
+        self._create_invoice('INV-1', Decimal('80.00'))
+        expected = list(DailyLedger.objects.values_list('date', 'income', 'expense', 'invoice_count', 'item_count'))
+        DailyLedger.objects.all().delete()
+        ledger.rebuild()
+        self.assertEqual(
+            list(DailyLedger.objects.values_list('date', 'income', 'expense', 'invoice_count', 'item_count')),
+            expected
+        )
+
+    def test_dashboard_data_reads_ledger(self):
+        """The dashboard API reports ledger totals for the selected range"""
+        self._create_invoice('INV-1', Decimal('80.00'))
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('api_dashboard_data'), {'period': '7days'})
+        data = response.json()
+        self.assertEqual(data['totalIncome'], 80.0)
+        self.assertEqual(data['totalExpenses'], 500.0)
+        self.assertEqual(sum(data['incomeData']), 80.0)
+
+
+
+class SalesCubeTestCase(SalesFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = CustomUser.objects.create_user(username='cashier', password='testpass123', role='staff')
+
+    def test_rollup_by_grain_and_staff(self):
+        """Cube rows roll up to product and staff level with cost and profit"""
+        self._create_invoice('INV-1', Decimal('80.00'), quantity=2, created_by=self.staff)
+        self._create_invoice('INV-2', Decimal('75.00'), quantity=1, created_by=self.owner)
+
+        products = cube.rollup('product')
+        self.assertEqual(len(products), 1)
+        self.assertEqual(products[0]['purchase__product_name'], 'Basmati')
+        self.assertEqual(products[0]['total_qty'], 3)
+        self.assertEqual(products[0]['total_amount'], Decimal('235.00'))
+        self.assertEqual(products[0]['total_cost'], Decimal('150.00'))
+        self.assertEqual(products[0]['profit'], Decimal('85.00'))
+
+        staff_categories = cube.rollup('category', created_by=self.staff)
+        self.assertEqual(staff_categories[0]['purchase__category__name'], 'Grocery')
+        self.assertEqual(staff_categories[0]['total_amount'], Decimal('160.00'))
+
+    def test_invoice_delete_updates_cube(self):
+        """Deleting an invoice removes its sales from the cube"""
+        self._create_invoice('INV-1', Decimal('80.00'), created_by=self.staff)
+        invoice = self._create_invoice('INV-2', Decimal('75.00'), created_by=self.staff)
+        invoice.delete()
+        self.assertEqual(cube.rollup('product')[0]['total_amount'], Decimal('80.00'))
+
+    def test_reports_render_from_cube(self):
+        """Shop and staff reports render their sales sections from the cube"""
+        self._create_invoice('INV-1', Decimal('80.00'), created_by=self.staff)
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('shop_report'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['category_sales'][0]['total_amount'], Decimal('80.00'))
+        response = self.client.get(reverse('staff_wise_report', args=[self.staff.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['subcategory_sales']), 1)
+
+
+class DiscountFixtureMixin(SalesFixtureMixin):
+    """Adds active, pending and finished discounted purchases."""
+
+    def _discounted_purchase(self, name, percent, start_offset, end_offset):
+        purchase = Purchase.objects.create(
+            product_name=name, category=self.category, subcategory=self.subcategory,
+            quantity=5, product_rate=50, total_rate=0, mrp=100, date=self.today
+        )
+        product = Product.objects.create(
+            name=name, purchase=purchase, category=self.category, subcategory=self.subcategory,
+            mrp=Decimal('100.00'), purchase_rate=Decimal('50.00'), selling_price=Decimal('100.00'),
+            final_price=Decimal('100.00')
+        )
+        Discount.objects.create(
+            product=product, discount_percent=percent,
+            start_date=self.today + timedelta(days=start_offset),
+            end_date=self.today + timedelta(days=end_offset)
+        )
+        return purchase
+
+    def setUp(self):
+        super().setUp()
+        self.active = self._discounted_purchase('Active Tea', 10, -1, 5)
+        self.pending = self._discounted_purchase('Pending Tea', 20, 3, 9)
+        self.finished = self._discounted_purchase('Old Tea', 30, -9, -2)
+
+
+class DiscountResolutionTestCase(DiscountFixtureMixin, TestCase):
+    def test_status_and_final_price_resolved_in_sql(self):
+        """Each discounted purchase gets its derived status and final price"""
+        rows = {p.pk: p for p in discounts.discounted_purchases('finished')}
+        self.assertEqual(list(rows), [self.finished.pk])
+        rows = {p.pk: p for p in discounts.discounted_purchases()}
+        self.assertEqual(set(rows), {self.active.pk, self.pending.pk})
+        self.assertEqual(rows[self.active.pk].status, 'active')
+        self.assertEqual(rows[self.active.pk].final_price, Decimal('90.00'))
+        self.assertEqual(rows[self.pending.pk].status, 'pending')
+        self.assertEqual(rows[self.pending.pk].final_price, Decimal('100.00'))
+
+    def test_date_filter(self):
+        """A discount matches when it starts or ends inside the range"""
+        start = self.today + timedelta(days=2)
+        rows = discounts.discounted_purchases('', start, start + timedelta(days=5))
+        self.assertEqual([p.pk for p in rows], [self.pending.pk, self.active.pk])
+
+    def test_view_discount_query_count_is_constant(self):
+        """The discount page does not issue per-row queries"""
+        for index in range(5):
+            self._discounted_purchase(f'Extra {index}', 5, 0, 3)
+        self.client.force_login(self.owner)
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('view_discount'))
+        self.assertEqual(response.context['total_count'], 7)
+
+
+class DiscountSchedulerTestCase(DiscountFixtureMixin, TestCase):
+    def test_apply_transitions_updates_only_due_rows(self):
+        """Only discounts whose status changes are written, with repricing"""
+        Discount.objects.filter(product__purchase=self.pending).update(status='pending')
+        dry = discounts.apply_transitions(dry_run=True)
+        self.assertEqual(dry, {'status_changed': 2, 'activated': 1, 'expired': 0, 'purchases_repriced': 1})
+        self.assertEqual(Discount.objects.filter(status='active').count(), 0)
+
+        versions = versioning.current(versioning.REPORTS), versioning.current(versioning.PRICES)
+        metrics = discounts.apply_transitions()
+        self.assertEqual(metrics['status_changed'], 2)
+        self.assertEqual(
+            (versioning.current(versioning.REPORTS), versioning.current(versioning.PRICES)),
+            (versions[0] + 1, versions[1] + 1),
+        )
+        self.active.refresh_from_db()
+        self.assertAlmostEqual(self.active.sale_rate, 90.0)
+        self.assertEqual(discounts.apply_transitions()['status_changed'], 0)
+
+        # The active discount expires the day after its end date
+        later = self.today + timedelta(days=6)
+        metrics = discounts.apply_transitions(today=later)
+        self.assertEqual(metrics['expired'], 1)
+        self.active.refresh_from_db()
+        self.assertEqual(self.active.sale_rate, 100.0)
+
+    def test_back_to_back_discounts_keep_the_new_price(self):
+        """A discount starting the day after another ends sets the new rate"""
+        discounts.apply_transitions()
+        Discount.objects.create(
+            product=self.active.product, discount_percent=25,
+            start_date=self.today + timedelta(days=6), end_date=self.today + timedelta(days=9)
+        )
+        metrics = discounts.apply_transitions(today=self.today + timedelta(days=6))
+        self.assertEqual(metrics['expired'], 1)
+        self.active.refresh_from_db()
+        self.assertEqual(self.active.sale_rate, 75.0)
+
+    def test_next_transition(self):
+        """The next boundary is the nearest start date or end date + 1"""
+        self.assertEqual(discounts.next_transition(self.today), self.today + timedelta(days=3))
+
+
+class PriceBookTestCase(DiscountFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        price_book.clear()
+        self.products = list(Product.objects.all())
+
+    def test_resolve_loads_products_in_two_queries(self):
+        """Bulk resolution is two queries (plus the stamp check) and later lookups hit the cache"""
+        with self.assertNumQueries(3):
+            prices = price_book.resolve(self.products)
+        self.assertEqual(prices[self.active.product.pk].final_price, Decimal('90.00'))
+        self.assertIsNone(prices[self.pending.product.pk].discount)
+        with self.assertNumQueries(0):
+            for product in self.products:
+                product.get_final_price()
+                product.get_discount_info()
+
+    def test_writes_invalidate_cached_prices(self):
+        """Selling price and discount changes are picked up immediately"""
+        product = self.active.product
+        self.assertEqual(product.get_final_price(), Decimal('90.00'))
+        SellingProduct.objects.create(product=product, selling_price=Decimal('200.00'))
+        self.assertEqual(product.get_final_price(), Decimal('180.00'))
+        Discount.objects.filter(product=product).delete()
+        self.assertEqual(product.get_final_price(), Decimal('200.00'))
+        self.assertFalse(self.active.is_discount_active())
+
+    def test_invalidate_drops_the_purchase_product_and_the_product(self):
+        """When the purchase maps to another product, both are dropped"""
+        other = self.pending.product
+        self.active.get_final_price()
+        price_book.resolve([other])
+        price_book.invalidate(product_id=other.pk, purchase_id=self.active.pk)
+        with self.assertNumQueries(5):
+            # The purchase mapping and both products are loaded again
+            self.active.get_final_price()
+            price_book.get(other)
+
+    def test_product_list_shows_catalogue_prices(self):
+        """Listed purchases with a product show its discounted price, resolved in bulk"""
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('list_products'), {'format': 'json'})
+        rows = {row['id']: row for row in response.json()['results']}
+        self.assertEqual(rows[self.active.pk]['final_price'], 90.0)
+        self.assertEqual(rows[self.active.pk]['discount_percentage'], 10.0)
+        self.assertEqual(rows[self.pending.pk]['final_price'], 100.0)
+        with self.assertNumQueries(0):
+            self.active.get_final_price()
+
+    @override_settings(PRICE_BOOK={'CHECK_SECONDS': 0})
+    def test_other_processes_are_seen_through_the_version_stamp(self):
+        product = self.active.product
+        self.assertEqual(product.get_final_price(), Decimal('90.00'))
+        # A price change by another process: no signal here, only the stamp moves
+        Product.objects.filter(pk=product.pk).update(selling_price=Decimal('120.00'))
+        versioning.bump(versioning.PRICES)
+        self.assertEqual(product.get_final_price(), Decimal('108.00'))
+
+    def test_invalidate_during_load_is_not_overwritten(self):
+        """A load that raced a write does not put the old price back"""
+        product = self.active.product
+        load = price_book._load
+
+        def racing_load(product_ids, today):
+            entries = load(product_ids, today)
+            SellingProduct.objects.create(product=product, selling_price=Decimal('200.00'))
+            return entries
+
+        with mock.patch.object(price_book, '_load', racing_load):
+            self.assertEqual(price_book.get(product).final_price, Decimal('90.00'))
+        self.assertEqual(price_book.get(product).final_price, Decimal('180.00'))
+
+
+class CheckoutTestCase(SalesFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.second = Purchase.objects.create(
+            product_name='Jeera', category=self.category, subcategory=self.subcategory,
+            quantity=2, product_rate=30, total_rate=0, mrp=40, date=self.today
+        )
+
+    def test_checkout_takes_stock_and_records_sale(self):
+        """Stock, totals, the ledger and the cube are updated together"""
+        lines = [
+            checkout.Line(self.purchase.pk, 3, Decimal('80.00')),
+            checkout.Line(self.second.pk, 2, Decimal('40.00')),
+        ]
+        invoice = checkout.checkout(lines, 'Walk-in', 'INV-1', discount_amount='20', created_by=self.owner)
+        self.assertEqual(invoice.subtotal, Decimal('320.00'))
+        self.assertEqual(Invoice.objects.get(pk=invoice.pk).total, Decimal('300.00'))
+        self.assertEqual(invoice.items.count(), 2)
+        self.purchase.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.purchase.quantity, self.second.quantity), (7, 0))
+        self.assertEqual(DailyLedger.objects.get(date=self.today).item_count, 2)
+        self.assertEqual(cube.rollup('category')[0]['total_qty'], 5)
+
+    def test_checkout_adds_to_the_ledger_and_cube_without_recomputing(self):
+        """Per-invoice deltas give the same rows as rebuilding the day"""
+        self._create_invoice('INV-0', Decimal('75.00'), created_by=self.owner)
+        with mock.patch.object(ledger, 'refresh_days') as ledger_refresh, \
+                mock.patch.object(cube, 'refresh_days') as cube_refresh:
+            checkout.checkout([checkout.Line(self.purchase.pk, 2, Decimal('80.00'))], 'Walk-in', 'INV-1', created_by=self.owner)
+            checkout.checkout([
+                checkout.Line(self.purchase.pk, 1, Decimal('80.00')),
+                checkout.Line(self.second.pk, 1, Decimal('40.00')),
+            ], 'Walk-in', 'INV-2')
+        self.assertFalse(ledger_refresh.called or cube_refresh.called)
+
+        ledger_fields = ('date', 'income', 'expense', 'invoice_count', 'item_count')
+        cube_fields = ('day', 'category_id', 'subcategory_id', 'purchase_id', 'created_by_id', 'qty', 'revenue', 'cost')
+        incremental = (
+            list(DailyLedger.objects.values_list(*ledger_fields)),
+            sorted(SalesCube.objects.values_list(*cube_fields), key=str),
+        )
+        ledger.rebuild()
+        cube.rebuild()
+        self.assertEqual(incremental, (
+            list(DailyLedger.objects.values_list(*ledger_fields)),
+            sorted(SalesCube.objects.values_list(*cube_fields), key=str),
+        ))
+
+    def test_short_stock_rolls_back(self):
+        """A short line leaves stock and invoices untouched"""
+        lines = [
+            checkout.Line(self.purchase.pk, 3, Decimal('80.00')),
+            checkout.Line(self.second.pk, 3, Decimal('40.00')),
+        ]
+        with self.assertRaisesMessage(checkout.CheckoutError, 'Available: 2, Requested: 3'):
+            checkout.checkout(lines, 'Walk-in', 'INV-2')
+        self.purchase.refresh_from_db()
+        self.assertEqual(self.purchase.quantity, 10)
+        self.assertFalse(Invoice.objects.exists())
+
+    def test_add_billing_ajax(self):
+        """The billing page posts its item formset through the checkout"""
+        self.client.force_login(self.owner)
+        data = {
+            'customer_name': 'Walk-in', 'items-TOTAL_FORMS': '2',
+            'items-0-product': self.purchase.pk, 'items-0-quantity': '4', 'items-0-price': '80',
+            'items-1-product': self.second.pk, 'items-1-quantity': '5', 'items-1-price': '40',
+        }
+        response = self.client.post(reverse('add_billing'), data, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Invoice.objects.exists())
+        data['items-1-quantity'] = '1'
+        response = self.client.post(reverse('add_billing'), data, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(Invoice.objects.get().total, Decimal('360.00'))
+
+
+class InvoiceSequenceTestCase(TransactionTestCase):
+    def test_financial_year(self):
+        """Financial years start in April by default"""
+        self.assertEqual(sequences.financial_year('2025-03-31'), '2024-25')
+        self.assertEqual(sequences.financial_year('2025-04-01'), '2025-26')
+
+    def test_numbers_are_increasing_per_shop_and_year(self):
+        """Numbers never repeat and each shop/year has its own counter"""
+        allocator = sequences.SequenceAllocator(block_size=5)
+        numbers = [allocator.next_number('2025-06-01', shop='MAIN') for _ in range(7)]
+        self.assertEqual(numbers[0], 'INV-MAIN-2025-26-000001')
+        self.assertEqual(len(set(numbers)), 7)
+        self.assertEqual(allocator.next_number('2026-06-01', shop='MAIN'), 'INV-MAIN-2026-27-000001')
+
+        # A second worker starts after the first worker's leased block
+        other = sequences.SequenceAllocator(block_size=5)
+        self.assertEqual(other.next_number('2025-06-01', shop='MAIN'), 'INV-MAIN-2025-26-000011')
+
+    def test_prefix_and_format_per_sequence(self):
+        """Each shop/year row can carry its own prefix and format"""
+        InvoiceSequence.objects.create(
+            shop='BR2', financial_year='2025-26', prefix='B2', number_format='{prefix}/{fy}/{number}'
+        )
+        allocator = sequences.SequenceAllocator()
+        self.assertEqual(allocator.next_number('2025-06-01', shop='BR2'), 'B2/2025-26/1')
+
+
+class StockMovementTestCase(SalesFixtureMixin, TestCase):
+    def test_update_stock_records_movement(self):
+        """Restocking adds a movement instead of appending to the notes"""
+        notes = self.purchase.notes
+        self.client.force_login(self.owner)
+        self.client.post(reverse('update_stock', args=[self.purchase.pk]), {'additional_quantity': '5'})
+        self.purchase.refresh_from_db()
+        self.assertEqual(self.purchase.quantity, 15)
+        self.assertEqual(self.purchase.notes, notes)
+        movement = StockMovement.objects.get()
+        self.assertEqual((movement.delta, movement.reason, movement.user), (5, 'restock', self.owner))
+
+    def test_sale_and_reversal_movements(self):
+        """Checkout and invoice deletion are recorded as opposite movements"""
+        invoice = checkout.checkout([checkout.Line(self.purchase.pk, 4, Decimal('80.00'))], 'Walk-in', 'INV-1')
+        stock.restore_invoice_stock(invoice)
+        self.assertEqual(
+            list(StockMovement.objects.order_by('id').values_list('delta', 'reason')),
+            [(-4, 'sale'), (4, 'sale_reversal')]
+        )
+        self.purchase.refresh_from_db()
+        self.assertEqual(self.purchase.quantity, 10)
+
+    def test_listings_hide_stock_update_rows(self):
+        """Legacy stock-update rows are filtered on the kind column"""
+        Purchase.objects.create(
+            product_name='Basmati restock', category=self.category, subcategory=self.subcategory,
+            quantity=5, product_rate=50, total_rate=0, mrp=80, date=self.today,
+            kind=Purchase.KIND_STOCK_UPDATE
+        )
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('list_purchases'))
+        self.assertEqual([p.pk for p in response.context['purchases']], [self.purchase.pk])
+
+
+class ProductSearchTestCase(SalesFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.brown = Purchase.objects.create(
+            product_name='Brown Basmati Rice', category=self.category, subcategory=self.subcategory,
+            quantity=5, product_rate=60, total_rate=0, mrp=90, date=self.today
+        )
+        self.oil = Purchase.objects.create(
+            product_name='Sunflower Oil', category=self.category, subcategory=self.subcategory,
+            quantity=5, product_rate=60, total_rate=0, mrp=90, date=self.today
+        )
+        self.purchases = Purchase.objects.all()
+
+    def test_prefix_search_across_names(self):
+        """Every typed word must match the start of a word in a name column"""
+        self.assertTrue(search.available())
+        found = search.filter_purchases(self.purchases, 'bas')
+        self.assertEqual(set(found), {self.purchase, self.brown})
+        self.assertEqual(list(search.filter_purchases(self.purchases, 'sun gro')), [self.oil])
+        self.assertFalse(search.filter_purchases(self.purchases, 'basmati oil').exists())
+
+    def test_ranked_results_and_fallback(self):
+        """Ranked lookups agree with the LIKE fallback on what matches"""
+        ranked = search.ranked_purchases(self.purchases, 'basmati')
+        self.assertEqual(set(ranked), {self.purchase, self.brown})
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(search.ranked_purchases(self.purchases.filter(quantity__gt=0), 'basmati', limit=1)), 1)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('LIMIT 1', queries[0]['sql'])
+        with mock.patch.object(search, 'available', return_value=False):
+            self.assertEqual(search.ranked_purchases(self.purchases, 'basmati'), [self.purchase, self.brown])
+            self.assertEqual(list(search.filter_purchases(self.purchases, 'sun gro')), [self.oil])
+
+    def test_index_follows_renames(self):
+        """Renaming a purchase or its category re-indexes it"""
+        self.oil.product_name = 'Groundnut Oil'
+        self.oil.save()
+        self.assertEqual(list(search.filter_purchases(self.purchases, 'groundnut')), [self.oil])
+        self.category.name = 'Staples'
+        self.category.save()
+        self.assertEqual(search.filter_purchases(self.purchases, 'staples').count(), 3)
+
+    def test_billing_search_endpoint(self):
+        """The billing lookup returns in-stock matches as JSON"""
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('search_products'), {'q': 'sunf'})
+        self.assertEqual([row['id'] for row in response.json()], [self.oil.pk])
+
+
+class KeysetPaginationTestCase(SalesFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for index in range(5):
+            Purchase.objects.create(
+                product_name=f'Item {index}', category=self.category, subcategory=self.subcategory,
+                quantity=index + 1, product_rate=10, total_rate=0, mrp=20,
+                date=self.today - timedelta(days=index % 2)
+            )
+
+    def test_pages_walk_by_date_and_id(self):
+        """Following next and previous cursors visits every row exactly once"""
+        expected = list(Purchase.objects.order_by('-date', '-id'))
+        params = {'per_page': '2'}
+        seen = []
+        while True:
+            page = pagination.paginate(Purchase.objects.all(), params)
+            seen.extend(page.object_list)
+            if not page.has_next:
+                break
+            params = {'per_page': '2', 'after': page.next_cursor}
+        self.assertEqual(seen, expected)
+
+        back = pagination.paginate(Purchase.objects.all(), {'per_page': '2', 'before': page.previous_cursor})
+        self.assertEqual(back.object_list, expected[2:4])
+
+    def test_list_purchases_totals_and_json(self):
+        """Totals cover every match while only one page of rows is loaded"""
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('list_purchases'), {'per_page': '2'})
+        self.assertEqual(len(response.context['purchases']), 2)
+        self.assertEqual(response.context['total_count'], 6)
+        self.assertEqual(response.context['total_quantity'], 25)
+        self.assertIn('per_page=2', response.context['page'].next_url)
+
+        data = self.client.get(reverse('list_purchases'), {'per_page': '4', 'format': 'json'}).json()
+        self.assertEqual(len(data['results']), 4)
+        self.assertEqual(data['total_value'], 650.0)
+        data = self.client.get(
+            reverse('list_purchases'), {'per_page': '4', 'format': 'json', 'after': data['next_cursor']}
+        ).json()
+        self.assertEqual((len(data['results']), data['next_cursor']), (2, None))
+
+    def test_invoice_list_and_history_pages(self):
+        """Invoice list and purchase history are paginated with totals"""
+        for number in range(3):
+            self._create_invoice(f'INV-{number}', Decimal('80.00'))
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('invoice_list'), {'per_page': '2'})
+        self.assertEqual(len(response.context['invoices']), 2)
+        self.assertEqual(response.context['total_amount'], Decimal('240.00'))
+        checkout.checkout([checkout.Line(self.purchase.pk, 3, Decimal('80.00'))], 'Walk-in', 'INV-3')
+        response = self.client.get(reverse('purchase_history'), {'q': 'basmati'})
+        self.assertEqual(response.context['purchase_data'][0]['original_quantity'], 10)
+        self.assertEqual(response.context['purchase_data'][0]['purchase'].quantity, 7)
+
+
+class StockCounterTestCase(SalesFixtureMixin, TestCase):
+    def test_counters_follow_sales_reversals_and_restocks(self):
+        """received_quantity stays quantity + sold_quantity on every stock path"""
+        invoice = checkout.checkout([checkout.Line(self.purchase.pk, 4, Decimal('80.00'))], 'Walk-in', 'INV-1')
+        self.purchase.refresh_from_db()
+        self.assertEqual((self.purchase.quantity, self.purchase.sold_quantity, self.purchase.received_quantity), (6, 4, 10))
+        stock.restock(self.purchase, 5)
+        stock.restore_invoice_stock(invoice)
+        self.purchase.refresh_from_db()
+        self.assertEqual((self.purchase.quantity, self.purchase.sold_quantity, self.purchase.received_quantity), (15, 0, 15))
+
+    def test_stale_instances_keep_sales_made_since_loading(self):
+        """Restocking or saving an instance loaded before a sale keeps the sale"""
+        stale = Purchase.objects.get(pk=self.purchase.pk)
+        checkout.checkout([checkout.Line(self.purchase.pk, 4, Decimal('80.00'))], 'Walk-in', 'INV-1')
+        stock.restock(stale, 5)
+        self.assertEqual((stale.quantity, stale.sold_quantity, stale.received_quantity), (11, 4, 15))
+
+        stale = Purchase.objects.get(pk=self.purchase.pk)
+        checkout.checkout([checkout.Line(self.purchase.pk, 1, Decimal('80.00'))], 'Walk-in', 'INV-2')
+        stale.sale_rate = Decimal('70.00')
+        stale.quantity += 2
+        stale.save()
+        self.purchase.refresh_from_db()
+        self.assertEqual((self.purchase.quantity, self.purchase.sold_quantity, self.purchase.received_quantity), (12, 5, 17))
+        self.assertEqual(self.purchase.sale_rate, Decimal('70.00'))
+        self.assertEqual(stock.reconcile(dry_run=True), [])
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        """Items written behind the counters' back are picked up by reconcile"""
+        self._create_invoice('INV-1', Decimal('80.00'), quantity=2)
+        drifted = stock.reconcile(dry_run=True)
+        self.assertEqual([(row['id'], row['actual_sold']) for row in drifted], [(self.purchase.pk, 2)])
+        self.assertEqual(Purchase.objects.get(pk=self.purchase.pk).sold_quantity, 0)
+        stock.reconcile()
+        self.purchase.refresh_from_db()
+        self.assertEqual((self.purchase.sold_quantity, self.purchase.received_quantity), (2, 12))
+        self.assertEqual(stock.reconcile(), [])
+
+    def test_stock_report_reads_counters(self):
+        """The stock report takes purchased and sold figures from the counters"""
+        checkout.checkout([checkout.Line(self.purchase.pk, 3, Decimal('80.00'))], 'Walk-in', 'INV-1')
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('stock_report'))
+        row = response.context['report'][0]
+        self.assertEqual((row.total_purchased, row.total_sold, row.balance), (10, 3, 7))
+
+
+class ShopReportTestCase(SalesFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        reports.report_cache.clear()
+
+    def test_sections_and_derived_figures(self):
+        """Every section is built from the shared base"""
+        checkout.checkout([checkout.Line(self.purchase.pk, 4, Decimal('80.00'))], 'Walk-in', 'INV-1')
+        report = reports.shop_report()
+        self.assertEqual(report['sales_summary']['net_revenue'], Decimal('320.00'))
+        self.assertEqual(report['top_selling'][0]['total_qty'], 4)
+        self.assertEqual(report['category_sales'][0]['percentage'], Decimal('100'))
+        self.assertEqual([(row.purchase_id, row.on_hand) for row in report['low_stock']], [(self.purchase.pk, 6)])
+        self.assertEqual(report['total_cost'], Decimal('200.00'))
+
+    def test_cached_per_data_version(self):
+        """Reloading costs one query until a write bumps the data version"""
+        self._create_invoice('INV-1', Decimal('80.00'))
+        reports.shop_report(self.today, self.today)
+        with self.assertNumQueries(1):
+            report = reports.shop_report(self.today, self.today)
+        self.assertEqual(report['sales_summary']['total_sales'], Decimal('80.00'))
+
+        version = versioning.current(versioning.REPORTS)
+        self._create_invoice('INV-2', Decimal('40.00'))
+        self.assertGreater(versioning.current(versioning.REPORTS), version)
+        report = reports.shop_report(self.today, self.today)
+        self.assertEqual(report['sales_summary']['total_sales'], Decimal('120.00'))
+
+
+class ParallelShopReportTestCase(SalesFixtureMixin, TransactionTestCase):
+    def test_parallel_build_matches_serial(self):
+        """Sections computed on the thread pool equal the serial build"""
+        self._create_invoice('INV-1', Decimal('80.00'), quantity=2)
+        base = reports.report_base()
+        parallel = reports.build(base, workers=4)
+        serial = reports.build(base, workers=1)
+        self.assertEqual(parallel['sales_summary'], serial['sales_summary'])
+        self.assertEqual(parallel['product_sales'], serial['product_sales'])
+        self.assertEqual(parallel['stock_data'], serial['stock_data'])
+
+
+class ExportTestCase(SalesFixtureMixin, TestCase):
+    def _csv(self, table, **params):
+        response = self.client.get(reverse('export_table', args=[table]), params)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_invoice_items_follow_role_and_dates(self):
+        """Line items are streamed for the invoices the user may see"""
+        staff = CustomUser.objects.create_user(username='staff', password='testpass123', role='staff')
+        self._create_invoice('INV-1', Decimal('80.00'), quantity=2, created_by=self.owner)
+        self._create_invoice('INV-2', Decimal('40.00'), created_by=staff)
+        self.client.force_login(self.owner)
+        lines = self._csv('invoice-items', from_date=self.today.isoformat())
+        self.assertEqual(lines[0].split(',')[:3], ['Bill Number', 'Date', 'Customer'])
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(len(self._csv('invoice-items', to_date=(self.today - timedelta(days=1)).isoformat())), 1)
+
+        self.client.force_login(staff)
+        lines = self._csv('invoice-items')
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], ['INV-2'])
+        for table in exports.OWNER_TABLES:
+            self.assertEqual(self.client.get(reverse('export_table', args=[table])).status_code, 403)
+
+    def test_stock_and_history_honour_page_filters(self):
+        """Exports apply the same category and search filters as the pages"""
+        other = Category.objects.create(name='Spices')
+        Purchase.objects.create(
+            product_name='Jeera', category=other, subcategory=self.subcategory,
+            quantity=2, product_rate=30, total_rate=0, mrp=40, date=self.today
+        )
+        self.client.force_login(self.owner)
+        lines = self._csv('stock-report', category=self.category.pk)
+        self.assertEqual(lines[1].split(',')[0], 'Basmati')
+        self.assertEqual(len(lines), 2)
+        lines = self._csv('purchase-history', q='jee')
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], ['Jeera'])
+
+    def test_unknown_table_and_format(self):
+        """Unknown tables are 404s and unknown formats are rejected"""
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get(reverse('export_table', args=['nope'])).status_code, 404)
+        response = self.client.get(reverse('export_table', args=['invoices']), {'format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+        for table in exports.TABLES:
+            self.assertIsNotNone(self._csv(table))
+
+    @skipUnless(exports.Workbook, 'openpyxl is not installed')
+    def test_xlsx_export_writes_money_as_numbers(self):
+        """Money values land in the workbook as numeric cells"""
+        self._create_invoice('INV-1', Decimal('80.00'), quantity=2, created_by=self.owner)
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('export_table', args=['invoice-items']), {'format': 'xlsx'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Disposition'].endswith('.xlsx"'))
+        workbook = importer.load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True)
+        rows = list(workbook.active.iter_rows(values_only=True))
+        workbook.close()
+        self.assertEqual(rows[0][:3], ('Bill Number', 'Date', 'Customer'))
+        self.assertEqual((rows[1][0], rows[1][6], rows[1][7]), ('INV-1', 2, 80))
+
+        response = exports.xlsx_response('money', ('Amount',), [(money.Money('12.345'),), (money.Money(),)])
+        workbook = importer.load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True)
+        self.assertEqual([row[0] for row in workbook.active.iter_rows(min_row=2, values_only=True)], [12.35, 0])
+        workbook.close()
+
+
+class ReportJobTestCase(SalesFixtureMixin, TestCase):
+    def test_identical_live_jobs_are_shared(self):
+        """Submitting the same report twice returns the live job"""
+        job = jobs.submit('shop_report', {'from_date': '2025-04-01', 'to_date': '', 'q': 'ignored'})
+        self.assertEqual(job.params, {'from_date': '2025-04-01'})
+        self.assertEqual(jobs.submit('shop_report', {'from_date': '2025-04-01'}).pk, job.pk)
+        self.assertNotEqual(jobs.submit('shop_report', {'from_date': '2025-05-01'}).pk, job.pk)
+
+        jobs.run(jobs.claim('test'))
+        self.assertNotEqual(jobs.submit('shop_report', {'from_date': '2025-04-01'}).pk, job.pk)
+        with self.assertRaises(jobs.JobError):
+            jobs.submit('nope', {})
+
+    def test_submit_poll_and_download(self):
+        """A queued report is served from the job once the worker ran it"""
+        self._create_invoice('INV-1', Decimal('80.00'))
+        self.client.force_login(self.owner)
+        data = self.client.post(reverse('submit_report_job', args=['dashboard_data']), {'period': '7days'}).json()
+        self.assertEqual((data['status'], data['result_url']), ('pending', None))
+        self.assertEqual(self.client.get(reverse('report_job_result', args=[data['job_id']])).status_code, 409)
+
+        job = jobs.run(jobs.claim('test'))
+        self.assertEqual(job.status, ReportJob.STATUS_DONE)
+        data = self.client.get(data['status_url']).json()
+        response = self.client.get(data['result_url'])
+        self.assertEqual(response.json()['totalIncome'], 80.0)
+
+    def test_failed_job_records_error(self):
+        """Errors are stored on the job instead of stopping the worker"""
+        jobs.submit('staff_wise_report', {'staff_id': self.owner.pk})
+        job = jobs.run(jobs.claim('test'))
+        self.assertEqual(job.status, ReportJob.STATUS_FAILED)
+        self.assertIn('Staff member not found', ReportJob.objects.get(pk=job.pk).error)
+        self.assertIsNone(jobs.claim('test'))
+
+    def test_staff_only_read_their_own_jobs(self):
+        """Staff get 403 for other users' jobs and for owner-only kinds"""
+        staff = CustomUser.objects.create_user(username='staff', password='testpass123', role='staff')
+        owners = jobs.submit('shop_report', {}, user=self.owner)
+        batch = jobs.submit('invoice_pdfs', {'ids': '1'}, user=staff)
+        self.client.force_login(staff)
+        own = self.client.post(reverse('submit_report_job', args=['shop_report'])).json()
+        self.assertNotEqual(own['job_id'], owners.pk)
+        self.assertEqual(self.client.get(own['status_url']).status_code, 200)
+        for job in (owners, batch):
+            for name in ('report_job_status', 'report_job_result'):
+                self.assertEqual(self.client.get(reverse(name, args=[job.pk])).status_code, 403)
+
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get(own['status_url']).status_code, 200)
+        self.assertEqual(self.client.get(reverse('report_job_status', args=[batch.pk])).status_code, 200)
+
+
+class ReportWorkerTestCase(SalesFixtureMixin, TransactionTestCase):
+    def test_worker_drains_queue(self):
+        """run_report_worker --once computes every queued job"""
+        staff = CustomUser.objects.create_user(username='staff', password='testpass123', role='staff')
+        self._create_invoice('INV-1', Decimal('80.00'), created_by=staff)
+        jobs.submit('shop_report', {})
+        jobs.submit('staff_wise_report', {'staff_id': staff.pk})
+        jobs.submit('dashboard_data', {'period': '30days'})
+        call_command('run_report_worker', '--once', '--concurrency', '2', stdout=StringIO())
+        self.assertEqual(
+            sorted(ReportJob.objects.values_list('status', flat=True)), ['done', 'done', 'done']
+        )
+        self.assertIn('Basmati', ReportJob.objects.get(kind='staff_wise_report').result)
+
+
+class InvoiceBatchTestCase(SalesFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output)
+        self.first = self._create_invoice('INV-1', Decimal('80.00'))
+        self.second = self._create_invoice('INV/2', Decimal('40.00'))
+
+    def _render(self, **options):
+        return invoice_batch.render_selection(
+            self.today, self.today, output_format='html', output_dir=self.output, **options
+        )
+
+    def test_rerun_skips_unchanged_invoices(self):
+        """Only invoices whose rendered content changed are converted again"""
+        result = self._render(workers=1)
+        self.assertEqual((result.total, result.rendered, result.skipped), (2, 2, 0))
+        with zipfile.ZipFile(result.zip_path) as archive:
+            self.assertEqual(sorted(archive.namelist()), ['INV-1.html', 'INV_2.html'])
+            self.assertIn('Basmati', archive.read('INV-1.html').decode())
+
+        self.second.customer_name = 'Regular'
+        self.second.save()
+        progress = []
+        result = self._render(workers=1, progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual((result.rendered, result.skipped), (1, 1))
+        self.assertEqual(progress, [(2, 2)])
+        self.assertEqual(len(list((result.zip_path.parent / 'files').iterdir())), 2)
+
+    def test_process_pool(self):
+        """Conversion runs in worker processes"""
+        result = self._render(workers=2)
+        self.assertEqual(result.rendered, 2)
+
+    def test_owner_only_job(self):
+        """Owners queue a batch as a job and download the zip"""
+        staff = CustomUser.objects.create_user(username='staff', password='testpass123', role='staff')
+        self.client.force_login(staff)
+        self.assertEqual(self.client.post(reverse('invoice_pdf_batch'), {'ids': '1'}).status_code, 302)
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.post(reverse('invoice_pdf_batch'), {}).status_code, 400)
+        data = self.client.post(
+            reverse('invoice_pdf_batch'), {'ids': f'{self.first.pk}', 'format': 'html'}
+        ).json()
+        with override_settings(INVOICE_PDFS={'OUTPUT_DIR': self.output, 'WORKERS': 1}):
+            job = jobs.run(jobs.claim('test'))
+        self.assertEqual((job.status, job.progress), (ReportJob.STATUS_DONE, 100))
+        response = self.client.get(reverse('report_job_result', args=[data['job_id']]))
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        response.close()
+
+
+class ExpiryTestCase(SalesFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for days in (-3, 5, 20, 100):
+            Purchase.objects.create(
+                product_name=f'Batch {days}', category=self.category, subcategory=self.subcategory,
+                quantity=2, product_rate=10, total_rate=0, mrp=20, date=self.today - timedelta(days=10),
+                expire_date=self.today + timedelta(days=days)
+            )
+        Purchase.objects.create(
+            product_name='Deleted batch', category=self.category, subcategory=self.subcategory,
+            quantity=2, product_rate=10, total_rate=0, mrp=20, date=self.today,
+            expire_date=self.today, is_deleted=True
+        )
+
+    def test_days_and_buckets_in_sql(self):
+        """Days to expiry and bucket counts come from the database"""
+        rows = expiry.expiring(self.today, within=30)
+        self.assertEqual([row.days_to_expiry for row in rows], [-3, 5, 20])
+        self.assertEqual(
+            expiry.bucket_counts(self.today), {'expired': 1, 'week': 1, 'month': 1, 'later': 1}
+        )
+
+    def test_daily_alerts_feed_dashboard(self):
+        """Alert rows are recorded per category and bucket and shown to the owner"""
+        self.assertEqual(expiry.record_alerts(self.today), 3)
+        self.assertEqual(expiry.record_alerts(self.today), 3)
+        alert = ExpiryAlert.objects.get(bucket=ExpiryAlert.BUCKET_WEEK)
+        self.assertEqual((alert.batch_count, alert.quantity, alert.stock_value), (1, 2, Decimal('20.00')))
+
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('owner_dashboard'))
+        self.assertEqual(len(response.context['expiry_alerts']), 3)
+        self.assertContains(response, 'Within 7 days')
+
+
+class ReorderTestCase(SalesFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.batch = Purchase.objects.create(
+            product_name='Sona Masoori', category=self.category, subcategory=self.subcategory,
+            quantity=40, product_rate=40, total_rate=0, mrp=60, date=self.today - timedelta(days=40)
+        )
+        for days_ago, quantity in ((1, 3), (2, 4)):
+            invoice = Invoice.objects.create(
+                bill_number=f'INV-{days_ago}', customer_name='Walk-in', date=self.today - timedelta(days=days_ago)
+            )
+            InvoiceItem.objects.create(
+                invoice=invoice, purchase=self.batch, quantity=quantity, rate=Decimal('60.00'),
+                total=Decimal('60.00') * quantity
+            )
+        Purchase.objects.filter(pk=self.batch.pk).update(quantity=5)
+
+    def test_velocity_cover_and_reorder_point(self):
+        """Velocity averages the window; the reorder point adds safety stock for the lead time"""
+        rows = {row.purchase_id: row for row in reorder.compute(self.today, vectorised=False)}
+        row = rows[self.batch.pk]
+        self.assertAlmostEqual(row.velocity, 0.25)
+        self.assertAlmostEqual(row.days_of_cover, 20)
+        self.assertEqual((row.reorder_point, row.suggested_quantity), (6, 3))
+        self.assertEqual(row.status, ReorderSuggestion.STATUS_REORDER)
+        self.assertEqual(rows[self.purchase.pk].status, ReorderSuggestion.STATUS_IDLE)
+
+    @skipUnless(reorder.np is not None, 'numpy is not installed')
+    def test_vectorised_matches_python(self):
+        fields = ('purchase_id', 'velocity', 'days_of_cover', 'reorder_point', 'suggested_quantity', 'status')
+        rows = [
+            [tuple(getattr(row, field) for field in fields) for row in reorder.compute(self.today, vectorised=flag)]
+            for flag in (True, False)
+        ]
+        self.assertEqual(rows[0], rows[1])
+
+    def test_nightly_run_feeds_page_api_and_stock_status(self):
+        """Stored suggestions back the page, the JSON API and Product.stock_status"""
+        out = StringIO()
+        call_command('compute_reorder_suggestions', stdout=out)
+        self.assertIn('Stored 2 reorder suggestions', out.getvalue())
+        product = Product.objects.create(
+            name='Sona Masoori', purchase=self.batch, category=self.category, final_price=60,
+            mrp=60, purchase_rate=40, stock_quantity=20
+        )
+        self.assertEqual(product.stock_status(), 'Low')
+        with self.assertNumQueries(1):
+            products = list(Product.objects.select_related('purchase__reorder'))
+            self.assertEqual([product.stock_status() for product in products], ['Low'])
+
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('reorder_suggestions'))
+        self.assertEqual([row.purchase_id for row in response.context['suggestions']], [self.batch.pk])
+        data = self.client.get(reverse('api_reorder_suggestions')).json()
+        self.assertEqual(data['results'][0]['suggested_quantity'], 3)
+        self.assertEqual(reports.shop_report()['low_stock'][0].purchase_id, self.batch.pk)
+
+
+class MoneyTestCase(SalesFixtureMixin, TestCase):
+    def test_money_rounds_to_paise(self):
+        self.assertEqual(money.Money(0.1) + money.Money(0.2), Decimal('0.30'))
+        self.assertEqual(money.Money('12.345').paise, 1235)
+        self.assertEqual(money.Money.from_paise(2849.5), Decimal('28.50'))
+        self.assertEqual(money.to_paise(80), 8000)
+
+    def test_amounts_stored_as_paise_and_summed_exactly(self):
+        """Columns hold whole paise; SUMs come back as Money"""
+        for number in range(3):
+            self._create_invoice(f'INV-{number}', Decimal('0.10'), quantity=1)
+        self.purchase.refresh_from_db()
+        self.assertIsInstance(self.purchase.mrp, money.Money)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT mrp, total_rate FROM user_purchase WHERE id = %s', [self.purchase.pk])
+            self.assertEqual(cursor.fetchone(), (8000, 50000))
+        self.assertEqual(reports.shop_report()['sales_summary']['total_sales'], Decimal('0.30'))
+        self.assertEqual(Purchase.objects.filter(mrp__gt=79.99).count(), 1)
+
+
+class CatalogImportTestCase(SalesFixtureMixin, TestCase):
+    HEADER = 'Product Name,Category,Subcategory,Quantity,Product Rate,MRP,Sale Rate,Date,Expire Date,Notes\n'
+
+    def _csv(self, *lines):
+        return BytesIO((self.HEADER + ''.join(line + '\n' for line in lines)).encode())
+
+    def test_imports_rows_matching_names_case_insensitively(self):
+        today = self.today.isoformat()
+        upload = self._csv(
+            f'Sona Masoori,grocery,RICE,20,40,60,55,{today},,',
+            f'Toor Dal,Grocery,pulses,5,90.5,120,,{today},,From supplier list',
+            f'Tea,Beverages,Leaf tea,12,100,150,,{today},,',
+        )
+        records = importer.read_rows(upload)
+        result = importer.import_rows(records)
+        self.assertEqual((result.purchases, result.categories, result.subcategories), (3, 1, 2))
+        self.assertEqual(Category.objects.count(), 2)
+        sona = Purchase.objects.get(product_name='Sona Masoori')
+        self.assertEqual((sona.category, sona.subcategory), (self.category, self.subcategory))
+        self.assertEqual((sona.total_rate, sona.received_quantity), (Decimal('800.00'), 20))
+        self.assertEqual(sona.notes, 'Purchase of Sona Masoori in Grocery - Rice')
+        self.assertEqual(SubCategory.objects.get(name='Leaf Tea').description, 'Beverages Leaf tea items')
+        self.assertEqual(Purchase.objects.get(product_name='Toor Dal').notes, 'From supplier list')
+        # bulk_create sends no signals, so the ledger is refreshed by the importer
+        self.assertEqual(DailyLedger.objects.get(date=self.today).expense, Decimal('2952.50'))
+
+    def test_row_errors_block_the_whole_import(self):
+        upload = self._csv(
+            f'Good,Grocery,Rice,1,10,20,,{self.today.isoformat()},,',
+            'X,Grocery,Rice,1,10,20,,2024-01-01,,',
+            'Milk,Dairy,Toned,two,10,5,,not-a-date,,',
+        )
+        result = importer.import_file(upload)
+        self.assertEqual([error.line for error in result.errors], [3, 4])
+        self.assertIn('at least 2 characters', result.errors[0].message)
+        self.assertEqual(Purchase.objects.count(), 1)
+        self.assertFalse(Category.objects.filter(name='Dairy').exists())
+
+        with self.assertRaises(importer.CatalogImportError):
+            importer.read_rows(BytesIO(b'product_name,quantity\nTea,1\n'))
+
+    @skipUnless(exports.Workbook, 'openpyxl is not installed')
+    def test_imports_xlsx_rows(self):
+        workbook = exports.Workbook()
+        sheet = workbook.active
+        sheet.append(self.HEADER.strip().split(','))
+        sheet.append(['Sona Masoori', 'Grocery', 'Rice', 20, 40, 60, 55.5, self.today, None, None])
+        sheet.append(['Toor Dal', 'grocery', 'Pulses', 5, 90.5, 120, None, self.today.isoformat(), None, 'Supplier'])
+        upload = BytesIO()
+        workbook.save(upload)
+        upload.seek(0)
+
+        records = importer.read_rows(upload, 'xlsx')
+        self.assertEqual([line for line, _ in records], [2, 3])
+        result = importer.import_rows(records)
+        self.assertEqual((result.purchases, result.errors), (2, []))
+        sona = Purchase.objects.get(product_name='Sona Masoori')
+        self.assertEqual((sona.date, sona.sale_rate, sona.total_rate), (self.today, Decimal('55.50'), Decimal('800.00')))
+        self.assertEqual(Purchase.objects.get(product_name='Toor Dal').product_rate, Decimal('90.50'))
+
+        with self.assertRaises(importer.CatalogImportError):
+            importer.read_rows(BytesIO(b'not a workbook'), 'xlsx')
+
+
+class CategoryTreeTestCase(SalesFixtureMixin, TestCase):
+    def test_tree_is_read_without_queries_until_categories_change(self):
+        category_tree.clear()
+        self.assertEqual([category.name for category in category_tree.categories()], ['Grocery'])
+        subcategory = SubCategory.objects.get()
+        with self.assertNumQueries(0):
+            self.assertEqual(str(subcategory), 'Rice (Grocery)')
+            self.assertEqual(PurchaseForm().fields['subcategory'].choices, [(subcategory.pk, 'Rice (Grocery)')])
+            self.assertEqual(category_tree.subcategories_json(), [
+                {'id': str(subcategory.pk), 'name': 'Rice', 'category_id': str(self.category.pk)}
+            ])
+
+        # Saves in this process drop the tree at once
+        SubCategory.objects.create(category=self.category, name='pulses')
+        self.assertEqual([node.name for node in category_tree.category(self.category.pk).children], ['Rice', 'Pulses'])
+
+    @override_settings(CATEGORY_TREE={'CHECK_SECONDS': 0})
+    def test_other_processes_are_seen_through_the_version_stamp(self):
+        category_tree.categories()
+        # A rename by another process: no signal here, only the stamp moves
+        Category.objects.filter(pk=self.category.pk).update(name='Staples')
+        versioning.bump(versioning.CATEGORIES)
+        self.assertEqual(category_tree.category_name(self.category.pk), 'Staples')
+        with self.assertNumQueries(1):
+            # Unchanged stamp: the tree is kept
+            category_tree.categories()
+
+
+class CatalogSyncTestCase(SalesFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.login(username='owner', password='testpass123')
+
+    def test_snapshot_is_revalidated_with_its_etag(self):
+        response = self.client.get(reverse('api_catalog'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        response = self.client.get(reverse('api_catalog'))
+        data = response.json()
+        self.assertTrue(data['full'])
+        self.assertEqual(response['ETag'], catalog.etag(data['version']))
+        self.assertEqual([row['name'] for row in data['subcategories']], ['Rice'])
+        self.assertEqual(data['purchases'][0]['product_rate'], 50.0)
+
+        response = self.client.get(reverse('api_catalog'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(reverse('api_catalog'), {'since': 'x'}).status_code, 400)
+
+    def test_delta_lists_changed_and_sold_out_rows(self):
+        second = Purchase.objects.create(
+            product_name='Sona', category=self.category, subcategory=self.subcategory,
+            quantity=2, product_rate=30, total_rate=0, mrp=45, date=self.today
+        )
+        since = catalog.current_version()
+        checkout.checkout([
+            checkout.Line(self.purchase.pk, 4, Decimal('80.00')),
+            checkout.Line(second.pk, 2, Decimal('45.00')),
+        ], 'Walk-in', 'INV-1')
+
+        data = self.client.get(reverse('api_catalog'), {'since': since}).json()
+        self.assertFalse(data['full'])
+        self.assertEqual(data['version'], catalog.current_version())
+        self.assertEqual([(row['id'], row['quantity']) for row in data['purchases']], [(self.purchase.pk, 6)])
+        self.assertEqual(data['removed']['purchases'], [second.pk])
+        self.assertEqual(data['categories'], [])
+
+        # A reset, or a version the log has pruned, sends the full snapshot
+        catalog.reset()
+        self.assertTrue(catalog.changes_since(data['version'])['full'])
+        CatalogChange.objects.update(changed_at=timezone.now() - timedelta(days=30))
+        self.assertGreater(catalog.prune(), 0)
+        self.assertTrue(catalog.changes_since(since)['full'])
+        self.assertFalse(catalog.changes_since(catalog.current_version())['full'])
+
+
+class QueryBudgetTestCase(TestCase):
+    """Every page and endpoint in user/urls.py, run against a realistic
+    dataset, must stay within its query budget.
+
+    The dataset has dozens of rows of each kind, so a page that goes back
+    to a query per row (N+1) blows its budget. Budgets are the counts with
+    a cold report cache, price book and category tree; lower one when a view gets cheaper.
+    """
+
+    # Generous, so a slow CI machine passes; an N+1 trips the query budget first
+    MAX_SECONDS = 2.0
+
+    # Expected status for a redirect to the login page, and for owner-only views
+    LOGIN = 'login'
+    OWNER_ONLY = {'owner': 200, 'staff': LOGIN}
+
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.now().date()
+        cls.owner = CustomUser.objects.create_user(username='owner', password='testpass123', role='owner')
+        cls.staff = [
+            CustomUser.objects.create_user(username=f'staff{number}', password='testpass123', role='staff')
+            for number in range(3)
+        ]
+        purchases = []
+        for number in range(4):
+            cls.category = Category.objects.create(name=f'Category {number}')
+            for sub_number in range(2):
+                cls.subcategory = SubCategory.objects.create(category=cls.category, name=f'Sub {number}{sub_number}')
+                for batch in range(4):
+                    purchase = Purchase.objects.create(
+                        product_name=f'Item {number}{sub_number}{batch}', category=cls.category,
+                        subcategory=cls.subcategory, quantity=40, product_rate=50, total_rate=0, mrp=80,
+                        sale_rate=70 if batch % 2 else 80, date=today - timedelta(days=batch),
+                        expire_date=today + timedelta(days=10 + batch),
+                    )
+                    product = Product.objects.create(
+                        name=purchase.product_name, purchase=purchase, category=cls.category,
+                        subcategory=cls.subcategory, final_price=80, mrp=80, purchase_rate=50,
+                        selling_price=80, stock_quantity=40,
+                    )
+                    SellingProduct.objects.create(product=product, selling_price=80)
+                    if batch % 2:
+                        Discount.objects.create(
+                            product=product, discount_percent=10, start_date=today,
+                            end_date=today + timedelta(days=5), status='active',
+                        )
+                    purchases.append(purchase)
+        for number in range(30):
+            invoice = Invoice.objects.create(
+                bill_number=f'INV-{number}', customer_name='Walk-in', date=today - timedelta(days=number % 7),
+                created_by=cls.staff[number % len(cls.staff)],
+            )
+            for line in range(3):
+                InvoiceItem.objects.create(
+                    invoice=invoice, purchase=purchases[(number + line) % len(purchases)],
+                    quantity=1, rate=80, total=80,
+                )
+            invoice.calculate_totals()
+            invoice.save()
+        # The items were added directly, so bring the stock counters in line
+        stock.reconcile()
+        cls.invoice = invoice
+        cls.purchase, cls.purchases = purchases[1], purchases
+        jobs.submit('shop_report', {}, user=cls.owner)
+        cls.job = jobs.run(jobs.claim('budgets'))
+        reorder.refresh(today)
+
+    def budgets(self):
+        """(url name, url kwargs, query string, max queries, expected status) for every GET."""
+        category, subcategory, purchase = self.category.pk, self.subcategory.pk, self.purchase.pk
+        invoice, staff, job = self.invoice.pk, self.staff[0].pk, self.job.pk
+        return [
+            ('login', {}, {}, 2, 302),
+            ('dashboard', {}, {}, 2, 302),
+            ('admin_dashboard', {}, {}, 2, 302),
+            ('staff_dashboard', {}, {}, 2, 200),
+            ('owner_dashboard', {}, {}, 12, self.OWNER_ONLY),
+            ('test_add_discount', {'purchase_id': purchase}, {}, 2, 200),
+            ('add_category', {}, {}, 0, 200),
+            ('list_category', {}, {}, 2, 200),
+            ('edit_category', {'pk': category}, {}, 1, 200),
+            ('delete_category', {'pk': category}, {}, 1, 200),
+            ('add_subcategory', {}, {}, 2, 200),
+            ('list_subcategory', {}, {}, 2, 200),
+            ('edit_subcategory', {'pk': subcategory}, {}, 3, 200),
+            ('delete_subcategory', {'pk': subcategory}, {}, 1, 200),
+            ('list_purchases', {}, {}, 6, 200),
+            ('list_purchases', {}, {'format': 'json'}, 2, 200),
+            ('add_purchase', {}, {}, 2, 200),
+            ('import_catalog', {}, {}, 2, self.OWNER_ONLY),
+            ('edit_purchase', {'pk': purchase}, {}, 3, 200),
+            ('delete_purchase', {'pk': purchase}, {}, 4, 200),
+            ('remove_purchase', {'pk': purchase}, {}, 5, self.OWNER_ONLY),
+            ('list_products', {}, {}, 8, 200),
+            ('list_products', {}, {'format': 'json'}, 8, 200),
+            ('list_products_staff', {}, {}, 6, 200),
+            ('add_discount', {'purchase_id': purchase}, {}, 6, 200),
+            ('view_discount', {}, {}, 5, 200),
+            ('delete_discount', {'purchase_id': purchase}, {}, 5, 200),
+            ('remove_expired_discounts', {}, {}, 2, self.OWNER_ONLY),
+            ('stock_report', {}, {}, 4, 200),
+            ('update_stock', {'purchase_id': purchase}, {}, 5, 200),
+            ('purchase_history', {}, {}, 4, 200),
+            ('reorder_suggestions', {}, {}, 4, self.OWNER_ONLY),
+            ('export_table', {'table': 'invoice-items'}, {}, 3, 200),
+            ('export_table', {'table': 'shop-stock'}, {}, 3, 200),
+            ('shop_report', {}, {}, 13, 200),
+            ('staff_wise_report', {'staff_id': staff}, {}, 10, 200),
+            ('invoice_list', {}, {}, 4, 200),
+            ('invoice_list', {}, {'format': 'json'}, 4, 200),
+            ('add_billing', {}, {}, 4, 200),
+            ('invoice_view', {'invoice_id': invoice}, {}, 8, 200),
+            ('print_invoice', {'invoice_id': invoice}, {}, 8, 200),
+            ('delete_invoice', {'invoice_id': invoice}, {}, 3, 302),
+            ('billing_list', {}, {}, 4, 200),
+            ('list_billing', {}, {}, 4, 200),
+            ('staff_list', {}, {}, 3, self.OWNER_ONLY),
+            ('add_staff', {}, {}, 2, self.OWNER_ONLY),
+            ('edit_staff', {'staff_id': staff}, {}, 3, self.OWNER_ONLY),
+            ('delete_staff', {'staff_id': staff}, {}, 3, self.OWNER_ONLY),
+            ('load_subcategories', {}, {'category_id': category}, 2, 200),
+            ('load_products', {}, {'subcategory_id': subcategory}, 5, 200),
+            ('get_product_details', {}, {'purchase_id': purchase}, 3, 200),
+            ('search_products', {}, {'q': 'Item'}, 4, 200),
+            ('api_catalog', {}, {}, 6, 200),
+            ('api_dashboard_data', {}, {}, 9, 200),
+            ('api_reorder_suggestions', {}, {}, 4, self.OWNER_ONLY),
+            ('report_job_status', {'job_id': job}, {}, 3, {'owner': 200, 'staff': 403}),
+            ('report_job_result', {'job_id': job}, {}, 3, {'owner': 200, 'staff': 403}),
+        ]
+
+    def write_budgets(self):
+        """(url name, url kwargs, POST data, AJAX, max queries, expected status) for the write paths."""
+        purchase, other, invoice = self.purchase.pk, self.purchases[2].pk, self.invoice.pk
+        today = timezone.now().date()
+        checkout = {
+            'customer_name': 'Walk-in', 'customer_phone': '9876543210', 'date': today.isoformat(),
+            'discount_amount': '5', 'items-TOTAL_FORMS': '2',
+            'items-0-product': purchase, 'items-0-quantity': '2', 'items-0-price': '70.00',
+            'items-1-product': other, 'items-1-quantity': '1', 'items-1-price': '80.00',
+        }
+        discount = {
+            'discount_percentage': '15', 'start_date': today.isoformat(),
+            'end_date': (today + timedelta(days=3)).isoformat(),
+        }
+        return [
+            ('add_billing', {}, checkout, True, 25, 200),
+            ('add_discount', {'purchase_id': other}, discount, False, 19, 302),
+            ('add_discount', {'purchase_id': purchase}, discount, False, 19, 302),
+            ('delete_discount', {'purchase_id': purchase}, {}, False, 16, 302),
+            ('remove_expired_discounts', {}, {}, False, 3, {'owner': 302, 'staff': self.LOGIN}),
+            ('update_stock', {'purchase_id': purchase}, {'additional_quantity': '5'}, False, 19, 302),
+            ('delete_invoice', {'invoice_id': invoice}, {}, True, 29, 200),
+            ('submit_report_job', {'kind': 'shop_report'}, {'from_date': today.isoformat()}, True, 6, 202),
+            ('invoice_pdf_batch', {}, {'ids': str(invoice), 'format': 'html'}, True, 6, {'owner': 202, 'staff': self.LOGIN}),
+        ]
+
+    def assertStatus(self, response, expected, role):
+        """Check the response code; a 302 must match whether a login page was expected."""
+        if isinstance(expected, dict):
+            expected = expected[role]
+        to_login = response.status_code == 302 and response.url.startswith(f'{settings.LOGIN_URL}?')
+        if expected == self.LOGIN:
+            self.assertTrue(to_login, f'{response.status_code} {getattr(response, "url", "")}')
+        else:
+            self.assertEqual(response.status_code, expected)
+            self.assertFalse(to_login, response.url if to_login else '')
+
+    def test_every_url_has_a_budget(self):
+        names = {name for name, _, _, _, _ in self.budgets()}
+        names |= {name for name, _, _, _, _, _ in self.write_budgets()}
+        routed = {pattern.name for pattern in get_resolver('user.urls').url_patterns if pattern.name}
+        # Django's own LogoutView
+        routed.discard('logout')
+        self.assertEqual(routed - names, set(), 'Add a query budget for the new views')
+
+    def test_views_stay_within_query_budget(self):
+        for user in (self.owner, self.staff[0]):
+            self.client.force_login(user)
+            for name, kwargs, params, budget, status in self.budgets():
+                with self.subTest(view=name, params=params, role=user.role):
+                    reports.report_cache.clear()
+                    price_book.clear()
+                    category_tree.clear()
+                    started = time.perf_counter()
+                    with CaptureQueriesContext(connection) as queries:
+                        response = self.client.get(reverse(name, kwargs=kwargs), params)
+                        if response.streaming:
+                            b''.join(response.streaming_content)
+                    elapsed = time.perf_counter() - started
+                    self.assertStatus(response, status, user.role)
+                    self.assertLessEqual(
+                        len(queries), budget,
+                        '\n'.join(query['sql'] for query in queries.captured_queries),
+                    )
+                    self.assertLess(elapsed, self.MAX_SECONDS)
+
+    def test_writes_stay_within_query_budget(self):
+        for user in (self.owner, self.staff[0]):
+            self.client.force_login(user)
+            for name, kwargs, data, ajax, budget, status in self.write_budgets():
+                with self.subTest(view=name, kwargs=kwargs, role=user.role):
+                    reports.report_cache.clear()
+                    price_book.clear()
+                    category_tree.clear()
+                    headers = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'} if ajax else {}
+                    # Rolled back, so each write sees the same data
+                    with transaction.atomic():
+                        started = time.perf_counter()
+                        with CaptureQueriesContext(connection) as queries:
+                            response = self.client.post(reverse(name, kwargs=kwargs), data, **headers)
+                        elapsed = time.perf_counter() - started
+                        transaction.set_rollback(True)
+                    self.assertStatus(response, status, user.role)
+                    self.assertLessEqual(
+                        len(queries), budget,
+                        '\n'.join(query['sql'] for query in queries.captured_queries),
+                    )
+                    self.assertLess(elapsed, self.MAX_SECONDS)
+
+
+class BenchmarkTestCase(TestCase):
+    def test_seed_is_deterministic_and_consistent(self):
+        sizes = dict(categories=2, subcategories=2, purchases=40, items=200, years=1, staff=2, discounts=5, batch_size=16)
+        counts = benchmark.seed(**sizes)
+        self.assertEqual((counts['purchases'], InvoiceItem.objects.count()), (40, 200))
+        self.assertEqual(Discount.objects.count(), 5)
+        # Counters were rebuilt from the items, and nothing sells before it was bought
+        self.assertEqual(stock.reconcile(dry_run=True), [])
+        self.assertFalse(InvoiceItem.objects.filter(purchase__date__gt=F('invoice__date')).exists())
+        first = list(InvoiceItem.objects.order_by('invoice__bill_number', 'pk').values_list('purchase__product_name', 'quantity'))
+
+        with self.assertRaises(benchmark.BenchmarkError):
+            benchmark.seed(**sizes)
+        Invoice.objects.all().delete()
+        Category.objects.filter(name__startswith=benchmark.CATEGORY_PREFIX).delete()
+        CustomUser.objects.filter(username__startswith='bench_').delete()
+        benchmark.seed(**sizes)
+        again = list(InvoiceItem.objects.order_by('invoice__bill_number', 'pk').values_list('purchase__product_name', 'quantity'))
+        self.assertEqual(again, first)
+
+    def test_bench_views_reports_latency_and_queries(self):
+        benchmark.seed(categories=1, subcategories=1, purchases=5, items=20, years=1, staff=1, discounts=1)
+        out = StringIO()
+        call_command('bench_views', repeat=2, views='owner_dashboard,invoice_list', stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual(set(results['views']), {'owner_dashboard', 'invoice_list'})
+        for view in results['views'].values():
+            self.assertEqual(view['status'], 200)
+            self.assertLessEqual(view['p50_ms'], view['p95_ms'])
+            self.assertGreater(view['queries'], 0)
+        self.assertGreater(results['peak_rss_mb'], 0)
+        # Platforms without the resource module (Windows) and without psutil
+        with mock.patch.dict(sys.modules, {'resource': None, 'psutil': None}):
+            self.assertIsNone(benchmark._peak_rss_mb())
+
+    def test_bench_checkout_refuses_a_shop_database(self):
+        benchmark.seed(categories=1, subcategories=1, purchases=5, items=20, years=1, staff=1, discounts=1)
+        invoices = Invoice.objects.count()
+        with self.assertRaisesMessage(CommandError, '--confirm'):
+            call_command('bench_checkout', terminals=1, invoices=1, stdout=StringIO())
+        self.assertEqual(Invoice.objects.count(), invoices)
+
+
+class SqliteConcurrencyTestCase(TransactionTestCase):
+    def test_backend_uses_wal_and_takes_the_write_lock_up_front(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = f'{directory}/shop.sqlite3'
+        wrapper = ConcurrentSqliteWrapper(dict(connection.settings_dict, NAME=path), alias='concurrency')
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+        wrapper.begin_immediate = True
+        wrapper.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+        # No statement has run yet, but another writer is already locked out
+        other = sqlite3.connect(path, timeout=0)
+        self.addCleanup(other.close)
+        with self.assertRaisesMessage(sqlite3.OperationalError, 'database is locked'):
+            other.execute('BEGIN IMMEDIATE')
+        wrapper.rollback()
+        wrapper.set_autocommit(True)
+
+    @mock.patch('user.writes.time.sleep')
+    def test_busy_errors_are_retried_only_outside_transactions(self, sleep):
+        calls = []
+
+        @writes.retry_on_busy
+        def write(error):
+            calls.append(error)
+            if len(calls) < 3:
+                raise OperationalError(error)
+            return 'written'
+
+        self.assertEqual(write('database is locked'), 'written')
+        self.assertEqual((len(calls), sleep.call_count), (3, 2))
+        with override_settings(SQLITE_CONCURRENCY={'RETRIES': 1}):
+            calls.clear()
+            with self.assertRaises(OperationalError):
+                write('database is locked')
+            self.assertEqual(len(calls), 2)
+
+        calls.clear()
+        with self.assertRaises(OperationalError), transaction.atomic():
+            write('database is locked')
+        with self.assertRaises(OperationalError):
+            write('no such table: user_purchase')
+        self.assertEqual(len(calls), 2)
+
+
+class ReportSnapshotTestCase(TransactionTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = Path(directory) / 'report_snapshot.sqlite3'
+        patcher = mock.patch.object(snapshots, 'path', return_value=self.path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_take_writes_a_read_only_copy(self):
+        Category.objects.create(name='Snapshot Rice')
+        snapshot = snapshots.take()
+        self.assertEqual(snapshots.latest(), snapshot)
+        self.assertEqual(snapshot.size, self.path.stat().st_size)
+
+        copy = sqlite3.connect(f'{self.path.as_uri()}?mode=ro', uri=True)
+        self.addCleanup(copy.close)
+        self.assertEqual(copy.execute('PRAGMA journal_mode').fetchone()[0], 'delete')
+        self.assertEqual(copy.execute("SELECT name FROM user_category WHERE name = 'Snapshot Rice'").fetchall(), [('Snapshot Rice',)])
+        with self.assertRaisesMessage(sqlite3.OperationalError, 'readonly'):
+            copy.execute("DELETE FROM user_category")
+
+        # A copy older than MAX_AGE is ignored
+        ReportSnapshot.objects.update(taken_at=timezone.now() - timedelta(hours=1))
+        self.assertIsNone(snapshots.latest())
+        with self.assertRaises(snapshots.SnapshotError), transaction.atomic():
+            snapshots.take()
+
+    def test_report_views_read_the_snapshot_unless_opted_out(self):
+        self.path.touch()
+        snapshot = ReportSnapshot.objects.create()
+        read_from = []
+
+        @snapshots.use_snapshot
+        def shop_report(request):
+            read_from.append((request.report_snapshot, Purchase.objects.all().db, router.db_for_write(Purchase)))
+            with snapshots.live():
+                read_from.append(Category.objects.all().db)
+
+        factory = RequestFactory()
+        shop_report(factory.get('/'))
+        self.assertEqual(read_from, [(snapshot, 'snapshot', 'default'), 'default'])
+        self.assertEqual(Purchase.objects.all().db, 'default')
+
+        read_from.clear()
+        shop_report(factory.get('/', {'live': '1'}))
+        with override_settings(REPORT_SNAPSHOT={'LIVE_VIEWS': ['shop_report']}):
+            shop_report(factory.get('/'))
+        self.assertEqual(read_from, [(None, 'default', 'default'), 'default'] * 2)
+        self.assertFalse(router.allow_migrate('snapshot', 'user'))
+
@@ -32,6 +32,7 @@ urlpatterns = [
     path('purchases/edit/<int:pk>/', views.edit_purchase, name='edit_purchase'),
     path('purchases/delete/<int:pk>/', views.delete_purchase, name='delete_purchase'),
     path('purchases/remove/<int:pk>/', views.remove_purchase, name='remove_purchase'),
+    path('purchases/import/', views.import_catalog, name='import_catalog'),
 
     # Product management URLs
     path('products/', views.list_products, name='list_products'),
@@ -45,6 +46,8 @@ urlpatterns = [
     path("stock-report/", views.stock_report, name="stock_report"),
     path("stock/update/<int:purchase_id>/", views.update_stock, name="update_stock"),
     path("purchase-history/", views.purchase_history, name="purchase_history"),
+    path("reorder/", views.reorder_suggestions, name="reorder_suggestions"),
+    path("export/<slug:table>/", views.export_table, name="export_table"),
     
     # Shop report URL
     path("dashboard/shop_report/", views.shop_report, name="shop_report"),
@@ -55,6 +58,7 @@ urlpatterns = [
     path("billing/add/", views.add_billing, name="add_billing"),
     path("billing/<int:invoice_id>/", views.invoice_view, name="invoice_view"),
     path("billing/<int:invoice_id>/print/", views.print_invoice, name="print_invoice"),
+    path("billing/pdfs/", views.invoice_pdf_batch, name="invoice_pdf_batch"),
     path("billing/<int:invoice_id>/delete/", views.delete_invoice, name="delete_invoice"),
     path("billing/list/", views.billing_list, name="billing_list"),
     path("billing/list-billing/", views.list_billing, name="list_billing"),
@@ -69,7 +73,13 @@ urlpatterns = [
     path("ajax/load-subcategories/", views.load_subcategories, name="load_subcategories"),
     path("ajax/load-products/", views.load_products, name="load_products"),
     path("ajax/get-product-details/", views.get_product_details, name="get_product_details"),
+    path("ajax/search-products/", views.search_products, name="search_products"),
+    path("ajax/catalog/", views.api_catalog, name="api_catalog"),
 
     # API endpoints for dashboard
     path("api/dashboard-data/", views.api_dashboard_data, name="api_dashboard_data"),
+    path("api/reorder-suggestions/", views.api_reorder_suggestions, name="api_reorder_suggestions"),
+    path("reports/jobs/<slug:kind>/submit/", views.submit_report_job, name="submit_report_job"),
+    path("reports/jobs/<int:job_id>/", views.report_job_status, name="report_job_status"),
+    path("reports/jobs/<int:job_id>/result/", views.report_job_result, name="report_job_result"),
 ]
\ No newline at end of file
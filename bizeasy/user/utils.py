@@ -0,0 +1,30 @@
+"""
+Shared helpers for the Bizeasy application.
+Small utilities used by the reporting and maintenance modules.
+"""
+
+# Django imports
+from django.db import models
+from django.db.models import Q
+
+
+_date_field = models.DateField()
+
+
+def as_date(value):
+    """Coerce a date, datetime or ISO date string to a ``date``."""
+    if value in (None, ''):
+        return None
+    return _date_field.to_python(value)
+
+
+def date_filter(field, dates=None, from_date=None, to_date=None):
+    """Build a Q object restricting ``field`` to a set of days and/or a range."""
+    condition = Q()
+    if dates is not None:
+        condition &= Q(**{f'{field}__in': dates})
+    if from_date:
+        condition &= Q(**{f'{field}__gte': from_date})
+    if to_date:
+        condition &= Q(**{f'{field}__lte': to_date})
+    return condition
@@ -0,0 +1,53 @@
+"""
+Data versioning module for the Bizeasy application.
+Per-scope change counters used to key caches of derived data.
+"""
+
+# Django imports
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+# Local imports
+from .models import DataVersion
+
+
+# Everything the shop report reads: invoices, purchases, categories and staff
+REPORTS = 'reports'
+
+# Category and subcategory names, for the in-process category tree
+CATEGORIES = 'categories'
+
+# Selling prices and discounts, for the in-process price book
+PRICES = 'prices'
+
+
+def current(scope):
+    """Return the scope's version, 0 if it has never been bumped."""
+    version = DataVersion._default_manager.filter(scope=scope).values_list('version', flat=True).first()
+    return version or 0
+
+
+def stamp(scope):
+    """Return ``(version, updated_at)`` for the scope, ``(0, None)`` if never
+    bumped. Unlike the bare version it also changes if a transaction that
+    bumped the scope rolled back and another bump reused the number.
+    """
+    return DataVersion._default_manager.filter(scope=scope).values_list('version', 'updated_at').first() or (0, None)
+
+
+def bump(scope):
+    """Increment the scope's version (one UPDATE once the row exists)."""
+    updated = DataVersion._default_manager.filter(scope=scope).update(
+        version=F('version') + 1, updated_at=timezone.now()
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            DataVersion._default_manager.create(scope=scope, version=1)
+    except IntegrityError:
+        # Another worker created it first
+        DataVersion._default_manager.filter(scope=scope).update(
+            version=F('version') + 1, updated_at=timezone.now()
+        )
@@ -8,28 +8,42 @@ import json
 import datetime
 from decimal import Decimal
 from datetime import timedelta
+from urllib.parse import urlencode
 
 # Django imports
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.db.models import Sum, F, Q, Case, When, Value, DecimalField, IntegerField, ExpressionWrapper, FloatField
+from django.db.models import Avg, Count, Sum, F, Q, Case, When, Value, DecimalField, IntegerField, ExpressionWrapper, FloatField
 from django.db.models.functions import Coalesce
 import html
 import re
 
 from django.utils import timezone
 from django.urls import reverse
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseNotModified, JsonResponse
 from django.contrib.auth.decorators import user_passes_test
+from django.core.paginator import Paginator
+from django.core.exceptions import ValidationError
+from django.views.decorators.gzip import gzip_page
 
 # Local imports
-from .models import CustomUser, Category, SubCategory, Purchase, Product, Invoice, InvoiceItem, Discount
+from .models import CustomUser, Category, SubCategory, Purchase, Product, Invoice, InvoiceItem, Discount, ReportJob
 from .forms import CategoryForm, SubCategoryForm, PurchaseForm, PurchaseEditForm, InvoiceForm, InvoiceItemForm, StaffForm, sanitize_input
+from . import catalog, checkout, cube, discounts, expiry, exports, importer, invoice_batch, jobs, ledger, money, pagination, pricing, reorder, reports, search, snapshots, stock, writes
+from .categories import category_tree
+from .money import MoneyField
 
 
 
+# Number of rows per page on the discount listing
+DISCOUNTS_PER_PAGE = 50
+
+# Row errors listed on the catalog import page
+MAX_IMPORT_ERRORS = 200
+
+
 # ==============================================================================
 # Authentication Views
 # ==============================================================================
@@ -94,29 +108,24 @@ def staff_dashboard(request):
 
 @login_required
 @user_passes_test(lambda u: hasattr(u, 'role') and getattr(u, 'role', '') == 'owner')
+@snapshots.use_snapshot
 def owner_dashboard(request):
     """Render the owner dashboard with comprehensive business metrics."""
-    # Calculate totals
-    total_income = Invoice._default_manager.aggregate(Sum('total'))['total__sum'] or Decimal('0.00')
-    total_expenses = Purchase._default_manager.aggregate(Sum('total_rate'))['total_rate__sum'] or Decimal('0.00')
-    
-    # Ensure both are Decimal
-    total_income = Decimal(str(total_income)) if total_income is not None else Decimal('0.00')
-    total_expenses = Decimal(str(total_expenses)) if total_expenses is not None else Decimal('0.00')
+    # Calculate totals from the daily ledger
+    today = timezone.now().date()
+    six_months_ago = today - timedelta(days=180)
+    overall = ledger.totals()
+    previous = ledger.totals(to_date=six_months_ago - timedelta(days=1))
+
+    total_income = overall['income']
+    total_expenses = overall['expense']
     
     # Calculate net profit
     net_profit = total_income - total_expenses
 
-    # Calculate percentage changes (previous period: same duration before current period)
-    today = timezone.now().date()
-    six_months_ago = today - timedelta(days=180)
-    prev_income = Invoice._default_manager.filter(date__lt=six_months_ago).aggregate(Sum('total'))['total__sum'] or Decimal('0.00')
-    prev_expenses = Purchase._default_manager.filter(date__lt=six_months_ago).aggregate(Sum('total_rate'))['total_rate__sum'] or Decimal('0.00')
-    
-    # Ensure Decimal for previous period
-    prev_income = Decimal(str(prev_income)) if prev_income is not None else Decimal('0.00')
-    prev_expenses = Decimal(str(prev_expenses)) if prev_expenses is not None else Decimal('0.00')
-    
+    # Previous period: everything before the last six months
+    prev_income = previous['income']
+    prev_expenses = previous['expense']
     prev_profit = prev_income - prev_expenses
 
     # Calculate percentage changes
@@ -133,30 +142,36 @@ def owner_dashboard(request):
         if prev_profit != Decimal('0.00') else Decimal('0.00')
     )
 
-    # Chart data for last 6 months
+    # Chart data for last 6 months (one ledger range scan)
+    months = []
+    for i in range(5, -1, -1):
+        month_start = (today - timedelta(days=30 * i)).replace(day=1)
+        months.append((month_start, month_start + timedelta(days=30)))
+    daily = ledger.daily_rows(months[0][0], months[-1][1])
+
     chart_labels = []
     income_data = []
     expense_data = []
-    for i in range(5, -1, -1):
-        month_start = (today - timedelta(days=30 * i)).replace(day=1)
-        month_end = month_start + timedelta(days=30)
+    for month_start, month_end in months:
         chart_labels.append(month_start.strftime('%b %Y'))
-        month_income = Invoice._default_manager.filter(date__range=(month_start, month_end)).aggregate(Sum('total'))['total__sum'] or Decimal('0.00')
-        month_expense = Purchase._default_manager.filter(date__range=(month_start, month_end)).aggregate(Sum('total_rate'))['total_rate__sum'] or Decimal('0.00')
-        income_data.append(float(Decimal(str(month_income))))
-        expense_data.append(float(Decimal(str(month_expense))))
+        month_income, month_expense = ledger.bucket_total(daily, month_start, month_end)
+        income_data.append(float(month_income))
+        expense_data.append(float(month_expense))
 
     # Category sales data
     category_labels = []
     category_data = []
-    for category in Category._default_manager.all():
+    category_totals = cube.category_totals()
+    for category in category_tree.categories():
         category_labels.append(category.name)
-        category_total = InvoiceItem._default_manager.filter(purchase__category=category).aggregate(Sum('total'))['total__sum'] or Decimal('0.00')
-        category_data.append(float(Decimal(str(category_total))))
+        category_data.append(float(category_totals.get(category.pk, Decimal('0.00'))))
 
     # Recent transactions and purchases
     recent_transactions = Invoice._default_manager.order_by('-date')[:5]
-    recent_purchases = Purchase._default_manager.order_by('-date')[:5]
+    recent_purchases = Purchase._default_manager.select_related('category').order_by('-date')[:5]
+
+    # Near-expiry stock per category, precomputed daily
+    expiry_alerts = expiry.latest_alerts()
 
     context = {
         'total_income': float(total_income),
@@ -172,6 +187,7 @@ def owner_dashboard(request):
         'category_data': json.dumps(category_data),
         'recent_transactions': recent_transactions,
         'recent_purchases': recent_purchases,
+        'expiry_alerts': expiry_alerts,
     }
 
     return render(request, 'owner_dashboard.html', context)
@@ -234,10 +250,9 @@ def add_subcategory(request):
 def list_category(request):
     """List all categories with optional search."""
     query = request.GET.get('q')
+    categories = category_tree.categories()
     if query:
-        categories = Category._default_manager.filter(name__icontains=query)
-    else:
-        categories = Category._default_manager.all()
+        categories = [category for category in categories if query.lower() in category.name.lower()]
 
     return render(request, 'list_category.html', {'categories': categories})
 
@@ -245,10 +260,9 @@ def list_category(request):
 def list_subcategory(request):
     """List all subcategories with optional search."""
     query = request.GET.get('q')
+    subcategories = category_tree.subcategories()
     if query:
-        subcategories = SubCategory._default_manager.filter(name__icontains=query)
-    else:
-        subcategories = SubCategory._default_manager.all()
+        subcategories = [subcategory for subcategory in subcategories if query.lower() in subcategory.name.lower()]
     return render(request, 'list_subcategory.html', {'subcategories': subcategories})
 
 
@@ -258,7 +272,7 @@ def list_purchases(request):
     category_filter = request.GET.get('category', '')
 
     # Only show non-deleted purchases in the list that are NOT stock update entries
-    purchases = Purchase._default_manager.filter(is_deleted=False).exclude(notes__icontains='Stock update entry')
+    purchases = Purchase._default_manager.filter(is_deleted=False, kind=Purchase.KIND_PURCHASE)
 
     # Apply category filter
     if category_filter:
@@ -266,31 +280,74 @@ def list_purchases(request):
 
     # Apply search filter
     if query:
-        purchases = purchases.filter(
-            Q(product_name__icontains=query) |
-            Q(notes__icontains=query) |
-            Q(category__name__icontains=query) |
-            Q(subcategory__name__icontains=query) |
-            Q(date__icontains=query) |
-            Q(expire_date__icontains=query)
-        )
+        purchases = search.filter_purchases(purchases, query, columns=search.ALL_COLUMNS)
 
-    # Calculate totals
-    total_quantity = sum(purchase.quantity for purchase in purchases)
-    total_value = sum(purchase.total_rate for purchase in purchases)
+    # Calculate totals in the database
+    totals = purchases.aggregate(
+        total_count=Count('id'),
+        total_quantity=Coalesce(Sum('quantity'), Value(0)),
+        total_value=Coalesce(Sum('total_rate'), Value(0), output_field=MoneyField()),
+    )
+    page = pagination.paginate(purchases.select_related('category', 'subcategory'), request.GET)
+
+    if request.GET.get('format') == 'json':
+        return pagination.json_page(
+            page, _purchase_json, **dict(totals, total_value=money.number(totals['total_value']))
+        )
 
-    categories = Category._default_manager.all()
+    categories = category_tree.categories()
 
     return render(request, 'list_purchase.html', {
-        'purchases': purchases,
-        'total_quantity': total_quantity,
-        'total_value': total_value,
+        'purchases': page.object_list,
+        'page': page,
+        'total_count': totals['total_count'],
+        'total_quantity': totals['total_quantity'],
+        'total_value': totals['total_value'],
         'categories': categories,
         'query': query,
         'category_filter': category_filter,
     })
 
 
+def _catalogue_prices(purchases):
+    """Show the catalogue price (latest selling price less today's discount)
+    for the purchases that have a product, resolved in bulk by the price book."""
+    prices = pricing.price_book.resolve_purchases([purchase.pk for purchase in purchases])
+    for purchase in purchases:
+        entry = prices.get(purchase.pk)
+        if entry is not None:
+            purchase.final_price = entry.final_price
+            purchase.discount_percentage = float(entry.discount.discount_percent) if entry.discount else 0
+    return purchases
+
+
+def _product_json(purchase):
+    """Serialize an annotated product row for the JSON listing endpoints."""
+    return dict(
+        _purchase_json(purchase),
+        final_price=money.number(purchase.final_price),
+        discount_percentage=purchase.discount_percentage,
+    )
+
+
+def _purchase_json(purchase):
+    """Serialize a purchase row for the JSON listing endpoints."""
+    return {
+        'id': purchase.id,
+        'product_name': purchase.product_name,
+        'category': purchase.category.name,
+        'subcategory': purchase.subcategory.name,
+        'quantity': purchase.quantity,
+        'product_rate': money.number(purchase.product_rate),
+        'total_rate': money.number(purchase.total_rate),
+        'mrp': money.number(purchase.mrp),
+        'sale_rate': money.number(purchase.sale_rate),
+        'expire_date': purchase.expire_date,
+        'date': purchase.date,
+        'is_deleted': purchase.is_deleted,
+    }
+
+
 def edit_subcategory(request, pk):
     """Edit an existing subcategory."""
     subcategory = get_object_or_404(SubCategory, pk=pk)
@@ -324,12 +381,9 @@ def add_purchase(request):
     else:
         form = PurchaseForm()
 
-    categories = Category._default_manager.all()
-    subcategories = SubCategory._default_manager.all()
-    subcategories_json = [
-        {'id': str(getattr(s, 'id', '')), 'name': getattr(s, 'name', ''), 'category_id': str(getattr(getattr(s, 'category', None), 'id', '') if hasattr(s, 'category') else '')}
-        for s in subcategories
-    ]
+    categories = category_tree.categories()
+    subcategories = category_tree.subcategories()
+    subcategories_json = category_tree.subcategories_json()
 
     return render(request, 'add_purchase.html', {
         'form': form,
@@ -339,11 +393,41 @@ def add_purchase(request):
     })
 
 
+@login_required
+@user_passes_test(lambda u: hasattr(u, 'role') and getattr(u, 'role', '') == 'owner')
+def import_catalog(request):
+    """Upload a CSV or XLSX supplier list of purchases.
+
+    Every row is validated first; if any has an error nothing is imported
+    and the errors are listed by line.
+    """
+    context = {'columns': importer.REQUIRED_COLUMNS + importer.OPTIONAL_COLUMNS}
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        dry_run = bool(request.POST.get('dry_run'))
+        try:
+            if upload is None:
+                raise importer.CatalogImportError('Choose a CSV or XLSX file to import')
+            result = importer.import_file(upload, importer.detect_format(upload.name), dry_run=dry_run)
+        except importer.CatalogImportError as e:
+            messages.error(request, str(e))
+            return render(request, 'import_catalog.html', context, status=400)
+        if result.errors:
+            messages.error(request, f'{len(result.errors)} errors in {result.rows} rows; nothing was imported.')
+        elif dry_run:
+            messages.success(request, f'All {result.rows} rows are valid. Untick "Check only" to import them.')
+        else:
+            messages.success(request, f'Imported {result.purchases} purchases, {result.categories} new categories and {result.subcategories} new subcategories.')
+            return redirect('list_purchases')
+        context.update({'result': result, 'errors': result.errors[:MAX_IMPORT_ERRORS]})
+    return render(request, 'import_catalog.html', context)
+
+
 def get_subcategories_by_category(request):
     """AJAX endpoint to get subcategories for a given category."""
     category_id = request.GET.get('category_id')
-    subcategories = SubCategory._default_manager.filter(category_id=category_id).values('id', 'name')
-    return JsonResponse(list(subcategories), safe=False)
+    subcategories = category_tree.subcategories(category_id)
+    return JsonResponse([{'id': subcategory.id, 'name': subcategory.name} for subcategory in subcategories], safe=False)
 
 
 def edit_purchase(request, pk):
@@ -359,12 +443,9 @@ def edit_purchase(request, pk):
     else:
         form = PurchaseForm(instance=purchase)
     
-    categories = Category._default_manager.all()
-    subcategories = SubCategory._default_manager.all()
-    subcategories_json = [
-        {'id': str(getattr(s, 'id', '')), 'name': getattr(s, 'name', ''), 'category_id': str(getattr(getattr(s, 'category', None), 'id', '') if hasattr(s, 'category') else '')}
-        for s in subcategories
-    ]
+    categories = category_tree.categories()
+    subcategories = category_tree.subcategories()
+    subcategories_json = category_tree.subcategories_json()
     
     return render(request, 'edit_purchase.html', {
         'form': form,
@@ -416,36 +497,41 @@ def list_products_staff(request):
     """List products for staff users."""
     # Base queryset with related objects to avoid N+1 queries
     # Only show non-deleted purchases that are NOT stock update entries
-    purchases = Purchase._default_manager.select_related('category', 'subcategory').filter(is_deleted=False).exclude(notes__icontains='Stock update entry')
+    purchases = Purchase._default_manager.select_related('category', 'subcategory').filter(is_deleted=False, kind=Purchase.KIND_PURCHASE)
 
     # Search filter
     q = request.GET.get('q', '').strip()
     if q:
-        purchases = purchases.filter(
-            Q(product_name__icontains=q) |
-            Q(category__name__icontains=q) |
-            Q(subcategory__name__icontains=q)
-        )
+        purchases = search.filter_purchases(purchases, q)
 
     # Annotate final_price and discount_percentage
     purchases = purchases.annotate(
         final_price=Case(
             When(sale_rate__isnull=False, then='sale_rate'),
             default='mrp',
-            output_field=FloatField()
+            output_field=MoneyField()
         ),
         discount_percentage=Case(
             When(sale_rate__isnull=False, mrp__gt=0, then=ExpressionWrapper(
-                ((F('mrp') - F('sale_rate')) / F('mrp')) * 100,
+                # Multiply by 100.0 first so the paise division is not an integer one
+                (F('mrp') - F('sale_rate')) * Value(100.0) / F('mrp'),
                 output_field=FloatField()
             )),
             default=Value(0),
             output_field=FloatField()
         )
-    ).order_by('-date')
+    )
+    total_count = purchases.count()
+    page = pagination.paginate(purchases, request.GET)
+    _catalogue_prices(page.object_list)
+
+    if request.GET.get('format') == 'json':
+        return pagination.json_page(page, _product_json, total_count=total_count)
 
     context = {
-        'purchases': purchases,
+        'purchases': page.object_list,
+        'page': page,
+        'total_count': total_count,
         'search_query': q,
     }
     return render(request, 'list_products_staff.html', context)
@@ -456,36 +542,41 @@ def list_products(request):
     """List products for authenticated users."""
     # Base queryset with related objects to avoid N+1 queries
     # Only show non-deleted purchases that are NOT stock update entries
-    purchases = Purchase._default_manager.select_related('category', 'subcategory').filter(is_deleted=False).exclude(notes__icontains='Stock update entry')
+    purchases = Purchase._default_manager.select_related('category', 'subcategory').filter(is_deleted=False, kind=Purchase.KIND_PURCHASE)
 
     # Search filter
     q = request.GET.get('q', '').strip()
     if q:
-        purchases = purchases.filter(
-            Q(product_name__icontains=q) |
-            Q(category__name__icontains=q) |
-            Q(subcategory__name__icontains=q)
-        )
+        purchases = search.filter_purchases(purchases, q)
 
     # Annotate final_price and discount_percentage
     purchases = purchases.annotate(
         final_price=Case(
             When(sale_rate__isnull=False, then='sale_rate'),
             default='mrp',
-            output_field=FloatField()
+            output_field=MoneyField()
         ),
         discount_percentage=Case(
             When(sale_rate__isnull=False, mrp__gt=0, then=ExpressionWrapper(
-                ((F('mrp') - F('sale_rate')) / F('mrp')) * 100,
+                # Multiply by 100.0 first so the paise division is not an integer one
+                (F('mrp') - F('sale_rate')) * Value(100.0) / F('mrp'),
                 output_field=FloatField()
             )),
             default=Value(0),
             output_field=FloatField()
         )
-    ).order_by('-date')
+    )
+    total_count = purchases.count()
+    page = pagination.paginate(purchases, request.GET)
+    _catalogue_prices(page.object_list)
+
+    if request.GET.get('format') == 'json':
+        return pagination.json_page(page, _product_json, total_count=total_count)
 
     context = {
-        'purchases': purchases,
+        'purchases': page.object_list,
+        'page': page,
+        'total_count': total_count,
         'search_query': q,
     }
     return render(request, 'list_products.html', context)
@@ -499,277 +590,36 @@ def view_discount(request):
     from_date = request.GET.get('from_date', '')
     to_date = request.GET.get('to_date', '')
     
-    # Get all purchases that have associated products with discounts
-    # This includes both current discounts and upcoming discounts
-    # First get all purchases with MRP
-    all_purchases = Purchase._default_manager.select_related('category', 'subcategory').filter(
-        mrp__isnull=False,
-        mrp__gt=0
-    ).order_by('-date')
-    
-    # Filter to only show products with discounts (either existing sale_rate discounts or discount records)
-    purchases = []
-    for purchase in all_purchases:
-        # Check if this purchase has an associated product with a discount record
-        try:
-            product = Product._default_manager.get(purchase=purchase)
-            # If product has any discount records, include this purchase
-            if Discount._default_manager.filter(product=product).exists():
-                purchases.append(purchase)
-                continue
-        except Exception:
-            # If no product exists, check for sale_rate based discounts
-            pass
-        
-        # Also include purchases with existing sale_rate discounts
-        if (purchase.sale_rate is not None and 
-            purchase.mrp is not None and 
-            abs(float(purchase.sale_rate or 0) - float(purchase.mrp or 0)) > 0.01):
-            purchases.append(purchase)
+    # Invalid dates are ignored, matching the filter form's behaviour
+    try:
+        from_date_obj = datetime.datetime.strptime(from_date, '%Y-%m-%d').date() if from_date else None
+    except ValueError:
+        from_date_obj = None
+    try:
+        to_date_obj = datetime.datetime.strptime(to_date, '%Y-%m-%d').date() if to_date else None
+    except ValueError:
+        to_date_obj = None
     
-    # For further processing, we need to work with the original queryset
-    # So we'll process the filtering in Python rather than in the database
-    discounted_purchases = []
-    total_discount = 0
-    count = 0
+    # Discount, status, final price and date filters are all resolved in SQL
+    discounted = discounts.discounted_purchases(status_filter, from_date_obj, to_date_obj)
     
-    print(f"Found {len(purchases)} purchases with discounts")
+    # Calculate average discount (only for purchases with discounts)
+    average_discount = discounted.aggregate(
+        average=Avg('discount_percent', filter=Q(discount_percent__gt=0))
+    )['average'] or 0
     
-    # Get today's date for filtering
-    today = timezone.now().date()
+    paginator = Paginator(discounted, DISCOUNTS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
     
-    for purchase in purchases:
-        # Initialize default values for all purchases
-        if not hasattr(purchase, 'discount_percent'):
-            purchase.discount_percent = 0
-        if not hasattr(purchase, 'discount_percentage'):
-            purchase.discount_percentage = 0
-        if not hasattr(purchase, 'start_date'):
-            purchase.start_date = None
-        if not hasattr(purchase, 'end_date'):
-            purchase.end_date = None
-        if not hasattr(purchase, 'is_active'):
-            purchase.is_active = False
-        if not hasattr(purchase, 'final_price'):
-            purchase.final_price = purchase.mrp
-        if not hasattr(purchase, 'status'):
-            purchase.status = None
-        
-        # Get the Product associated with this Purchase
-        try:
-            product = Product._default_manager.get(purchase=purchase)
-            print(f"Found product: {product.name} for purchase: {purchase.product_name}")
-            
-            # Get discount info for that product
-            discount_info = product.get_discount_info()
-            print(f"Discount info for {product.name}: {discount_info}")
-            
-            # Also get the actual discount object to access status
-            try:
-                discount_obj = Discount._default_manager.get(product=product)
-                # Add discount info to purchase object for template use
-                purchase.discount_percent = discount_info['percent']
-                purchase.discount_percentage = discount_info['percent']  # For template compatibility
-                purchase.start_date = discount_info['start_date']
-                purchase.end_date = discount_info['end_date']
-                purchase.is_active = discount_info['is_active']
-                purchase.final_price = product.get_final_price() or purchase.mrp
-                purchase.status = discount_obj.status  # Add status to purchase object
-                print(f"Set purchase start_date: {purchase.start_date}, end_date: {purchase.end_date}, status: {purchase.status}")
-                
-                # Apply status filter if specified
-                if status_filter:
-                    # Determine actual status based on dates if needed
-                    today = timezone.now().date()
-                    actual_status = discount_obj.status
-                    
-                    # If status is not explicitly set or we need to override based on dates
-                    if discount_obj.start_date and discount_obj.end_date:
-                        if today < discount_obj.start_date:
-                            actual_status = 'pending'
-                        elif today > discount_obj.end_date:
-                            actual_status = 'rejected'  # Finished/expired
-                        else:
-                            actual_status = 'active'
-                    
-                    # Handle the "finished" filter specifically
-                    if status_filter == 'finished':
-                        # For finished, we check if status is 'rejected' or if end_date has passed
-                        if not (actual_status == 'rejected' or (discount_obj.end_date and discount_obj.end_date < today)):
-                            continue  # Skip this purchase if it doesn't match the finished criteria
-                    elif actual_status != status_filter:
-                        continue  # Skip this purchase if it doesn't match the status filter
-                else:
-                    # If no status filter is specified, only show active and pending discounts by default
-                    today = timezone.now().date()
-                    actual_status = discount_obj.status
-                    
-                    # If status is not explicitly set or we need to override based on dates
-                    if discount_obj.start_date and discount_obj.end_date:
-                        if today < discount_obj.start_date:
-                            actual_status = 'pending'
-                        elif today > discount_obj.end_date:
-                            actual_status = 'rejected'  # Finished/expired
-                        else:
-                            actual_status = 'active'
-                    
-                    # Only show active and pending discounts
-                    if actual_status not in ['active', 'pending']:
-                        continue
-                
-                # Apply date filters if specified
-                if from_date and to_date:
-                    try:
-                        from_date_obj = datetime.datetime.strptime(from_date, '%Y-%m-%d').date()
-                        to_date_obj = datetime.datetime.strptime(to_date, '%Y-%m-%d').date()
-                        # Check if either start or end date falls within the range
-                        start_in_range = discount_obj.start_date and from_date_obj <= discount_obj.start_date <= to_date_obj
-                        end_in_range = discount_obj.end_date and from_date_obj <= discount_obj.end_date <= to_date_obj
-                        if not (start_in_range or end_in_range):
-                            continue  # Skip if neither start nor end date falls within range
-                    except ValueError:
-                        pass  # Invalid date format, ignore date filter
-                elif from_date:
-                    try:
-                        from_date_obj = datetime.datetime.strptime(from_date, '%Y-%m-%d').date()
-                        # Check if both dates are before the from_date
-                        if (discount_obj.start_date and discount_obj.start_date < from_date_obj and 
-                            discount_obj.end_date and discount_obj.end_date < from_date_obj):
-                            continue  # Skip if both dates are before the from_date
-                    except ValueError:
-                        pass  # Invalid date format, ignore date filter
-                elif to_date:
-                    try:
-                        to_date_obj = datetime.datetime.strptime(to_date, '%Y-%m-%d').date()
-                        # Check if both dates are after the to_date
-                        if (discount_obj.start_date and discount_obj.start_date > to_date_obj and 
-                            discount_obj.end_date and discount_obj.end_date > to_date_obj):
-                            continue  # Skip if both dates are after the to_date
-                    except ValueError:
-                        pass  # Invalid date format, ignore date filter
-                
-                discounted_purchases.append(purchase)
-                total_discount += discount_info['percent']
-                count += 1
-                print(f"Added discounted purchase: {purchase.product_name} with {discount_info['percent']}% discount, status: {purchase.status}")
-            except Exception as e:
-                print(f"Exception getting discount object: {e}")
-                # No discount object exists, but there might be a sale_rate discount
-                if discount_info['percent'] > 0:
-                    # Add discount info to purchase object for template use
-                    purchase.discount_percent = discount_info['percent']
-                    purchase.discount_percentage = discount_info['percent']  # For template compatibility
-                    purchase.start_date = discount_info['start_date']
-                    purchase.end_date = discount_info['end_date']
-                    purchase.is_active = discount_info['is_active']
-                    purchase.final_price = product.get_final_price() or purchase.mrp
-                    # Set status based on dates for discounts without Discount object
-                    if purchase.start_date and purchase.end_date:
-                        today = timezone.now().date()
-                        if today < purchase.start_date:
-                            purchase.status = 'pending'
-                        elif today > purchase.end_date:
-                            purchase.status = 'finished'
-                        else:
-                            purchase.status = 'active'
-                    else:
-                        purchase.status = 'active' if discount_info['is_active'] else 'pending'
-                    print(f"Set purchase start_date: {purchase.start_date}, end_date: {purchase.end_date}, status: {purchase.status}")
-                    
-                    # Apply status filter if specified
-                    if status_filter:
-                        # For products without Discount object, we determine status based on dates
-                        today = timezone.now().date()
-                        product_status = 'pending'  # Default
-                        
-                        if purchase.start_date and purchase.end_date:
-                            if today < purchase.start_date:
-                                product_status = 'pending'
-                            elif today > purchase.end_date:
-                                product_status = 'finished'
-                            else:
-                                product_status = 'active'
-                        
-                        # Handle the "finished" filter specifically
-                        if status_filter == 'finished':
-                            if product_status != 'finished':
-                                continue  # Skip if not finished
-                        elif product_status != status_filter:
-                            continue  # Skip if status doesn't match
-                    else:
-                        # If no status filter is specified, only show active and pending discounts by default
-                        today = timezone.now().date()
-                        product_status = 'pending'  # Default
-                        
-                        if purchase.start_date and purchase.end_date:
-                            if today < purchase.start_date:
-                                product_status = 'pending'
-                            elif today > purchase.end_date:
-                                product_status = 'finished'
-                            else:
-                                product_status = 'active'
-                        
-                        # Only show active and pending discounts
-                        if product_status not in ['active', 'pending']:
-                            continue
-                    
-                    # Apply date filters if specified
-                    if from_date and to_date:
-                        try:
-                            from_date_obj = datetime.datetime.strptime(from_date, '%Y-%m-%d').date()
-                            to_date_obj = datetime.datetime.strptime(to_date, '%Y-%m-%d').date()
-                            # Check if either start or end date falls within the range
-                            start_in_range = purchase.start_date and from_date_obj <= purchase.start_date <= to_date_obj
-                            end_in_range = purchase.end_date and from_date_obj <= purchase.end_date <= to_date_obj
-                            if not (start_in_range or end_in_range):
-                                continue  # Skip if neither start nor end date falls within range
-                        except ValueError:
-                            pass  # Invalid date format, ignore date filter
-                    elif from_date:
-                        try:
-                            from_date_obj = datetime.datetime.strptime(from_date, '%Y-%m-%d').date()
-                            # Check if both dates are before the from_date
-                            if (purchase.start_date and purchase.start_date < from_date_obj and 
-                                purchase.end_date and purchase.end_date < from_date_obj):
-                                continue  # Skip if both dates are before the from_date
-                        except ValueError:
-                            pass  # Invalid date format, ignore date filter
-                    elif to_date:
-                        try:
-                            to_date_obj = datetime.datetime.strptime(to_date, '%Y-%m-%d').date()
-                            # Check if both dates are after the to_date
-                            if (purchase.start_date and purchase.start_date > to_date_obj and 
-                                purchase.end_date and purchase.end_date > to_date_obj):
-                                continue  # Skip if both dates are after the to_date
-                        except ValueError:
-                            pass  # Invalid date format, ignore date filter
-                    
-                    discounted_purchases.append(purchase)
-                    total_discount += discount_info['percent']
-                    count += 1
-                    print(f"Added discounted purchase: {purchase.product_name} with {discount_info['percent']}% discount")
-                # If there's no discount, we don't add the purchase to the list
-        except Exception as e:
-            # Handle any exceptions
-            if "Product matching query does not exist" in str(e):
-                # This is expected for some purchases, just log it at a lower level
-                print(f"Info: Purchase {purchase.product_name} does not have an associated Product object.")
-            else:
-                print(f"Error processing purchase {purchase.product_name}: {e}")
-            # Don't add purchases without products to the list
-
-    # Calculate average discount (only for purchases with discounts)
-    discounted_count = sum(1 for p in discounted_purchases if getattr(p, 'discount_percentage', 0) > 0)
-    discounted_total = sum(getattr(p, 'discount_percentage', 0) for p in discounted_purchases)
-    average_discount = discounted_total / discounted_count if discounted_count > 0 else 0
-    print(f"Total discounted purchases: {discounted_count}, Average discount: {average_discount}")
-
     # Determine user role for template
     user_role = getattr(request.user, 'role', 'staff')
     can_edit = user_role == 'owner'
-
+    
     context = {
-        'purchases': discounted_purchases,
+        'purchases': page_obj,
+        'page_obj': page_obj,
+        'total_count': paginator.count,
+        'filter_query': urlencode({'status': status_filter, 'from_date': from_date, 'to_date': to_date}),
         'average_discount': average_discount,
         'can_edit': can_edit,
         'user_role': user_role,
@@ -789,7 +639,7 @@ def delete_discount(request, purchase_id):
     has_discount = (purchase.sale_rate is not None and 
                    purchase.mrp is not None and 
                    purchase.mrp > 0 and 
-                   abs(float(purchase.sale_rate or 0) - float(purchase.mrp or 0)) > 0.01)
+                   purchase.sale_rate != purchase.mrp)
     
     if not has_discount:
         messages.error(request, f'Product "{purchase.product_name}" does not have an active discount.')
@@ -797,7 +647,7 @@ def delete_discount(request, purchase_id):
     
     if request.method == 'POST':
         # Remove the discount by setting sale_rate back to MRP (no discount)
-        purchase.sale_rate = float(purchase.mrp)
+        purchase.sale_rate = purchase.mrp
         purchase.save()
         
         # Also remove the discount record from the Discount model if it exists
@@ -820,6 +670,7 @@ def delete_discount(request, purchase_id):
 # Report Management Views
 # ==============================================================================
 
+@snapshots.use_snapshot
 def stock_report(request):
     """Generate stock report with filtering capabilities - exclude stock update entries."""
     # Get date range filters from request
@@ -828,40 +679,11 @@ def stock_report(request):
     category_filter = request.GET.get('category', '')
     search_query = request.GET.get('q', '').strip()
     
-    # Base purchase queryset (only non-deleted purchases that are NOT stock update entries)
-    purchases = Purchase._default_manager.filter(is_deleted=False).exclude(notes__icontains='Stock update entry')
-    
-    # Apply date filters
-    if from_date:
-        purchases = purchases.filter(date__gte=from_date)
-    if to_date:
-        purchases = purchases.filter(date__lte=to_date)
-    
-    # Apply category filter
-    if category_filter:
-        purchases = purchases.filter(category_id=category_filter)
-    
-    # Apply search filter
-    if search_query:
-        purchases = purchases.filter(
-            Q(product_name__icontains=search_query) |
-            Q(category__name__icontains=search_query) |
-            Q(subcategory__name__icontains=search_query)
-        )
+    # Non-deleted purchases (not stock update entries) with the page's filters
+    # applied, annotated with their stock levels
+    report = reports.stock_report_purchases(request.GET).select_related('category', 'subcategory').order_by('-date')
     
-    # Annotate with sales data
-    report = purchases.annotate(
-        total_purchased=F("quantity"),
-        total_sold=Coalesce(
-            Sum("invoiceitem__quantity", filter=Q(invoiceitem__invoice__date__range=[from_date, to_date]) if from_date and to_date else Q()),
-            Value(0),
-            output_field=IntegerField()
-        ),
-    ).annotate(
-        balance=F("total_purchased") - F("total_sold")
-    ).order_by('-date')
-    
-    categories = Category._default_manager.all()
+    categories = category_tree.categories()
     
     context = {
         "report": report,
@@ -883,55 +705,30 @@ def purchase_history(request):
     search_query = request.GET.get('q', '').strip()
     session_filter = request.GET.get('session', 'all')  # 'all', 'active', or 'deleted'
     
-    # Base purchase queryset - show all purchases
-    if session_filter == 'active':
-        purchases = Purchase._default_manager.filter(is_deleted=False).exclude(notes__icontains='Stock update entry').order_by('-date')
-    elif session_filter == 'deleted':
-        purchases = Purchase._default_manager.filter(is_deleted=True).exclude(notes__icontains='Stock update entry').order_by('-date')
-    else:
-        purchases = Purchase._default_manager.exclude(notes__icontains='Stock update entry').order_by('-date')
-    
-    # Apply date filters
-    if from_date:
-        purchases = purchases.filter(date__gte=from_date)
-    if to_date:
-        purchases = purchases.filter(date__lte=to_date)
+    # All purchases (active, deleted or both) with the page's filters applied
+    purchases = reports.history_purchases(request.GET)
     
-    # Apply category filter
-    if category_filter:
-        purchases = purchases.filter(category_id=category_filter)
+    # Original quantity is everything received, kept as a counter on Purchase
+    purchases = purchases.select_related('category', 'subcategory')
+    total_count = purchases.count()
+    page = pagination.paginate(purchases, request.GET)
     
-    # Apply search filter
-    if search_query:
-        purchases = purchases.filter(
-            Q(product_name__icontains=search_query) |
-            Q(category__name__icontains=search_query) |
-            Q(subcategory__name__icontains=search_query) |
-            Q(notes__icontains=search_query)
-        )
+    if request.GET.get('format') == 'json':
+        return pagination.json_page(page, lambda purchase: dict(
+            _purchase_json(purchase), original_quantity=purchase.received_quantity
+        ), total_count=total_count)
     
-    # For each purchase in history, we want to show the original quantity
-    # We'll calculate this by adding up all the quantities sold from this purchase
-    purchase_data = []
-    for purchase in purchases:
-        # Calculate total sold for this purchase
-        total_sold = InvoiceItem._default_manager.filter(purchase=purchase).aggregate(
-            total_sold=Coalesce(Sum('quantity'), Value(0))
-        )['total_sold']
-        
-        # Original quantity is current quantity + total sold
-        original_quantity = purchase.quantity + total_sold
-        
-        # Add to our data list
-        purchase_data.append({
-            'purchase': purchase,
-            'original_quantity': original_quantity
-        })
+    purchase_data = [
+        {'purchase': purchase, 'original_quantity': purchase.received_quantity}
+        for purchase in page.object_list
+    ]
     
-    categories = Category._default_manager.all()
+    categories = category_tree.categories()
     
     context = {
         "purchase_data": purchase_data,
+        "page": page,
+        "total_count": total_count,
         "categories": categories,
         "from_date": from_date or '',
         "to_date": to_date or '',
@@ -942,259 +739,52 @@ def purchase_history(request):
     return render(request, "purchase_history.html", context)
 
 
-def shop_report(request):
-    """Generate comprehensive shop report with date filtering capabilities."""
-    today = timezone.now().date()
-    
-    # Get date range filters from request
-    from_date = request.GET.get('from_date')
-    to_date = request.GET.get('to_date')
-    
-    # Base invoice queryset for filtering
-    invoice_qs = Invoice._default_manager.all()
-    if from_date and to_date:
-        invoice_qs = invoice_qs.filter(date__range=[from_date, to_date])
-    elif from_date:
-        invoice_qs = invoice_qs.filter(date__gte=from_date)
-    elif to_date:
-        invoice_qs = invoice_qs.filter(date__lte=to_date)
-
-    # --- Sales Summary ---
-    sales_summary = invoice_qs.aggregate(
-        total_sales=Coalesce(Sum("total"), Value(Decimal(0)), output_field=DecimalField()),
-        total_discount=Coalesce(Sum("discount_amount"), Value(Decimal(0)), output_field=DecimalField()),
-    )
-    
-    # Calculate net revenue
-    sales_summary['net_revenue'] = sales_summary['total_sales'] - sales_summary['total_discount']
-
-    # --- Product-wise Sales Report with Profit Calculation ---
-    product_sales_query = InvoiceItem._default_manager.filter(purchase__is_deleted=False).values(
-        "purchase__product_name", 
-        "purchase__category__name",
-        "purchase__category__id",
-        "purchase__subcategory__name",
-        "purchase__subcategory__id",
-        "purchase__product_rate",  # Cost price
-        "purchase__sale_rate"      # Selling price
-    )
-    
-    # Apply date filter to InvoiceItem via invoice__date
-    if from_date and to_date:
-        product_sales_query = product_sales_query.filter(invoice__date__range=[from_date, to_date])
-    elif from_date:
-        product_sales_query = product_sales_query.filter(invoice__date__gte=from_date)
-    elif to_date:
-        product_sales_query = product_sales_query.filter(invoice__date__lte=to_date)
-    
-    product_sales = (
-        product_sales_query.annotate(
-            total_qty=Coalesce(Sum("quantity"), Value(0), output_field=IntegerField()),
-            total_amount=Coalesce(Sum("total"), Value(Decimal(0)), output_field=DecimalField()),
-            total_cost=Coalesce(Sum(F("quantity") * F("purchase__product_rate")), Value(Decimal(0)), output_field=DecimalField()),
-            profit=Coalesce(Sum("total"), Value(Decimal(0)), output_field=DecimalField()) - 
-                   Coalesce(Sum(F("quantity") * F("purchase__product_rate")), Value(Decimal(0)), output_field=DecimalField())
-        )
-        .order_by("-profit")  # Sort by annotated profit field
-    )
-    
-    # Calculate additional metrics for each product
-    for product in product_sales:
-        if product['total_qty'] > 0:
-            product['avg_price'] = product['total_amount'] / product['total_qty']
-            product['profit_per_unit'] = product['profit'] / product['total_qty']
-        else:
-            product['avg_price'] = Decimal(0)
-            product['profit_per_unit'] = Decimal(0)
+@login_required
+@user_passes_test(lambda u: hasattr(u, 'role') and getattr(u, 'role', '') == 'owner')
+def reorder_suggestions(request):
+    """Batches to reorder, from the nightly compute_reorder_suggestions run."""
+    context = {
+        "suggestions": reorder.suggestions(request.GET),
+        "computed_on": reorder.computed_on(),
+        "status_filter": request.GET.get('status', ''),
+        "window_days": reorder.config('WINDOW_DAYS'),
+        "lead_time_days": reorder.config('LEAD_TIME_DAYS'),
+    }
+    return render(request, "reorder_suggestions.html", context)
 
-    # --- Category-wise Sales Report with Profit ---
-    category_sales_query = InvoiceItem._default_manager.filter(purchase__is_deleted=False).values("purchase__category__name", "purchase__category__id")
-    
-    # Apply date filter to InvoiceItem via invoice__date
-    if from_date and to_date:
-        category_sales_query = category_sales_query.filter(invoice__date__range=[from_date, to_date])
-    elif from_date:
-        category_sales_query = category_sales_query.filter(invoice__date__gte=from_date)
-    elif to_date:
-        category_sales_query = category_sales_query.filter(invoice__date__lte=to_date)
-    
-    category_sales = (
-        category_sales_query.annotate(
-            total_qty=Coalesce(Sum("quantity"), Value(0), output_field=IntegerField()),
-            total_amount=Coalesce(Sum("total"), Value(Decimal(0)), output_field=DecimalField()),
-            total_cost=Coalesce(Sum(F("quantity") * F("purchase__product_rate")), Value(Decimal(0)), output_field=DecimalField()),
-            profit=Coalesce(Sum("total"), Value(Decimal(0)), output_field=DecimalField()) - 
-                   Coalesce(Sum(F("quantity") * F("purchase__product_rate")), Value(Decimal(0)), output_field=DecimalField())
-        )
-        .order_by("-profit")  # Sort by annotated profit field
-    )
-    
-    # Calculate percentage of total sales for each category
-    for category in category_sales:
-        if sales_summary['total_sales'] > 0:
-            category['percentage'] = (category['total_amount'] / sales_summary['total_sales']) * 100
-        else:
-            category['percentage'] = 0
-
-    # --- Subcategory-wise Sales Report with Profit ---
-    subcategory_sales_query = InvoiceItem._default_manager.filter(purchase__is_deleted=False).values(
-        "purchase__category__name",
-        "purchase__category__id",
-        "purchase__subcategory__name",
-        "purchase__subcategory__id"
-    )
-    
-    # Apply date filter to InvoiceItem via invoice__date
-    if from_date and to_date:
-        subcategory_sales_query = subcategory_sales_query.filter(invoice__date__range=[from_date, to_date])
-    elif from_date:
-        subcategory_sales_query = subcategory_sales_query.filter(invoice__date__gte=from_date)
-    elif to_date:
-        subcategory_sales_query = subcategory_sales_query.filter(invoice__date__lte=to_date)
-    
-    subcategory_sales = (
-        subcategory_sales_query.annotate(
-            total_qty=Coalesce(Sum("quantity"), Value(0), output_field=IntegerField()),
-            total_amount=Coalesce(Sum("total"), Value(Decimal(0)), output_field=DecimalField()),
-            total_cost=Coalesce(Sum(F("quantity") * F("purchase__product_rate")), Value(Decimal(0)), output_field=DecimalField()),
-            profit=Coalesce(Sum("total"), Value(Decimal(0)), output_field=DecimalField()) - 
-                   Coalesce(Sum(F("quantity") * F("purchase__product_rate")), Value(Decimal(0)), output_field=DecimalField())
-        )
-        .order_by("-profit")  # Sort by annotated profit field
-    )
 
-    # --- Billing List ---
-    invoices = invoice_qs.annotate(
-        net_amount=F("total") - F("discount_amount")
-    ).order_by("-total")  # Sort by total amount
-
-    # --- Stock Report ---
-    # Build filter for InvoiceItem related to Purchase (only non-deleted purchases that are NOT stock update entries)
-    if from_date and to_date:
-        stock_data = Purchase._default_manager.filter(is_deleted=False).exclude(notes__icontains='Stock update entry').annotate(
-            total_purchased=F("quantity"),
-            total_sold=Coalesce(
-                Sum("invoiceitem__quantity", filter=Q(invoiceitem__invoice__date__range=[from_date, to_date])),
-                Value(0),
-                output_field=IntegerField()
-            ),
-        ).annotate(
-            balance=F("total_purchased") - F("total_sold")
-        ).order_by("balance")
-    elif from_date:
-        stock_data = Purchase._default_manager.filter(is_deleted=False).exclude(notes__icontains='Stock update entry').annotate(
-            total_purchased=F("quantity"),
-            total_sold=Coalesce(
-                Sum("invoiceitem__quantity", filter=Q(invoiceitem__invoice__date__gte=from_date)),
-                Value(0),
-                output_field=IntegerField()
-            ),
-        ).annotate(
-            balance=F("total_purchased") - F("total_sold")
-        ).order_by("balance")
-    elif to_date:
-        stock_data = Purchase._default_manager.filter(is_deleted=False).exclude(notes__icontains='Stock update entry').annotate(
-            total_purchased=F("quantity"),
-            total_sold=Coalesce(
-                Sum("invoiceitem__quantity", filter=Q(invoiceitem__invoice__date__lte=to_date)),
-                Value(0),
-                output_field=IntegerField()
-            ),
-        ).annotate(
-            balance=F("total_purchased") - F("total_sold")
-        ).order_by("balance")
-    else:
-        # No filter - show all non-deleted purchases that are NOT stock update entries
-        stock_data = Purchase._default_manager.filter(is_deleted=False).exclude(notes__icontains='Stock update entry').annotate(
-            total_purchased=F("quantity"),
-            total_sold=Coalesce(Sum("invoiceitem__quantity"), Value(0), output_field=IntegerField()),
-        ).annotate(
-            balance=F("total_purchased") - F("total_sold")
-        ).order_by("balance")
-
-    # --- Expired Purchase Report ---
-    # Get all purchases that have an expire_date (regardless of when they expire)
-    # Use select_related to optimize database queries
-    # Only show non-deleted purchases that are NOT stock update entries
-    expired_purchases_raw = Purchase._default_manager.filter(
-        expire_date__isnull=False,
-        is_deleted=False
-    ).exclude(notes__icontains='Stock update entry').select_related('category', 'subcategory').order_by('expire_date')
-    
-    # Calculate days to expiry for each purchase using current date
-    expired_purchases = []
-    current_date = timezone.now().date()
-    for purchase in expired_purchases_raw:
-        purchase_dict = {
-            'id': purchase.pk,
-            'product_name': purchase.product_name,
-            'category': purchase.category,
-            'subcategory': purchase.subcategory,
-            'date': purchase.date,
-            'expire_date': purchase.expire_date,
-            'quantity': purchase.quantity,
-            'product_rate': purchase.product_rate,
-            'total_rate': purchase.total_rate,
-            'mrp': purchase.mrp,
-            'notes': purchase.notes,
-            'change_price': purchase.change_price,
-            'sale_rate': purchase.sale_rate,
-            'is_deleted': purchase.is_deleted,
-        }
-        # Calculate days to expiry as difference between expire_date and current_date
-        if purchase.expire_date:
-            purchase_dict['days_to_expiry'] = (purchase.expire_date - current_date).days
-        else:
-            purchase_dict['days_to_expiry'] = None
-        expired_purchases.append(purchase_dict)
+@login_required
+@user_passes_test(lambda u: hasattr(u, 'role') and getattr(u, 'role', '') == 'owner')
+def api_reorder_suggestions(request):
+    """JSON version of the reorder suggestions page."""
+    return JsonResponse({
+        'computed_on': reorder.computed_on(),
+        'results': [reorder.as_json(row) for row in reorder.suggestions(request.GET)],
+    })
 
-    # --- Staff Status Report ---
-    staff_users = CustomUser.objects.filter(role='staff')
 
-    # --- Additional data for enhanced report ---
-    # Top selling products (top 5)
-    top_selling = list(product_sales[:5])
-    
-    # Highest profit products (top 5)
-    high_profit_products = sorted(
-        [p for p in product_sales if p['profit'] > 0], 
-        key=lambda x: x['profit'], 
-        reverse=True
-    )[:5]
-    
-    # Low profit products (bottom 5)
-    low_profit_products = sorted(
-        [p for p in product_sales if p['profit'] > 0], 
-        key=lambda x: x['profit']
-    )[:5]
-    
-    # Low stock alerts (balance less than 10)
-    low_stock = [item for item in stock_data if getattr(item, 'balance', 0) < 10][:5]
+@snapshots.use_snapshot
+def shop_report(request):
+    """Generate comprehensive shop report with date filtering capabilities."""
+    # Every section comes from the report engine, cached per date range
+    context = reports.shop_report_context(request.GET)
+    return render(request, "shop_report.html", context)
 
-    # Calculate overall profit metrics
-    total_cost = sum(item['total_cost'] for item in product_sales)
-    total_profit = sales_summary['net_revenue'] - total_cost
 
-    context = {
-        "today": today,
-        "stock_data": stock_data,
-        "sales_summary": sales_summary,
-        "product_sales": product_sales,
-        "category_sales": category_sales,
-        "subcategory_sales": subcategory_sales,
-        "invoices": invoices,
-        "expired_purchases": expired_purchases,
-        "staff_users": staff_users,
-        "top_selling": top_selling,
-        "high_profit_products": high_profit_products,
-        "low_profit_products": low_profit_products,
-        "low_stock": low_stock,
-        "total_cost": total_cost,
-        "total_profit": total_profit,
-        "from_date": from_date or '',
-        "to_date": to_date or '',
-    }
-    return render(request, "shop_report.html", context)
+@login_required
+def export_table(request, table):
+    """Download a report section or invoice table as CSV (default) or XLSX.
+
+    Accepts the same date, category and search filters as the report pages.
+    """
+    if table not in exports.TABLES:
+        raise Http404("Unknown export")
+    if table in exports.OWNER_TABLES and getattr(request.user, 'role', '') != 'owner':
+        return HttpResponseForbidden("Only the owner can export this table")
+    try:
+        return exports.export(request, table, request.GET.get('format', 'csv'))
+    except exports.ExportError as e:
+        return HttpResponseBadRequest(str(e))
 
 
 # ==============================================================================
@@ -1214,160 +804,102 @@ def dashboard(request):
 
 
 @login_required
+@snapshots.use_snapshot
 def api_dashboard_data(request):
     """API endpoint to provide dashboard data for charts."""
-    # Get date range parameters
-    from_date_str = request.GET.get('from_date')
-    to_date_str = request.GET.get('to_date')
-    period = request.GET.get('period', '6months')
-    
-    # Calculate date ranges
-    today = timezone.now().date()
-    
-    if from_date_str and to_date_str:
-        # Use provided date range
-        try:
-            from_date = datetime.datetime.strptime(from_date_str, '%Y-%m-%d').date()
-            to_date = datetime.datetime.strptime(to_date_str, '%Y-%m-%d').date()
-        except ValueError:
-            # If date parsing fails, fall back to default period
-            from_date = today - timedelta(days=180)
-            to_date = today
-    else:
-        # Use period-based calculation (fallback for backward compatibility)
-        if period == '7days':
-            from_date = today - timedelta(days=7)
-            to_date = today
-        elif period == '30days':
-            from_date = today - timedelta(days=30)
-            to_date = today
-        elif period == '1year':
-            from_date = today - timedelta(days=365)
-            to_date = today
-        else:  # 6months (default)
-            from_date = today - timedelta(days=180)
-            to_date = today
-    
-    # Generate chart data based on date range
-    chart_labels = []
-    income_data = []
-    expense_data = []
-    
-    # Calculate the number of days in the range
-    days_diff = (to_date - from_date).days
-    
-    if days_diff <= 31:  # Show daily data for up to 1 month
-        # Generate labels for each day
-        current_date = from_date
-        while current_date <= to_date:
-            chart_labels.append(current_date.strftime('%b %d'))
-            day_income = Invoice._default_manager.filter(date=current_date).aggregate(Sum('total'))['total__sum'] or Decimal('0.00')
-            day_expense = Purchase._default_manager.filter(date=current_date).aggregate(Sum('total_rate'))['total_rate__sum'] or Decimal('0.00')
-            income_data.append(float(Decimal(str(day_income))))
-            expense_data.append(float(Decimal(str(day_expense))))
-            current_date += timedelta(days=1)
-    elif days_diff <= 90:  # Show weekly data for up to 3 months
-        # Generate labels for weeks
-        current_date = from_date
-        week_count = 0
-        while current_date <= to_date and week_count < 12:  # Limit to 12 weeks
-            week_end = min(current_date + timedelta(days=6), to_date)
-            chart_labels.append(f'{current_date.strftime("%b %d")} - {week_end.strftime("%b %d")}')
-            week_income = Invoice._default_manager.filter(date__range=(current_date, week_end)).aggregate(Sum('total'))['total__sum'] or Decimal('0.00')
-            week_expense = Purchase._default_manager.filter(date__range=(current_date, week_end)).aggregate(Sum('total_rate'))['total_rate__sum'] or Decimal('0.00')
-            income_data.append(float(Decimal(str(week_income))))
-            expense_data.append(float(Decimal(str(week_expense))))
-            current_date += timedelta(days=7)
-            week_count += 1
-    else:  # Show monthly data for longer periods
-        # Generate labels for months
-        current_date = from_date
-        month_count = 0
-        while current_date <= to_date and month_count < 12:  # Limit to 12 months
-            # Calculate the end of the month
-            if current_date.month == 12:
-                month_end = current_date.replace(year=current_date.year + 1, month=1, day=1) - timedelta(days=1)
-            else:
-                month_end = current_date.replace(month=current_date.month + 1, day=1) - timedelta(days=1)
-            
-            # Make sure month_end doesn't exceed to_date
-            month_end = min(month_end, to_date)
-            
-            chart_labels.append(current_date.strftime('%b %Y'))
-            month_income = Invoice._default_manager.filter(date__range=(current_date, month_end)).aggregate(Sum('total'))['total__sum'] or Decimal('0.00')
-            month_expense = Purchase._default_manager.filter(date__range=(current_date, month_end)).aggregate(Sum('total_rate'))['total_rate__sum'] or Decimal('0.00')
-            income_data.append(float(Decimal(str(month_income))))
-            expense_data.append(float(Decimal(str(month_expense))))
-            
-            # Move to next month
-            if current_date.month == 12:
-                current_date = current_date.replace(year=current_date.year + 1, month=1, day=1)
-            else:
-                current_date = current_date.replace(month=current_date.month + 1, day=1)
-            month_count += 1
-    
-    # Calculate totals for the selected period
-    period_invoices = Invoice._default_manager.filter(date__range=(from_date, to_date))
-    period_purchases = Purchase._default_manager.filter(date__range=(from_date, to_date))
-    
-    total_income = period_invoices.aggregate(Sum('total'))['total__sum'] or Decimal('0.00')
-    total_expenses = period_purchases.aggregate(Sum('total_rate'))['total_rate__sum'] or Decimal('0.00')
-    net_profit = Decimal(str(total_income)) - Decimal(str(total_expenses))
-    
-    # Category sales data for the selected period
-    category_labels = []
-    category_data = []
-    for category in Category._default_manager.all():
-        category_labels.append(category.name)
-        category_total = InvoiceItem._default_manager.filter(
-            purchase__category=category,
-            invoice__date__range=(from_date, to_date)
-        ).aggregate(Sum('total'))['total__sum'] or Decimal('0.00')
-        category_data.append(float(Decimal(str(category_total))))
-    
-    # Calculate percentage changes (previous period of same duration)
-    prev_period_days = (to_date - from_date).days
-    prev_end = from_date - timedelta(days=1)
-    prev_start = prev_end - timedelta(days=prev_period_days)
-    
-    prev_invoices = Invoice._default_manager.filter(date__range=(prev_start, prev_end))
-    prev_purchases = Purchase._default_manager.filter(date__range=(prev_start, prev_end))
-    
-    prev_income = prev_invoices.aggregate(Sum('total'))['total__sum'] or Decimal('0.00')
-    prev_expenses = prev_purchases.aggregate(Sum('total_rate'))['total_rate__sum'] or Decimal('0.00')
-    prev_profit = Decimal(str(prev_income)) - Decimal(str(prev_expenses))
-    
-    # Calculate percentage changes
-    income_change = (
-        ((Decimal(str(total_income)) - Decimal(str(prev_income))) / Decimal(str(prev_income)) * Decimal('100.00'))
-        if prev_income != Decimal('0.00') else Decimal('0.00')
-    )
-    expense_change = (
-        ((Decimal(str(total_expenses)) - Decimal(str(prev_expenses))) / Decimal(str(prev_expenses)) * Decimal('100.00'))
-        if prev_expenses != Decimal('0.00') else Decimal('0.00')
-    )
-    profit_change = (
-        ((Decimal(str(net_profit)) - Decimal(str(prev_profit))) / Decimal(str(prev_profit)) * Decimal('100.00'))
-        if prev_profit != Decimal('0.00') else Decimal('0.00')
-    )
-    
-    data = {
-        'chartLabels': chart_labels,
-        'incomeData': income_data,
-        'expenseData': expense_data,
-        'categoryLabels': category_labels,
-        'categoryData': category_data,
-        'totalIncome': float(total_income),
-        'totalExpenses': float(total_expenses),
-        'netProfit': float(net_profit),
-        'incomeChange': float(income_change),
-        'expenseChange': float(expense_change),
-        'profitChange': float(profit_change),
-    }
-    
+    data = reports.dashboard_data(request.GET)
+    # When the figures come from the report snapshot, the time it was taken
+    snapshot = request.report_snapshot
+    data['snapshotTakenAt'] = snapshot.taken_at.isoformat() if snapshot else None
     return JsonResponse(data)
 
 
+# ==============================================================================
+# Background Report Jobs
+# ==============================================================================
+
+def _job_json(job):
+    return {
+        'job_id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'error': job.error,
+        'status_url': reverse('report_job_status', args=[job.pk]),
+        'result_url': reverse('report_job_result', args=[job.pk]) if job.status == ReportJob.STATUS_DONE else None,
+    }
+
+
+@login_required
+def submit_report_job(request, kind):
+    """Queue a shop/staff/dashboard report for the run_report_worker command.
+
+    Takes the same parameters as the report page (POST or GET) and returns
+    the job id; identical live requests share one job.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=400)
+    if kind in jobs.OWNER_KINDS and getattr(request.user, 'role', '') != 'owner':
+        return JsonResponse({'error': 'Only the owner can run this report'}, status=403)
+    try:
+        job = jobs.submit(kind, request.POST or request.GET, user=request.user)
+    except jobs.JobError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(_job_json(job), status=202)
+
+
+def _can_read_job(user, job):
+    """Owners may read every job; others only their own, never OWNER_KINDS."""
+    if getattr(user, 'role', '') == 'owner':
+        return True
+    return job.kind not in jobs.OWNER_KINDS and job.requested_by_id == user.pk
+
+
+@login_required
+def report_job_status(request, job_id):
+    """Poll a report job."""
+    job = get_object_or_404(ReportJob._default_manager.defer('result'), pk=job_id)
+    if not _can_read_job(request.user, job):
+        return JsonResponse({'error': 'This report job belongs to another user'}, status=403)
+    return JsonResponse(_job_json(job))
+
+
+@login_required
+def report_job_result(request, job_id):
+    """Serve a finished report job's stored result."""
+    job = get_object_or_404(ReportJob, pk=job_id)
+    if not _can_read_job(request.user, job):
+        return JsonResponse({'error': 'This report job belongs to another user'}, status=403)
+    if job.status != ReportJob.STATUS_DONE:
+        return JsonResponse(_job_json(job), status=409)
+    if job.result_file:
+        try:
+            return FileResponse(open(job.result_file, 'rb'), as_attachment=True, content_type=job.content_type)
+        except FileNotFoundError:
+            raise Http404("The result file has been removed")
+    return HttpResponse(job.result, content_type=job.content_type)
+
+
+@login_required
+@user_passes_test(lambda u: hasattr(u, 'role') and getattr(u, 'role', '') == 'owner')
+def invoice_pdf_batch(request):
+    """Queue a batch of invoice PDFs (date range or ids) as a background job.
+
+    Poll the returned status URL for progress and download the zip from the
+    result URL once the job is done.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=400)
+    try:
+        invoice_batch.select_invoices(
+            request.POST.get('from_date'), request.POST.get('to_date'), request.POST.get('ids')
+        )
+    except (invoice_batch.BatchError, ValidationError) as e:
+        return JsonResponse({'error': '; '.join(getattr(e, 'messages', [str(e)]))}, status=400)
+    job = jobs.submit('invoice_pdfs', request.POST, user=request.user)
+    return JsonResponse(_job_json(job), status=202)
+
+
 # ==============================================================================
 # Billing/Invoice Views
 # ==============================================================================
@@ -1378,13 +910,30 @@ def invoice_list(request):
     # For staff, only show invoices they created
     # For owner, show all invoices
     user = request.user
-    if user.role == 'staff':
-        invoices = Invoice._default_manager.filter(created_by=user).order_by('-date')
-    else:
-        invoices = Invoice._default_manager.all().order_by('-date')
+    invoices = reports.visible_invoices(user)
+    
+    totals = invoices.aggregate(
+        total_count=Count('id'),
+        total_amount=Coalesce(Sum('total'), Value(0), output_field=MoneyField()),
+    )
+    page = pagination.paginate(invoices.select_related('created_by'), request.GET)
+    
+    if request.GET.get('format') == 'json':
+        return pagination.json_page(page, lambda invoice: {
+            'id': invoice.id,
+            'bill_number': invoice.bill_number,
+            'customer_name': invoice.customer_name,
+            'customer_phone': invoice.customer_phone,
+            'date': invoice.date,
+            'total': invoice.total,
+            'created_by': invoice.created_by.username if invoice.created_by else None,
+        }, **totals)
     
     return render(request, 'invoice_list.html', {
-        'invoices': invoices,
+        'invoices': page.object_list,
+        'page': page,
+        'total_count': totals['total_count'],
+        'total_amount': totals['total_amount'],
         'user_role': user.role
     })
 
@@ -1403,65 +952,28 @@ def add_billing(request):
                 date = request.POST.get('date', timezone.now().date())
                 discount_amount = request.POST.get('discount_amount', 0)
                 
-                # Generate bill number
-                bill_number = f'INV-{timezone.now().strftime("%Y%m%d%H%M%S")}'
-                
-                # Create invoice
-                invoice = Invoice._default_manager.create(
-                    bill_number=bill_number,
+                # Create the invoice and take the stock in one transaction;
+                # the bill number comes from the shop's invoice sequence
+                invoice = checkout.checkout(
+                    checkout.parse_lines(request.POST),
                     customer_name=customer_name,
                     customer_phone=customer_phone,
                     customer_address=customer_address,
                     date=date,
-                    discount_amount=Decimal(str(discount_amount)) if discount_amount else Decimal('0.00'),
+                    discount_amount=discount_amount,
                     created_by=request.user
                 )
                 
-                # Process invoice items
-                total_forms = int(request.POST.get('items-TOTAL_FORMS', 0))
-                
-                for i in range(total_forms):
-                    category_id = request.POST.get(f'items-{i}-category')
-                    subcategory_id = request.POST.get(f'items-{i}-subcategory')
-                    product_id = request.POST.get(f'items-{i}-product')
-                    quantity = request.POST.get(f'items-{i}-quantity')
-                    price = request.POST.get(f'items-{i}-price')
-                    
-                    # Only process if product is selected
-                    if product_id and quantity and price:
-                        # Get the purchase object (only non-deleted purchases)
-                        purchase = Purchase._default_manager.filter(id=product_id, is_deleted=False).first()
-                        
-                        # Check if purchase exists and is available
-                        if not purchase:
-                            raise ValueError(f"Selected product is not available")
-                        
-                        # Check if there's enough quantity
-                        if purchase.quantity < int(quantity):
-                            raise ValueError(f"Not enough stock for {purchase.product_name}. Available: {purchase.quantity}, Requested: {quantity}")
-                        
-                        # Create invoice item
-                        InvoiceItem._default_manager.create(
-                            invoice=invoice,
-                            purchase=purchase,
-                            quantity=int(quantity),
-                            rate=Decimal(str(price)),
-                            total=Decimal(str(price)) * int(quantity)
-                        )
-                        
-                        # Update purchase stock only for non-deleted purchases
-                        purchase.quantity -= int(quantity)
-                        purchase.save()
-                
-                # Calculate totals
-                invoice.calculate_totals()
-                invoice.save()
-                
                 return JsonResponse({
                     'success': True,
                     'bill_number': invoice.bill_number,
                     'redirect_url': reverse('invoice_view', args=[invoice.pk])
                 })
+            except checkout.CheckoutError as e:
+                return JsonResponse({
+                    'success': False,
+                    'error': str(e)
+                }, status=400)
             except Exception as e:
                 return JsonResponse({
                     'success': False,
@@ -1479,7 +991,7 @@ def add_billing(request):
         invoice_form = InvoiceForm()
     
     # Get categories for the dropdown (only non-deleted purchases)
-    categories = Category._default_manager.all()
+    categories = category_tree.categories()
     
     return render(request, 'add_invoice.html', {
         'invoice_form': invoice_form,
@@ -1570,17 +1082,15 @@ def delete_invoice(request, invoice_id):
     
     if request.method == 'POST':
         try:
-            # Restore stock quantities for all items in the invoice
-            for item in invoice.items.all():
-                purchase = item.purchase
-                purchase.quantity += item.quantity
-                purchase.save()
-            
             # Store bill number before deleting for the response
             bill_number = invoice.bill_number
             
-            # Delete the invoice (which will also delete related items due to CASCADE)
-            invoice.delete()
+            with writes.immediate():
+                # Restore stock quantities for all items in the invoice
+                stock.restore_invoice_stock(invoice, user=request.user)
+                
+                # Delete the invoice (which will also delete related items due to CASCADE)
+                invoice.delete()
             
             # Return success response for AJAX
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -1622,7 +1132,7 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.db.models import Sum, Value
 from django.db.models.functions import Coalesce
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseNotModified, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 
@@ -1763,7 +1273,7 @@ def add_discount(request, purchase_id):
                 })
 
             # Additional validation to ensure MRP exists
-            if purchase.mrp is None or float(purchase.mrp) <= 0:
+            if purchase.mrp is None or purchase.mrp <= 0:
                 messages.error(request, "Product MRP is not set or invalid.")
                 return render(request, 'add_discount.html', {
                     'purchase': purchase,
@@ -1833,7 +1343,7 @@ def add_discount(request, purchase_id):
                     })
             
             # Calculate the final price based on the discount
-            final_price = Decimal(str(purchase.mrp)) * (1 - Decimal(str(discount_percentage)) / 100)
+            final_price = pricing.final_price(purchase.mrp, discount_percentage)
             
             # If no product exists for this purchase, create one
             if not product:
@@ -1843,9 +1353,9 @@ def add_discount(request, purchase_id):
                     purchase=purchase,
                     category=purchase.category,
                     subcategory=purchase.subcategory,
-                    mrp=Decimal(str(purchase.mrp)),
-                    purchase_rate=Decimal(str(purchase.product_rate)),
-                    selling_price=Decimal(str(purchase.mrp)),
+                    mrp=purchase.mrp,
+                    purchase_rate=purchase.product_rate,
+                    selling_price=purchase.mrp,
                     stock_quantity=purchase.quantity,
                     final_price=final_price  # Add the final_price value here
                 )
@@ -1853,7 +1363,7 @@ def add_discount(request, purchase_id):
             
             # Also update the purchase's sale_rate to reflect the MRP initially
             if purchase.sale_rate is None:
-                purchase.sale_rate = float(purchase.mrp)
+                purchase.sale_rate = purchase.mrp
                 purchase.save()
             
             # Create or update discount
@@ -1895,8 +1405,7 @@ def add_discount(request, purchase_id):
             
             # Update the purchase's sale_rate to reflect the discount
             if discount_percentage > 0:
-                discounted_price = float(purchase.mrp) * (1 - discount_percentage / 100)
-                purchase.sale_rate = discounted_price
+                purchase.sale_rate = final_price
                 purchase.save()
                 print(f"Updated purchase sale_rate to: {purchase.sale_rate}")
             
@@ -1941,11 +1450,11 @@ def load_subcategories(request):
     
     try:
         # Check if category exists
-        if not Category._default_manager.filter(id=category_id).exists():
+        category = category_tree.category(category_id)
+        if category is None:
             return JsonResponse({'error': 'Category not found'}, status=404)
             
-        subcategories = SubCategory._default_manager.filter(category_id=category_id).values('id', 'name')
-        return JsonResponse(list(subcategories), safe=False)
+        return JsonResponse([{'id': subcategory.id, 'name': subcategory.name} for subcategory in category.children], safe=False)
     except Exception as e:
         return JsonResponse({'error': 'An error occurred while fetching subcategories'}, status=500)
 
@@ -1965,20 +1474,50 @@ def load_products(request):
     
     try:
         # Check if subcategory exists
-        if not SubCategory._default_manager.filter(id=subcategory_id).exists():
+        if category_tree.subcategory(subcategory_id) is None:
             return JsonResponse({'error': 'Subcategory not found'}, status=404)
         
         # Get purchases that have this subcategory, are not deleted, are still in stock, and are NOT stock update entries
         purchases = Purchase._default_manager.filter(
             subcategory_id=subcategory_id,
             is_deleted=False,
-            quantity__gt=0
-        ).exclude(notes__icontains='Stock update entry').values('id', 'product_name', 'quantity', 'sale_rate', 'product_rate')
-        return JsonResponse(list(purchases), safe=False)
+            quantity__gt=0,
+            kind=Purchase.KIND_PURCHASE
+        ).values('id', 'product_name', 'quantity', 'sale_rate', 'product_rate')
+        return JsonResponse([
+            dict(row, sale_rate=money.number(row['sale_rate']), product_rate=money.number(row['product_rate']))
+            for row in purchases
+        ], safe=False)
     except Exception as e:
         return JsonResponse({'error': 'An error occurred while fetching products'}, status=500)
 
 
+@login_required
+def search_products(request):
+    """AJAX view for as-you-type product search at the billing counter."""
+    query = request.GET.get('q', '').strip()
+    purchases = Purchase._default_manager.select_related('category', 'subcategory').filter(
+        is_deleted=False,
+        quantity__gt=0,
+        kind=Purchase.KIND_PURCHASE
+    )
+    results = [
+        {
+            'id': purchase.id,
+            'product_name': purchase.product_name,
+            'category_id': purchase.category_id,
+            'category': purchase.category.name,
+            'subcategory_id': purchase.subcategory_id,
+            'subcategory': purchase.subcategory.name,
+            'quantity': purchase.quantity,
+            'sale_rate': money.number(purchase.sale_rate),
+            'product_rate': money.number(purchase.product_rate),
+        }
+        for purchase in search.ranked_purchases(purchases, query)
+    ]
+    return JsonResponse(results, safe=False)
+
+
 @login_required
 def get_product_details(request):
     """AJAX view to get product details for a given purchase."""
@@ -1993,17 +1532,48 @@ def get_product_details(request):
         return JsonResponse({'error': 'Invalid purchase ID'}, status=400)
     
     try:
-        purchase = Purchase._default_manager.exclude(notes__icontains='Stock update entry').get(id=purchase_id)
+        purchase = Purchase._default_manager.filter(kind=Purchase.KIND_PURCHASE).get(id=purchase_id)
         data = {
             'quantity': purchase.quantity,
-            'sale_rate': purchase.sale_rate,
-            'product_rate': purchase.product_rate
+            'sale_rate': money.number(purchase.sale_rate),
+            'product_rate': money.number(purchase.product_rate)
         }
         return JsonResponse(data)
     except Exception:
         return JsonResponse({'error': 'An error occurred while fetching product details'}, status=500)
 
 
+@login_required
+@gzip_page
+def api_catalog(request):
+    """Everything the billing screen sells, in one versioned response.
+
+    Without ``since`` the full snapshot is sent, or 304 when the client's
+    ETag is current; with ``since=<version>`` only what changed after that
+    version (or the full snapshot if the change log cannot tell).
+    """
+    version = catalog.current_version()
+    etag = catalog.etag(version)
+    since = request.GET.get('since')
+    if since is None:
+        if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+        data = catalog.snapshot(version)
+    else:
+        try:
+            since = int(since)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid catalog version'}, status=400)
+        data = catalog.changes_since(since, version)
+    response = JsonResponse(data)
+    response['ETag'] = etag
+    # Revalidate every time; the versions change with every sale
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 # ==============================================================================
 # Stock Management Views
 # ==============================================================================
@@ -2028,11 +1598,8 @@ def update_stock(request, purchase_id):
                 messages.error(request, 'Additional quantity must be greater than zero.')
                 return redirect('list_purchases')
             
-            # Update the original purchase quantity (add additional stock to existing stock)
-            old_quantity = original_purchase.quantity
-            original_purchase.quantity = old_quantity + additional_quantity
-            original_purchase.notes = f"{original_purchase.notes or ''} | Stock updated on {timezone.now().date()}. Added {additional_quantity} units."
-            original_purchase.save()
+            # Add the stock to the existing purchase; the change is recorded as a StockMovement
+            stock.restock(original_purchase, additional_quantity, user=request.user)
             
             # REMOVED: Creating a new purchase entry for the purchase history (stock update record)
             # This ensures we only update the existing stock quantity directly without creating new fields
@@ -2058,150 +1625,13 @@ def update_stock(request, purchase_id):
 # ==============================================================================
 
 @login_required
+@snapshots.use_snapshot
 def staff_wise_report(request, staff_id):
     """Generate report for a specific staff member."""
-    # Get the staff user
-    staff = get_object_or_404(CustomUser, id=staff_id, role='staff')
+    # Get the staff user (live, so staff added since the snapshot are found)
+    with snapshots.live():
+        staff = get_object_or_404(CustomUser, id=staff_id, role='staff')
     
-    # Get date range filters from request
-    from_date = request.GET.get('from_date')
-    to_date = request.GET.get('to_date')
-    
-    # Base invoice queryset for this staff member
-    invoice_qs = Invoice._default_manager.filter(created_by=staff)
-    
-    # Apply date filters
-    if from_date and to_date:
-        invoice_qs = invoice_qs.filter(date__range=[from_date, to_date])
-    elif from_date:
-        invoice_qs = invoice_qs.filter(date__gte=from_date)
-    elif to_date:
-        invoice_qs = invoice_qs.filter(date__lte=to_date)
-    
-    # --- Sales Summary for this staff ---
-    sales_summary = invoice_qs.aggregate(
-        total_sales=Coalesce(Sum("total"), Value(Decimal(0)), output_field=DecimalField()),
-        total_discount=Coalesce(Sum("discount_amount"), Value(Decimal(0)), output_field=DecimalField()),
-    )
-    
-    # Calculate net revenue
-    sales_summary['net_revenue'] = sales_summary['total_sales'] - sales_summary['total_discount']
-    
-    # --- Product-wise Sales Report with Profit Calculation for this staff ---
-    product_sales_query = InvoiceItem._default_manager.filter(
-        invoice__created_by=staff,
-        purchase__is_deleted=False
-    ).values(
-        "purchase__product_name", 
-        "purchase__category__name",
-        "purchase__category__id",
-        "purchase__subcategory__name",
-        "purchase__subcategory__id",
-        "purchase__product_rate",  # Cost price
-        "purchase__sale_rate"      # Selling price
-    )
-    
-    # Apply date filter to InvoiceItem via invoice__date
-    if from_date and to_date:
-        product_sales_query = product_sales_query.filter(invoice__date__range=[from_date, to_date])
-    elif from_date:
-        product_sales_query = product_sales_query.filter(invoice__date__gte=from_date)
-    elif to_date:
-        product_sales_query = product_sales_query.filter(invoice__date__lte=to_date)
-    
-    product_sales = (
-        product_sales_query.annotate(
-            total_qty=Coalesce(Sum("quantity"), Value(0), output_field=IntegerField()),
-            total_amount=Coalesce(Sum("total"), Value(Decimal(0)), output_field=DecimalField()),
-            total_cost=Coalesce(Sum(F("quantity") * F("purchase__product_rate")), Value(Decimal(0)), output_field=DecimalField()),
-            profit=Coalesce(Sum("total"), Value(Decimal(0)), output_field=DecimalField()) - 
-                   Coalesce(Sum(F("quantity") * F("purchase__product_rate")), Value(Decimal(0)), output_field=DecimalField())
-        )
-        .order_by("-profit")  # Sort by annotated profit field
-    )
-    
-    # Calculate additional metrics for each product
-    for product in product_sales:
-        if product['total_qty'] > 0:
-            product['avg_price'] = product['total_amount'] / product['total_qty']
-            product['profit_per_unit'] = product['profit'] / product['total_qty']
-        else:
-            product['avg_price'] = Decimal(0)
-            product['profit_per_unit'] = Decimal(0)
-    
-    # --- Category-wise Sales Report with Profit for this staff ---
-    category_sales_query = InvoiceItem._default_manager.filter(
-        invoice__created_by=staff,
-        purchase__is_deleted=False
-    ).values("purchase__category__name", "purchase__category__id")
-    
-    # Apply date filter to InvoiceItem via invoice__date
-    if from_date and to_date:
-        category_sales_query = category_sales_query.filter(invoice__date__range=[from_date, to_date])
-    elif from_date:
-        category_sales_query = category_sales_query.filter(invoice__date__gte=from_date)
-    elif to_date:
-        category_sales_query = category_sales_query.filter(invoice__date__lte=to_date)
-    
-    category_sales = (
-        category_sales_query.annotate(
-            total_qty=Coalesce(Sum("quantity"), Value(0), output_field=IntegerField()),
-            total_amount=Coalesce(Sum("total"), Value(Decimal(0)), output_field=DecimalField()),
-            total_cost=Coalesce(Sum(F("quantity") * F("purchase__product_rate")), Value(Decimal(0)), output_field=DecimalField()),
-            profit=Coalesce(Sum("total"), Value(Decimal(0)), output_field=DecimalField()) - 
-                   Coalesce(Sum(F("quantity") * F("purchase__product_rate")), Value(Decimal(0)), output_field=DecimalField())
-        )
-        .order_by("-profit")  # Sort by annotated profit field
-    )
-    
-    # Calculate percentage of total sales for each category
-    for category in category_sales:
-        if sales_summary['total_sales'] > 0:
-            category['percentage'] = (category['total_amount'] / sales_summary['total_sales']) * 100
-        else:
-            category['percentage'] = 0
-    
-    # --- Billing List for this staff ---
-    invoices = invoice_qs.annotate(
-        net_amount=F("total") - F("discount_amount")
-    ).order_by("-total")  # Sort by total amount
-    
-    # --- Additional data for enhanced report ---
-    # Top selling products (top 5)
-    top_selling = list(product_sales[:5])
-    
-    # Highest profit products (top 5)
-    high_profit_products = sorted(
-        [p for p in product_sales if p['profit'] > 0], 
-        key=lambda x: x['profit'], 
-        reverse=True
-    )[:5]
-    
-    # Low profit products (bottom 5)
-    low_profit_products = sorted(
-        [p for p in product_sales if p['profit'] > 0], 
-        key=lambda x: x['profit']
-    )[:5]
-    
-    # Calculate overall profit metrics
-    total_cost = sum(item['total_cost'] for item in product_sales)
-    total_profit = sales_summary['net_revenue'] - total_cost
-    
-    today = timezone.now().date()
-    
-    context = {
-        "staff": staff,
-        "today": today,
-        "sales_summary": sales_summary,
-        "product_sales": product_sales,
-        "category_sales": category_sales,
-        "invoices": invoices,
-        "top_selling": top_selling,
-        "high_profit_products": high_profit_products,
-        "low_profit_products": low_profit_products,
-        "total_cost": total_cost,
-        "total_profit": total_profit,
-        "from_date": from_date or '',
-        "to_date": to_date or '',
-    }
+    # The shop report's sales sections, limited to this staff member's invoices
+    context = reports.staff_report_context(staff, request.GET)
     return render(request, "staff_wise_report.html", context)
\ No newline at end of file
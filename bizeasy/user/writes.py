@@ -0,0 +1,128 @@
+"""
+Write transaction module for the Bizeasy application.
+Immediate write transactions and bounded retries when SQLite is busy.
+"""
+
+# Standard library imports
+import functools
+import random
+import time
+from contextlib import contextmanager
+
+# Django imports
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+
+DEFAULTS = {
+    # Pragmas applied to every connection by the user.backends.sqlite3 engine
+    'JOURNAL_MODE': 'WAL',
+    'SYNCHRONOUS': 'NORMAL',
+    # Negative sizes are KiB: 64 MiB of page cache per connection
+    'CACHE_SIZE': -64000,
+    'MMAP_SIZE': 256 * 1024 * 1024,
+    # Milliseconds SQLite waits for a lock before reporting it busy
+    'BUSY_TIMEOUT': 5000,
+    # Busy write transactions are retried this many times, waiting a random
+    # time up to RETRY_DELAY doubled per attempt (at most MAX_RETRY_DELAY)
+    'RETRIES': 5,
+    'RETRY_DELAY': 0.05,
+    'MAX_RETRY_DELAY': 1.0,
+}
+
+# Messages of the OperationalErrors SQLite raises for lock contention
+BUSY_MESSAGES = ('database is locked', 'database table is locked', 'database is busy')
+
+
+def config(key):
+    """Read a ``SQLITE_CONCURRENCY`` setting, falling back to DEFAULTS."""
+    return getattr(settings, 'SQLITE_CONCURRENCY', {}).get(key, DEFAULTS[key])
+
+
+def pragmas(journal_mode=None):
+    """The PRAGMA statements for a new connection.
+
+    The journal mode is persistent and switching it takes an exclusive
+    lock, so it is only set when ``journal_mode`` (the file's current
+    mode) differs.
+    """
+    statements = [
+        f"PRAGMA busy_timeout={int(config('BUSY_TIMEOUT'))}",
+        f"PRAGMA synchronous={config('SYNCHRONOUS')}",
+        f"PRAGMA cache_size={int(config('CACHE_SIZE'))}",
+        f"PRAGMA mmap_size={int(config('MMAP_SIZE'))}",
+    ]
+    if str(journal_mode).lower() != config('JOURNAL_MODE').lower():
+        statements.insert(1, f"PRAGMA journal_mode={config('JOURNAL_MODE')}")
+    return statements
+
+
+def is_busy(error):
+    """Whether an OperationalError is SQLite lock contention."""
+    message = str(error).lower()
+    return any(busy in message for busy in BUSY_MESSAGES)
+
+
+def retry_delay(attempt):
+    """Seconds to wait before retry ``attempt`` (0-based), with full jitter."""
+    return random.uniform(0, min(config('MAX_RETRY_DELAY'), config('RETRY_DELAY') * 2 ** attempt))
+
+
+# ==============================================================================
+# Write Transactions
+# ==============================================================================
+
+@contextmanager
+def immediate(using=DEFAULT_DB_ALIAS):
+    """``transaction.atomic()`` that takes SQLite's write lock up front.
+
+    With the user.backends.sqlite3 engine the outermost block starts with
+    BEGIN IMMEDIATE, so it waits (up to BUSY_TIMEOUT) for other writers
+    when it starts instead of failing when its first read turns into a
+    write. Nested blocks and other engines get a plain atomic block.
+    """
+    connection = connections[using]
+    if connection.in_atomic_block or not hasattr(connection, 'begin_immediate'):
+        with transaction.atomic(using=using):
+            yield
+        return
+    connection.begin_immediate = True
+    try:
+        with transaction.atomic(using=using):
+            connection.begin_immediate = False
+            yield
+    finally:
+        connection.begin_immediate = False
+
+
+def retry_on_busy(func=None, using=DEFAULT_DB_ALIAS):
+    """Decorator retrying ``func`` up to RETRIES times while the database is busy.
+
+    Only a call that owns its transaction is retried: inside an outer
+    atomic block the error is raised for that block to roll back.
+    """
+    if func is None:
+        return functools.partial(retry_on_busy, using=using)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                if not is_busy(e) or attempt >= config('RETRIES') or connections[using].in_atomic_block:
+                    raise
+            time.sleep(retry_delay(attempt))
+            attempt += 1
+    return wrapper
+
+
+def write_transaction(func):
+    """Decorator running ``func`` in an immediate() block, retried while busy."""
+    @retry_on_busy
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with immediate():
+            return func(*args, **kwargs)
+    return wrapper